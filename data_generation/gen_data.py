@@ -15,21 +15,27 @@ import pcse_gym
 import pandas as pd
 import torch
 import os
+import json
+import shutil
+import hashlib
+import multiprocessing
 import tyro
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, asdict
+from typing import Iterator, Optional
 
 import utils
 import pcse_gym.policies as policies
+from pcse_gym.dataset import DatasetWriter, DatasetReader
 from rl_algs.rl_utils import make_env, Agent
 
 
 @dataclass
 class DataArgs(utils.Args):
-    """File extension (.npz or .csv)"""
+    """File extension (.npz or .csv) or chunks"""
 
     """.npz files will have (obs, action, reward, next_obs, done, info) tuples"""
-    """while .csv files will have daily observations"""
+    """while .csv files will have daily observations. chunks streams the same"""
+    """tuples to a chunked dataset folder (see pcse_gym/dataset.py) while the data is generated"""
     file_type: Optional[str] = "npz"
 
     """Policy name if using a policy in the policies.py file"""
@@ -61,62 +67,242 @@ class DataArgs(utils.Args):
     """Cuda setting for RL agents"""
     cuda: bool = True
 
+    """Number of worker processes for the sweep over locations and years, 1 to run it in this process"""
+    """Each worker simulates all years of one location at a time and saves them as a shard"""
+    """in <save_folder><data_file>_shards/, existing shards are reused when resuming a sweep"""
+    """with the same policy, environment and seed. Agent policies must run on the CPU (--no-cuda)"""
+    num_workers: int = 1
 
-def csv(env, args, pol):
+    """Number of transitions per chunk of a chunked dataset (and of the shards of a parallel sweep)"""
+    chunk_size: int = 65536
+
+
+def get_loc_yr(args: DataArgs) -> list[list]:
     """
-    Generate data from a policy and save to .csv format
+    Returns the [location, year] pairs of the sweep, ordered by year and then location
     """
-    assert isinstance(args.save_folder, str), f"Folder args.save_folder `{args.save_folder}` must be of type `str`"
-    assert args.save_folder.endswith("/"), f"Folder args.save_folder `{args.save_folder}` must end with `/`"
-    assert isinstance(args.data_file, str), f"File args.data_file `{args.data_file}` must be of type `str`"
-
     years = np.arange(start=args.year_low, stop=args.year_high + 1, step=1)
     latitudes = np.arange(start=args.lat_low, stop=args.lat_high + 0.5, step=0.5)
     longitudes = np.arange(start=args.lon_low, stop=args.lon_high + 0.5, step=0.5)
 
     lat_long = [(i, j) for i in latitudes for j in longitudes]
-    loc_yr = [[loc, yr] for yr in years for loc in lat_long]
+    return [[loc, yr] for yr in years for loc in lat_long]
+
+
+# Arguments that do not change the episodes of a shard, left out of the manifest
+# of the shard folder. The locations and years are part of the shard names
+SWEEP_ONLY_ARGS = [
+    "save_folder",
+    "data_file",
+    "file_type",
+    "num_workers",
+    "chunk_size",
+    "cuda",
+    "year_low",
+    "year_high",
+    "lat_low",
+    "lat_high",
+    "lon_low",
+    "lon_high",
+]
+MANIFEST_FILE = "manifest.json"
+
+
+def _shard_manifest(args: DataArgs, episode_fn: callable) -> dict:
+    """
+    Returns the manifest of the shards of a parallel sweep, with a hash of the
+    arguments that determine the episodes: the policy, the environment arguments
+    and configuration file, and the seed
+    """
+    config = {k: v for k, v in asdict(args).items() if k not in SWEEP_ONLY_ARGS}
+    config["episode_fn"] = episode_fn.__name__
+    for k in ["agent_path", "config_fpath"]:
+        if getattr(args, k):
+            with open(getattr(args, k), "rb") as fp:
+                config[f"{k}_sha256"] = hashlib.sha256(fp.read()).hexdigest()
 
-    obs_arr = []
-    _, _ = env.reset()
-    for pair in loc_yr:
-        obs, _ = env.reset(**{"year": pair[1], "location": pair[0]})
+    digest = hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+    return {"hash": digest, "args": json.loads(json.dumps(config, sort_keys=True, default=str))}
 
-        done = False
-        while not done:
-            if args.agent_type:
-                obs = torch.from_numpy(obs).float()
-            action = pol.get_action(obs)
-            next_obs, reward, done, trunc, _ = env.step(action)
 
-            obs_arr.append(utils.obs_to_numpy(obs))
+def _location_seed(seed: int, location: tuple) -> int:
+    """
+    Returns the seed of the global NumPy random state for the episodes at a
+    location, so that the data does not depend on the number of workers or on
+    which worker simulates the location
+    """
+    lat, lon = (int(round((x + 180) * 100)) for x in location)
+    return int(np.random.SeedSequence([seed, lat, lon]).generate_state(1)[0])
 
-            obs = next_obs
-            if done:
-                obs, _ = env.reset()
-                break
 
-    df = pd.DataFrame(data=obs_arr, columns=env.unwrapped.output_vars + env.unwrapped.weather_vars + ["DAYS ELAPSED"])
-    df.to_csv(f"{args.save_folder}{args.data_file}.csv", index=False)
+def _sweep_seed(args: DataArgs, saved: dict = None) -> int:
+    """
+    Returns the seed of a sweep: the environment seed, or for an unseeded
+    environment the seed saved in the manifest of the shards or new entropy
+    """
+    if args.npk.seed is not None:
+        return args.npk.seed
+    if saved is not None:
+        return saved["seed"]
+    return np.random.SeedSequence().entropy
 
-    return df
 
+# Environment, arguments, policy, episode function and seed of a parallel
+# sweep, inherited by the forked worker processes
+_sweep_state = None
 
-def npz(env: gym.Env, args: DataArgs, pol: Agent) -> None:
+
+def _run_shard(shard: tuple) -> str:
     """
-    Generate data and save in .npz format from environments
+    Simulate all years of one location in a worker process and save the
+    episodes to the shard dataset
+    """
+    fpath, location, years = shard
+    env, args, pol, episode_fn, seed = _sweep_state
+
+    np.random.seed(_location_seed(seed, location))
+    with DatasetWriter(f"{fpath}.tmp", chunk_size=args.chunk_size) as writer:
+        for year in years:
+            episode = episode_fn(env, args, pol, location, year)
+            infos = episode.pop("infos", None)
+            writer.add_episode(info=infos[-1] if infos else None, **episode)
+    os.replace(f"{fpath}.tmp", fpath)
+    return fpath
+
+
+def sweep(env: gym.Env, args: DataArgs, pol: Agent, episode_fn: callable) -> Iterator[dict[str, list]]:
+    """
+    Run `episode_fn` for every location and year of the sweep and yield the
+    episodes in the order of `get_loc_yr()`. The global NumPy random state of
+    the episodes at a location (e.g. for weather forecast noise) is seeded per
+    location and carried over between its years, so that the data is the same
+    for any number of workers.
+
+    With `args.num_workers` > 1 the locations are simulated in parallel by
+    forked worker processes, which reuse the environment and weather of a
+    location for all its years. Every location is saved as a shard dataset,
+    so that an interrupted sweep only simulates the missing locations when it
+    is run again with the same arguments (checked against the manifest of the
+    shard folder). The episodes are then streamed from the shards, with the
+    final info of every episode (e.g. the log with its dates) repeated for
+    every transition as in the serial sweep, and the shards are removed when
+    all episodes have been yielded.
+    """
+    loc_yr = get_loc_yr(args)
+
+    if args.num_workers <= 1:
+        seed = _sweep_seed(args)
+        random_states = {}
+        for loc, yr in loc_yr:
+            if loc in random_states:
+                np.random.set_state(random_states[loc])
+            else:
+                np.random.seed(_location_seed(seed, loc))
+            episode = episode_fn(env, args, pol, loc, yr)
+            random_states[loc] = np.random.get_state()
+            yield episode
+        return
+
+    if "fork" not in multiprocessing.get_all_start_methods():
+        msg = "Generating data with `--num-workers` > 1 requires the `fork` start method for processes"
+        raise Exception(msg)
+    # CUDA can not be used in a forked process once it is initialized
+    if args.agent_type and (any(p.is_cuda for p in pol.parameters()) or torch.cuda.is_initialized()):
+        msg = "Generating data from an agent with `--num-workers` > 1 requires the agent on the CPU, pass `--no-cuda`"
+        raise Exception(msg)
+
+    shard_folder = f"{args.save_folder}{args.data_file}_shards/"
+    manifest = _shard_manifest(args, episode_fn)
+    manifest_fpath = f"{shard_folder}{MANIFEST_FILE}"
+    if os.path.isdir(shard_folder):
+        saved = None
+        if os.path.isfile(manifest_fpath):
+            with open(manifest_fpath, "r") as fp:
+                saved = json.load(fp)
+        if saved is None or saved["hash"] != manifest["hash"]:
+            msg = f"Shards in `{shard_folder}` were generated with different arguments, remove the folder to generate them again"
+            raise Exception(msg)
+        manifest["seed"] = _sweep_seed(args, saved)
+    else:
+        manifest["seed"] = _sweep_seed(args)
+        os.makedirs(shard_folder)
+        with open(manifest_fpath, "w") as fp:
+            json.dump(manifest, fp, indent=2)
+    locations = list(dict.fromkeys(loc for loc, _ in loc_yr))
+    years = list(dict.fromkeys(yr for _, yr in loc_yr))
+    shards = [
+        (f"{shard_folder}shard_{lat:.1f}_{lon:.1f}_{years[0]}-{years[-1]}", (lat, lon), years)
+        for lat, lon in locations
+    ]
+
+    global _sweep_state
+    _sweep_state = (env, args, pol, episode_fn, manifest["seed"])
+    todo = [shard for shard in shards if not os.path.isdir(shard[0])]
+    with multiprocessing.get_context("fork").Pool(args.num_workers) as pool:
+        for _ in pool.imap_unordered(_run_shard, todo):
+            pass
+    _sweep_state = None
+
+    # Every shard holds the years of one location in order, so taking the
+    # next episode of every location for each year restores the order of loc_yr
+    shard_episodes = [DatasetReader(fpath).iter_episodes() for fpath, _, _ in shards]
+    for _ in years:
+        for episodes in shard_episodes:
+            episode = next(episodes)
+            info = episode.pop("info")
+            if info is not None:
+                episode["infos"] = [info] * len(episode["obs"])
+            yield episode
+    shutil.rmtree(shard_folder)
+
+
+def _csv_episode(env: gym.Env, args: DataArgs, pol: Agent, location: tuple, year: int) -> dict[str, list]:
+    """
+    Run one episode at the location and year and return the daily observations
+    """
+    obs_arr = []
+    obs, _ = env.reset(**{"year": year, "location": location})
+
+    done = False
+    while not done:
+        if args.agent_type:
+            obs = torch.from_numpy(obs).float()
+        action = pol.get_action(obs)
+        next_obs, reward, done, trunc, _ = env.step(action)
+
+        obs_arr.append(utils.obs_to_numpy(obs))
+
+        obs = next_obs
+        if done:
+            obs, _ = env.reset()
+            break
+
+    return {"obs": obs_arr}
+
+
+def csv(env, args, pol):
+    """
+    Generate data from a policy and save to .csv format
     """
     assert isinstance(args.save_folder, str), f"Folder args.save_folder `{args.save_folder}` must be of type `str`"
     assert args.save_folder.endswith("/"), f"Folder args.save_folder `{args.save_folder}` must end with `/`"
     assert isinstance(args.data_file, str), f"File args.data_file `{args.data_file}` must be of type `str`"
 
-    years = np.arange(start=args.year_low, stop=args.year_high + 1, step=1)
-    latitudes = np.arange(start=args.lat_low, stop=args.lat_high + 0.5, step=0.5)
-    longitudes = np.arange(start=args.lon_low, stop=args.lon_high + 0.5, step=0.5)
+    _, _ = env.reset()
+    obs = [ob for episode in sweep(env, args, pol, _csv_episode) for ob in episode["obs"]]
 
-    lat_long = [(i, j) for i in latitudes for j in longitudes]
-    loc_yr = [[loc, yr] for yr in years for loc in lat_long]
+    df = pd.DataFrame(
+        data=np.array(obs), columns=env.unwrapped.output_vars + env.unwrapped.weather_vars + ["DAYS ELAPSED"]
+    )
+    df.to_csv(f"{args.save_folder}{args.data_file}.csv", index=False)
 
+    return df
+
+
+def _npz_episode(env: gym.Env, args: DataArgs, pol: Agent, location: tuple, year: int) -> dict[str, list]:
+    """
+    Run one episode at the location and year and return its transitions
+    """
     obs_arr = []
     next_obs_arr = []
     action_arr = []
@@ -124,63 +310,102 @@ def npz(env: gym.Env, args: DataArgs, pol: Agent) -> None:
     rewards_arr = []
     info_arr = []
 
-    for pair in loc_yr:
-        obs, _ = env.reset(**{"year": pair[1], "location": pair[0]})
+    obs, _ = env.reset(**{"year": year, "location": location})
+
+    term, trunc = False, False
+    if hasattr(pol, "lstm"):
+        next_lstm_state = (
+            torch.zeros(policy.lstm.num_layers, 1, policy.lstm.hidden_size).to(device),
+            torch.zeros(policy.lstm.num_layers, 1, policy.lstm.hidden_size).to(device),
+        )  # hidden and cell states (see https://youtu.be/8HyCNIVRbSU)
+
+    while not term:
+        if args.agent_type:
+            obs = torch.from_numpy(obs).float().to(device)
 
-        term, trunc = False, False
         if hasattr(pol, "lstm"):
-            next_lstm_state = (
-                torch.zeros(policy.lstm.num_layers, 1, policy.lstm.hidden_size).to(device),
-                torch.zeros(policy.lstm.num_layers, 1, policy.lstm.hidden_size).to(device),
-            )  # hidden and cell states (see https://youtu.be/8HyCNIVRbSU)
-
-        while not term:
-            if args.agent_type:
-                obs = torch.from_numpy(obs).float().to("cuda")
-
-            if hasattr(pol, "lstm"):
-                next_done = np.logical_or([term], [trunc])
-                next_done = torch.Tensor(next_done).to(device)
-                action, next_lstm_state = policy.get_action(obs, next_lstm_state, next_done)
-            else:
-                action = pol.get_action(obs)
-            next_obs, reward, term, trunc, info = env.step(action)
+            next_done = np.logical_or([term], [trunc])
+            next_done = torch.Tensor(next_done).to(device)
+            action, next_lstm_state = policy.get_action(obs, next_lstm_state, next_done)
+        else:
+            action = pol.get_action(obs)
+        next_obs, reward, term, trunc, info = env.step(action)
 
-            if args.agent_type:
-                reward = env.unnormalize(reward)
-                obs_arr.append(env.unnormalize_obs(utils.obs_to_numpy(obs)))
-                next_obs_arr.append(env.unnormalize_obs(utils.obs_to_numpy(next_obs)))
-            else:
-                obs_arr.append(utils.obs_to_numpy(obs))
-                next_obs_arr.append(utils.obs_to_numpy(next_obs))
-            action_arr.append(utils.action_to_numpy(env, action))
-            dones_arr.append(term)
+        if args.agent_type:
+            reward = env.unnormalize(reward)
+            obs_arr.append(env.unnormalize_obs(utils.obs_to_numpy(obs)))
+            next_obs_arr.append(env.unnormalize_obs(utils.obs_to_numpy(next_obs)))
+        else:
+            obs_arr.append(utils.obs_to_numpy(obs))
+            next_obs_arr.append(utils.obs_to_numpy(next_obs))
+        action_arr.append(utils.action_to_numpy(env, action))
+        dones_arr.append(term)
+
+        if isinstance(reward, torch.Tensor):
+            reward.cpu().numpy().flatten()[0]
+        elif isinstance(reward, np.ndarray):
+            reward = reward.flatten()[0]
+
+        rewards_arr.append(reward)
+        info_arr.append(info)
 
-            if isinstance(reward, torch.Tensor):
-                reward.cpu().numpy().flatten()[0]
-            elif isinstance(reward, np.ndarray):
-                reward = reward.flatten()[0]
+        obs = next_obs
 
-            rewards_arr.append(reward)
-            info_arr.append(info)
+        if term:
+            obs, _ = env.reset()
+            break
 
-            obs = next_obs
+    return {
+        "obs": obs_arr,
+        "next_obs": next_obs_arr,
+        "actions": action_arr,
+        "rewards": rewards_arr,
+        "dones": dones_arr,
+        "infos": info_arr,
+    }
+
+
+def npz(env: gym.Env, args: DataArgs, pol: Agent) -> None:
+    """
+    Generate data and save in .npz format from environments
+    """
+    assert isinstance(args.save_folder, str), f"Folder args.save_folder `{args.save_folder}` must be of type `str`"
+    assert args.save_folder.endswith("/"), f"Folder args.save_folder `{args.save_folder}` must end with `/`"
+    assert isinstance(args.data_file, str), f"File args.data_file `{args.data_file}` must be of type `str`"
+
+    data = {"obs": [], "next_obs": [], "actions": [], "rewards": [], "dones": [], "infos": []}
+    for episode in sweep(env, args, pol, _npz_episode):
+        for k, v in episode.items():
+            data[k].extend(v)
 
-            if term:
-                obs, _ = env.reset()
-                break
     np.savez(
         f"{args.save_folder}{args.data_file}.npz",
-        obs=np.array(obs_arr),
-        next_obs=np.array(next_obs_arr),
-        actions=np.array(action_arr),
-        rewards=np.array(rewards_arr),
-        dones=np.array(dones_arr),
-        infos=np.array(info_arr),
+        obs=np.array(data["obs"]),
+        next_obs=np.array(data["next_obs"]),
+        actions=np.array(data["actions"]),
+        rewards=np.array(data["rewards"]),
+        dones=np.array(data["dones"]),
+        infos=np.array(data["infos"]),
         output_vars=np.array(env.unwrapped.get_output_vars()),
     )
 
 
+def chunks(env: gym.Env, args: DataArgs, pol: Agent) -> None:
+    """
+    Generate data and stream it to a chunked dataset in <save_folder><data_file>/,
+    writing the episodes to disk in chunks as they complete
+    """
+    assert isinstance(args.save_folder, str), f"Folder args.save_folder `{args.save_folder}` must be of type `str`"
+    assert args.save_folder.endswith("/"), f"Folder args.save_folder `{args.save_folder}` must end with `/`"
+    assert isinstance(args.data_file, str), f"File args.data_file `{args.data_file}` must be of type `str`"
+
+    attrs = {"output_vars": env.unwrapped.get_output_vars()}
+    with DatasetWriter(f"{args.save_folder}{args.data_file}", chunk_size=args.chunk_size, attrs=attrs) as writer:
+        for episode in sweep(env, args, pol, _npz_episode):
+            infos = episode.pop("infos")
+            writer.add_episode(info=infos[-1], **episode)
+
+
 if __name__ == "__main__":
     """
     Runs the data collection
@@ -20,6 +20,7 @@ from typing import Optional
 
 import utils
 import pcse_gym.policies as policies
+from pcse_gym.dataset import DatasetWriter
 from rl_algs.rl_utils import make_env_pass, Agent
 from rl_algs.PPO import PPO
 from rl_algs.DQN import DQN
@@ -32,10 +33,11 @@ from rl_algs.GAIL import GAIL
 
 @dataclass
 class DataArgs(utils.Args):
-    """File extension (.npz or .csv)"""
+    """File extension (.npz or .csv) or chunks"""
 
     """.npz files will have (obs, action, reward, next_obs, done, info) tuples"""
-    """while .csv files will have daily observations"""
+    """while .csv files will have daily observations. chunks streams the same"""
+    """tuples to a chunked dataset folder (see pcse_gym/dataset.py) while the data is generated"""
     file_type: Optional[str] = None
 
     """Policy name if using a policy in the policies.py file"""
@@ -64,15 +66,15 @@ class DataArgs(utils.Args):
     lon_low: Optional[int] = None
     lon_high: Optional[int] = None
 
-def npz_multiple(envs: gym.Env, args: DataArgs, pols: list[Agent], pols_kwargs: dict[str, str]) -> None:
+    """Number of transitions per chunk when streaming to a chunked dataset with `--file-type chunks`"""
+    chunk_size: int = 65536
+
+
+def _episodes_multiple(envs: list[gym.Env], args: DataArgs, pols: list[Agent], pols_kwargs: list[dict]):
     """
-    Generate data and save in .npz format from environments
+    Run every policy on every farm for all locations and years and yield
+    (farm index, policy index, episode) as each episode completes
     """
-    assert isinstance(args.save_folder, str), f"Folder args.save_folder `{args.save_folder}` must be of type `str`"
-    assert args.save_folder.endswith("/"), f"Folder args.save_folder `{args.save_folder}` must end with `/`"
-    assert isinstance(args.data_file, str), f"File args.data_file `{args.data_file}` must be of type `str`"
-    assert len(pols) == len(pols_kwargs), f"Length of Policies and Policy kwargs do not match."
-
     years = np.arange(start=args.year_low, stop=args.year_high + 1, step=1)
     latitudes = np.arange(start=args.lat_low, stop=args.lat_high + 0.5, step=0.5)
     longitudes = np.arange(start=args.lon_low, stop=args.lon_high + 0.5, step=0.5)
@@ -80,12 +82,6 @@ def npz_multiple(envs: gym.Env, args: DataArgs, pols: list[Agent], pols_kwargs:
     lat_long = [(i, j) for i in latitudes for j in longitudes]
     loc_yr = [[loc, yr] for yr in years for loc in lat_long]
 
-    obs_arr = [[[] for _ in range(len(pols))] for _ in range(len(envs))]
-    next_obs_arr = [[[] for _ in range(len(pols))] for _ in range(len(envs))]
-    action_arr = [[[] for i in range(len(pols))] for _ in range(len(envs))]
-    dones_arr = [[[] for _ in range(len(pols))] for _ in range(len(envs))]
-    rewards_arr = [[[] for _ in range(len(pols))] for _ in range(len(envs))]
-
     for i, env in enumerate(envs):
         for j, pol_constr in enumerate(pols):
 
@@ -111,6 +107,7 @@ def npz_multiple(envs: gym.Env, args: DataArgs, pols: list[Agent], pols_kwargs:
                 else:
                     obs, _ = env.reset(**{"year": pair[1], "location": pair[0]})
 
+                episode = {"obs": [], "next_obs": [], "actions": [], "rewards": [], "dones": []}
                 done = False
                 while not done:
                     if isinstance(pol, Agent) and isinstance(obs, np.ndarray):
@@ -119,33 +116,71 @@ def npz_multiple(envs: gym.Env, args: DataArgs, pols: list[Agent], pols_kwargs:
                     action = pol.get_action(obs)
                     next_obs, reward, done, trunc, _ = env.step(action)
 
-                    obs_arr[i][j].append(utils.obs_to_numpy(obs))
-                    next_obs_arr[i][j].append(utils.obs_to_numpy(next_obs))
-                    action_arr[i][j].append(utils.action_to_numpy(env, action))
-                    dones_arr[i][j].append(np.squeeze(done))
-                    rewards_arr[i][j].append(np.squeeze(reward))
+                    episode["obs"].append(utils.obs_to_numpy(obs))
+                    episode["next_obs"].append(utils.obs_to_numpy(next_obs))
+                    episode["actions"].append(utils.action_to_numpy(env, action))
+                    episode["dones"].append(np.squeeze(done))
+                    episode["rewards"].append(np.squeeze(reward))
                     obs = next_obs
 
                     if done:
                         obs, _ = env.reset()
                         break
 
+                yield i, j, episode
+
             if isinstance(pol, pcse_gym.policies.Policy):
                 env = base_env
             elif isinstance(pol, Agent):
                 env = base_env
 
+
+def npz_multiple(envs: list[gym.Env], args: DataArgs, pols: list[Agent], pols_kwargs: list[dict]) -> None:
+    """
+    Generate data and save in .npz format from environments
+    """
+    assert isinstance(args.save_folder, str), f"Folder args.save_folder `{args.save_folder}` must be of type `str`"
+    assert args.save_folder.endswith("/"), f"Folder args.save_folder `{args.save_folder}` must end with `/`"
+    assert isinstance(args.data_file, str), f"File args.data_file `{args.data_file}` must be of type `str`"
+    assert len(pols) == len(pols_kwargs), f"Length of Policies and Policy kwargs do not match."
+
+    data = {
+        k: [[[] for _ in range(len(pols))] for _ in range(len(envs))]
+        for k in ["obs", "next_obs", "actions", "rewards", "dones"]
+    }
+    for i, j, episode in _episodes_multiple(envs, args, pols, pols_kwargs):
+        for k, v in episode.items():
+            data[k][i][j].extend(v)
+
     np.savez(
         f"{args.save_folder}{args.data_file}.npz",
-        obs=np.array(obs_arr),
-        next_obs=np.array(next_obs_arr),
-        actions=np.array(action_arr),
-        rewards=np.array(rewards_arr),
-        dones=np.array(dones_arr),
-        output_vars=np.array(env.unwrapped.get_output_vars()),
+        obs=np.array(data["obs"]),
+        next_obs=np.array(data["next_obs"]),
+        actions=np.array(data["actions"]),
+        rewards=np.array(data["rewards"]),
+        dones=np.array(data["dones"]),
+        output_vars=np.array(envs[-1].unwrapped.get_output_vars()),
     )
 
 
+def chunks_multiple(envs: list[gym.Env], args: DataArgs, pols: list[Agent], pols_kwargs: list[dict]) -> None:
+    """
+    Generate data and stream it to a chunked dataset in <save_folder><data_file>/,
+    writing the episodes to disk in chunks as they complete. The farm and policy
+    of every transition are saved in the `farm` and `policy` fields
+    """
+    assert isinstance(args.save_folder, str), f"Folder args.save_folder `{args.save_folder}` must be of type `str`"
+    assert args.save_folder.endswith("/"), f"Folder args.save_folder `{args.save_folder}` must end with `/`"
+    assert isinstance(args.data_file, str), f"File args.data_file `{args.data_file}` must be of type `str`"
+    assert len(pols) == len(pols_kwargs), f"Length of Policies and Policy kwargs do not match."
+
+    attrs = {"output_vars": envs[-1].unwrapped.get_output_vars()}
+    with DatasetWriter(f"{args.save_folder}{args.data_file}", chunk_size=args.chunk_size, attrs=attrs) as writer:
+        for i, j, episode in _episodes_multiple(envs, args, pols, pols_kwargs):
+            n = len(episode["obs"])
+            writer.add_episode(farm=np.full(n, i), policy=np.full(n, j), **episode)
+
+
 if __name__ == "__main__":
 
     """
@@ -181,4 +216,7 @@ if __name__ == "__main__":
                 {"state_fpath":"data/Potato_Limited_WK_Rand/PPO/lnpkw-v0__rl_utils__1__1738213417/agent.pt"}, #No total N/Rain 
                 ]"""
 
-    npz_multiple(envs, args, pols, pols_kwargs)
+    if args.file_type == "chunks":
+        chunks_multiple(envs, args, pols, pols_kwargs)
+    else:
+        npz_multiple(envs, args, pols, pols_kwargs)
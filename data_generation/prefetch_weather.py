@@ -0,0 +1,93 @@
+"""
+File for downloading the NASA POWER weather data of a grid or list of sites
+into the weather cache before generating data or training agents, so that
+the environments only load warm cache files
+
+To run: python3 -m data_generation.prefetch_weather --lat-low <Latitude> --lat-high <Latitude> --lon-low <Longitude> --lon-high <Longitude>
+
+"""
+
+import logging
+import tyro
+from dataclasses import dataclass
+from typing import Optional
+
+from pcse.prefetch import grid_sites, prefetch_weather
+
+
+@dataclass
+class PrefetchArgs:
+    """Latitude range, incremented by step"""
+    lat_low: Optional[float] = None
+    lat_high: Optional[float] = None
+    """Longitude range, incremented by step"""
+    lon_low: Optional[float] = None
+    lon_high: Optional[float] = None
+    """Grid step in degrees"""
+    step: float = 0.5
+
+    """File with a `latitude,longitude` site on every line, used with or instead of the grid"""
+    site_file: Optional[str] = None
+
+    """Reference ET model, PM or P"""
+    et_model: str = "PM"
+    """Maximum number of concurrent downloads"""
+    workers: int = 8
+    """Number of processes for processing the downloaded data"""
+    processes: int = 1
+    """Number of retries of a failed download"""
+    retries: int = 3
+    """Seconds to wait before the first retry, doubled on every retry"""
+    backoff: float = 2.0
+    """Timeout of a request in seconds"""
+    timeout: float = 120.0
+    """URL of the NASA POWER daily point API, e.g. a local server for testing"""
+    base_url: Optional[str] = None
+    """Download sites that already have a warm cache file"""
+    force_update: bool = False
+
+
+def get_sites(args: PrefetchArgs) -> list[tuple[float, float]]:
+    """
+    Returns the sites of the grid and the site file
+    """
+    sites = []
+    if None not in (args.lat_low, args.lat_high, args.lon_low, args.lon_high):
+        sites += grid_sites(args.lat_low, args.lat_high, args.lon_low, args.lon_high, step=args.step)
+    if args.site_file is not None:
+        with open(args.site_file) as fp:
+            for line in fp:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    lat, lon = line.split(",")[:2]
+                    sites.append((float(lat), float(lon)))
+    assert len(sites) > 0, "No sites given, specify `--lat-low/high` and `--lon-low/high` or `--site-file`"
+    return sites
+
+
+if __name__ == "__main__":
+    """
+    Runs the weather prefetch
+    """
+    args = tyro.cli(PrefetchArgs)
+    logging.basicConfig(level=logging.INFO)
+
+    results = prefetch_weather(
+        get_sites(args),
+        ETmodel=args.et_model,
+        workers=args.workers,
+        processes=args.processes,
+        retries=args.retries,
+        backoff=args.backoff,
+        timeout=args.timeout,
+        server=args.base_url,
+        force_update=args.force_update,
+    )
+
+    failed = {site: e for site, e in results.items() if isinstance(e, Exception)}
+    warm = sum(1 for fname in results.values() if fname is None)
+    print(f"Prefetched {len(results) - len(failed) - warm} sites, {warm} already cached, {len(failed)} failed")
+    for (lat, lon), e in failed.items():
+        print(f"  ({lat}, {lon}): {e}")
+    if failed:
+        raise SystemExit(1)
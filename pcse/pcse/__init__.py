@@ -49,7 +49,7 @@ from pcse.utils import exceptions, decorators, traitlets, signals
 
 import logging.config
 from pcse.base import ParameterProvider
-from pcse.nasapower import NASAPowerWeatherDataProvider
+from pcse.nasapower import NASAPowerWeatherDataProvider, get_weather_provider
 from pcse import fileinput
 from pcse import agromanager
 from pcse import soil
@@ -16,6 +16,7 @@ from collections.abc import Iterable
 from pcse.base import DispatcherObject, VariableKiosk, ParameterProvider, AncillaryObject
 from pcse.utils.traitlets import HasTraits, Float, Int, Instance, Enum, Bool, Unicode
 from pcse.utils import exceptions as exc
+from pcse.utils.loggers import class_logger, quiet_logger
 from pcse.util import ConfigurationLoader
 from pcse.utils import signals
 from pcse.nasapower import WeatherDataContainer
@@ -82,9 +83,7 @@ class BaseSoilCalendar(HasTraits, DispatcherObject):
             param: soil_end_date   - date identifying soil end
         """
         # set up logging
-        loggername = "%s.%s" % (self.__class__.__module__, self.__class__.__name__)
-
-        self.logger = logging.getLogger(loggername)
+        self.logger = quiet_logger if kiosk.quiet else class_logger(self.__class__)
         self.kiosk = kiosk
         self.soil_name = soil_name
         self.soil_variation = soil_variation
@@ -234,9 +233,7 @@ class BaseCropCalendar(HasTraits, DispatcherObject):
             param max_duration: Integer describing the maximum duration of the crop cycle
         """
         # set up logging
-        loggername = "%s.%s" % (self.__class__.__module__, self.__class__.__name__)
-
-        self.logger = logging.getLogger(loggername)
+        self.logger = quiet_logger if kiosk.quiet else class_logger(self.__class__)
         self.kiosk = kiosk
         self.crop_name = crop_name
         self.crop_variety = crop_variety
@@ -7,10 +7,11 @@ Written by: Allard de Wit (allard.dewit@wur.nl), April 2014
 Modified by Will Solow, 2024
 """
 
-from pcse.base.variablekiosk import VariableKiosk
+from pcse.base.variablekiosk import VariableKiosk, ColumnarVariableKiosk
 from pcse.base.engine import BaseEngine
 from pcse.base.parameter_providers import ParameterProvider, MultiCropDataProvider, MultiSoilDataProvider
 from pcse.base.simulationobject import SimulationObject, AncillaryObject
 from pcse.base.states_rates import StatesTemplate, RatesTemplate, StatesWithImplicitRatesTemplate, ParamTemplate
-from pcse.base.dispatcher import DispatcherObject
+from pcse.base.dispatcher import DispatcherObject, SignalBus
 from pcse.base.timer import Timer
+from pcse.base.outputbuffer import OutputBuffer
@@ -4,10 +4,104 @@ Written by: Allard de Wit (allard.dewit@wur.nl), April 2014
 Modified by Will Solow, 2024
 """
 
+import weakref
+import inspect
+
 from pcse.pydispatch import dispatcher
 from pcse.utils.traitlets import HasTraits
 
 
+class _StrongRef(object):
+    """Reference to a receiver that cannot be weakly referenced, e.g. a
+    builtin function, with the interface of a weak reference."""
+
+    __slots__ = ("receiver",)
+
+    def __init__(self, receiver: callable) -> None:
+        self.receiver = receiver
+
+    def __call__(self) -> callable:
+        return self.receiver
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _StrongRef) and other.receiver == self.receiver
+
+    def __hash__(self) -> int:
+        return hash(self.receiver)
+
+
+def _accepted_arguments(receiver: callable) -> frozenset | None:
+    """Return the names of the keyword arguments that the receiver accepts,
+    or None when it accepts all of them (**kwargs) or its signature is not
+    available."""
+    try:
+        parameters = inspect.signature(receiver).parameters.values()
+    except (TypeError, ValueError):
+        return None
+    names = []
+    for parameter in parameters:
+        if parameter.kind is parameter.VAR_KEYWORD:
+            return None
+        if parameter.kind in (parameter.POSITIONAL_OR_KEYWORD, parameter.KEYWORD_ONLY):
+            names.append(parameter.name)
+    return frozenset(names)
+
+
+class SignalBus(object):
+    """Dispatcher for the signals within a single Engine that calls the
+    receivers directly.
+
+    Like the dispatcher module, receivers are held by weak reference, are
+    called in the order in which they were connected and only receive the
+    keyword arguments (including `signal` and `sender`) they accept. Unlike
+    the dispatcher module, the accepted arguments are determined once when a
+    receiver is connected rather than on every signal, and receivers are
+    looked up by signal only, as all senders share the VariableKiosk of the
+    Engine.
+    """
+
+    def __init__(self) -> None:
+        # signal -> list of (weak reference to receiver, accepted arguments)
+        self.connections = {}
+
+    def connect(self, receiver: callable, signal: str) -> None:
+        """Connect the receiver to the signal, replacing an earlier connection
+        of the same receiver.
+        """
+        if inspect.ismethod(receiver):
+            ref = weakref.WeakMethod(receiver)
+        else:
+            try:
+                ref = weakref.ref(receiver)
+            except TypeError:
+                ref = _StrongRef(receiver)
+        accepted = _accepted_arguments(receiver)
+
+        receivers = self.connections.setdefault(signal, [])
+        # Drop an earlier connection of this receiver and receivers that no longer exist
+        # (a weak reference to an object equals a WeakMethod of one of its methods,
+        # so the types are compared as well)
+        receivers[:] = [(r, a) for r, a in receivers if r() is not None and not (type(r) is type(ref) and r == ref)]
+        receivers.append((ref, accepted))
+
+    def send(self, signal: str, sender: object, *args: list, **kwargs: dict) -> None:
+        """Send the signal to all receivers that are connected to it."""
+        kwargs["signal"] = signal
+        kwargs["sender"] = sender
+        for ref, accepted in self.connections.get(signal, ()):
+            receiver = ref()
+            if receiver is None:
+                continue
+            if accepted is None:
+                receiver(*args, **kwargs)
+                continue
+            names = accepted.intersection(kwargs)
+            if names:
+                receiver(*args, **{name: kwargs[name] for name in names})
+            else:
+                receiver(*args)
+
+
 class DispatcherObject(object):
     """Class only defines the _send_signal() and _connect_signal() methods.
 
@@ -19,10 +113,15 @@ class DispatcherObject(object):
 
         The VariableKiosk of this SimulationObject is used as the sender of
         the signal. Additional arguments to the _send_signal() method are
-        passed to dispatcher.send()
+        passed to dispatcher.send(), or to the SignalBus of the kiosk when the
+        Engine uses direct signal dispatch.
         """
+        bus = self.kiosk.signal_bus
+        if bus is not None:
+            bus.send(signal, self.kiosk, *args, **kwargs)
+            return
 
-        self.logger.debug("Sent signal: %s" % signal)
+        self.logger.debug("Sent signal: %s", signal)
         dispatcher.send(signal=signal, sender=self.kiosk, *args, **kwargs)
 
     def _connect_signal(self, handler: HasTraits, signal: str) -> None:
@@ -33,5 +132,34 @@ class DispatcherObject(object):
         in the same runtime environment will not react to each others signals.
         """
 
-        dispatcher.connect(handler, signal, sender=self.kiosk)
-        self.logger.debug("Connected handler '%s' to signal '%s'." % (handler, signal))
+        bus = self.kiosk.signal_bus
+        if bus is not None:
+            bus.connect(handler, signal)
+        else:
+            dispatcher.connect(handler, signal, sender=self.kiosk)
+        self.logger.debug("Connected handler '%s' to signal '%s'.", handler, signal)
+
+    def _get_connections(self) -> dict:
+        """Return a copy of the receivers connected to signals sent by the
+        VariableKiosk of this object, as a dict of signal -> receivers.
+        """
+        bus = self.kiosk.signal_bus
+        if bus is not None:
+            signals = bus.connections
+        else:
+            signals = dispatcher.connections.get(id(self.kiosk), {})
+        return {signal: list(receivers) for signal, receivers in signals.items()}
+
+    def _set_connections(self, connections: dict) -> None:
+        """Replace the receivers connected to signals sent by the VariableKiosk
+        of this object with `connections` as returned by _get_connections().
+
+        Receivers that are not part of `connections` are disconnected so that
+        objects which are no longer part of the simulation stop responding.
+        """
+        connections = {signal: list(receivers) for signal, receivers in connections.items()}
+        bus = self.kiosk.signal_bus
+        if bus is not None:
+            bus.connections = connections
+        else:
+            dispatcher.connections[id(self.kiosk)] = connections
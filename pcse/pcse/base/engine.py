@@ -13,11 +13,17 @@ import logging
 from pcse.utils.traitlets import HasTraits
 from pcse.base.dispatcher import DispatcherObject
 from pcse.base.simulationobject import SimulationObject
+from pcse.utils.loggers import class_logger, quiet_logger
 
 
 class BaseEngine(HasTraits, DispatcherObject):
     """Base Class for Engine to inherit from"""
 
+    # Cached tuple of sub-SimulationObjects, rebuilt when invalidated by __setattr__
+    _sub_sim_objects = None
+    # Version of the hierarchy in the kiosk and all SimulationObjects in pre-order
+    _simulation_objects = (None, ())
+
     def __init__(self):
         """Initialize class `BaseEngine`"""
         HasTraits.__init__(self)
@@ -26,8 +32,10 @@ class BaseEngine(HasTraits, DispatcherObject):
     @property
     def logger(self) -> logging.Logger:
         """Initialize logger object"""
-        loggername = "%s.%s" % (self.__class__.__module__, self.__class__.__name__)
-        return logging.getLogger(loggername)
+        kiosk = self.kiosk
+        if kiosk is not None and kiosk.quiet:
+            return quiet_logger
+        return class_logger(self.__class__)
 
     def __setattr__(self, attr, value) -> None:
         """Sets the attribute with the value to a specific sublcass object
@@ -48,22 +56,51 @@ class BaseEngine(HasTraits, DispatcherObject):
         if attr.startswith("_") or type(value) is types.FunctionType:
             HasTraits.__setattr__(self, attr, value)
         elif hasattr(self, attr):
+            if isinstance(value, SimulationObject) or isinstance(self._trait_values.get(attr), SimulationObject):
+                self._sub_sim_objects = None
+                if self.kiosk is not None:
+                    self.kiosk.simobjects_version += 1
             HasTraits.__setattr__(self, attr, value)
         else:
             msg = "Assignment to non-existing attribute '%s' prevented." % attr
             raise AttributeError(msg)
 
     @property
-    def subSimObjects(self) -> list[SimulationObject]:
-        """Find SimulationObjects embedded within self."""
-
-        subSimObjects = []
-        defined_traits = self.__dict__["_trait_values"]
-        for attr in defined_traits.values():
-            if isinstance(attr, SimulationObject):
-                subSimObjects.append(attr)
+    def subSimObjects(self) -> tuple[SimulationObject]:
+        """Find SimulationObjects embedded within self.
+
+        The tuple is cached until a SimulationObject attribute is assigned or
+        removed through `__setattr__()`.
+        """
+        subSimObjects = self._sub_sim_objects
+        if subSimObjects is None:
+            defined_traits = self.__dict__["_trait_values"]
+            subSimObjects = tuple(attr for attr in defined_traits.values() if isinstance(attr, SimulationObject))
+            self._sub_sim_objects = subSimObjects
         return subSimObjects
 
+    def simulation_objects(self) -> tuple[SimulationObject]:
+        """Return all SimulationObjects in the hierarchy below the engine in
+        pre-order, i.e. the order in which a recursive walk over the
+        subSimObjects visits them.
+
+        The tuple is rebuilt only when a SimulationObject was added to or
+        removed from the hierarchy since the last call, as tracked by the
+        `simobjects_version` of the kiosk.
+        """
+        version, objects = self._simulation_objects
+        if version != self.kiosk.simobjects_version:
+            version = self.kiosk.simobjects_version
+            found = []
+            stack = list(reversed(self.subSimObjects))
+            while stack:
+                simobj = stack.pop()
+                found.append(simobj)
+                stack.extend(reversed(simobj.subSimObjects))
+            objects = tuple(found)
+            self._simulation_objects = (version, objects)
+        return objects
+
     def get_variable(self, varname: str) -> object:
         """Return the value of the specified state or rate variable.
 
@@ -96,7 +133,7 @@ class BaseEngine(HasTraits, DispatcherObject):
 
     def zerofy(self) -> None:
         """Zerofy the value of all rate variables of any sub-SimulationObjects."""
-        # Walk over possible sub-simulation objects.
-        if self.subSimObjects is not None:
-            for simobj in self.subSimObjects:
-                simobj.zerofy()
+        # Walk over the flattened hierarchy instead of recursing through it
+        for simobj in self.simulation_objects():
+            if simobj.rates is not None:
+                simobj.rates.zerofy()
@@ -0,0 +1,90 @@
+"""Ring buffer holding the daily output of an Engine as NumPy arrays.
+"""
+
+from datetime import date
+import numpy as np
+
+
+class OutputBuffer(object):
+    """Columnar ring buffer for the last `capacity` days of model output.
+
+    :param varnames: names of the variables stored in the buffer
+    :param capacity: maximum number of days held by the buffer
+
+    Every day is stored as one row of a float array with a column per
+    variable, plus the date in a separate datetime64 array. Values that are
+    not numeric (None, dates, deques, strings) are stored as NaN.
+
+    Rows are written twice, at `i` and `i + capacity`, so that the last `k`
+    days are always a contiguous block and can be returned as views on the
+    buffer rather than copies. The views are only valid until the next day
+    is appended, use `export()` for data that should be kept.
+    """
+
+    def __init__(self, varnames: list[str], capacity: int) -> None:
+        self.varnames = tuple(varnames)
+        self.capacity = int(capacity)
+        self._columns = {var: i for i, var in enumerate(self.varnames)}
+        self._values = np.full((2 * self.capacity, len(self.varnames)), np.nan)
+        self._days = np.zeros((2 * self.capacity,), dtype="datetime64[D]")
+        self._count = 0
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    def append(self, day: date, values: list) -> None:
+        """Appends the values of `varnames` for `day`, overwriting the oldest
+        day when the buffer is full.
+        """
+        i = self._count % self.capacity
+        row = self._values[i]
+        try:
+            row[:] = values
+        except (TypeError, ValueError):
+            row[:] = [v if isinstance(v, (int, float)) else np.nan for v in values]
+        self._values[i + self.capacity] = row
+        self._days[i] = self._days[i + self.capacity] = day
+        self._count += 1
+
+    def clear(self) -> None:
+        """Removes all days from the buffer."""
+        self._count = 0
+
+    def _window(self, k: int = None) -> slice:
+        """Returns the slice of rows holding the last `k` days, oldest first."""
+        n = len(self)
+        k = n if k is None else min(max(int(k), 0), n)
+        end = self._count % self.capacity + self.capacity
+        return slice(end - k, end)
+
+    def days(self, k: int = None) -> np.ndarray:
+        """Returns a view on the dates of the last `k` days (default all)."""
+        return self._days[self._window(k)]
+
+    def values(self, k: int = None) -> np.ndarray:
+        """Returns a view of shape (k, len(varnames)) on the last `k` days (default all)."""
+        return self._values[self._window(k)]
+
+    def get(self, varname: str, k: int = None) -> np.ndarray:
+        """Returns a view on the values of `varname` for the last `k` days (default all)."""
+        return self._values[self._window(k), self._columns[varname]]
+
+    def export(self) -> dict[str, np.ndarray]:
+        """Returns a copy of all days in the buffer as a dictionary with an
+        array per variable and the dates under 'day'.
+        """
+        window = self._window()
+        output = {"day": self._days[window].copy()}
+        for var, i in self._columns.items():
+            output[var] = self._values[window, i].copy()
+        return output
+
+    def snapshot(self) -> tuple:
+        """Returns the contents of the buffer for `restore()`."""
+        return self._values.copy(), self._days.copy(), self._count
+
+    def restore(self, snapshot: tuple) -> None:
+        """Restores the contents returned by `snapshot()`."""
+        values, days, self._count = snapshot
+        self._values[:] = values
+        self._days[:] = days
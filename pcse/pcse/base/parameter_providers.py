@@ -5,10 +5,10 @@ Written by: Allard de Wit (allard.dewit@wur.nl), April 2014
 Modified by Will Solow, 2024
 """
 
-import logging
 from collections import Counter
 from collections.abc import MutableMapping
 from pcse.utils import exceptions as exc
+from pcse.utils.loggers import class_logger
 
 
 class MultiCropDataProvider(dict):
@@ -155,8 +155,7 @@ class ParameterProvider(MutableMapping):
 
     @property
     def logger(self):
-        loggername = "%s.%s" % (self.__class__.__module__, self.__class__.__name__)
-        return logging.getLogger(loggername)
+        return class_logger(self.__class__)
 
     def set_override(self, varname: str, value: object, check: bool = True) -> None:
         """ "Override the value of parameter varname in the parameterprovider.
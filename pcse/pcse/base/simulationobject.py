@@ -14,6 +14,7 @@ from datetime import date
 from pcse.base.dispatcher import DispatcherObject
 from pcse.utils.traitlets import HasTraits, Instance, Dict
 from pcse.utils import exceptions as exc
+from pcse.utils.loggers import class_logger, quiet_logger
 from pcse.base.variablekiosk import VariableKiosk
 from pcse.base.states_rates import StatesTemplate, RatesTemplate, ParamTemplate
 from pcse.base.parameter_providers import ParameterProvider
@@ -41,6 +42,9 @@ class SimulationObject(HasTraits, DispatcherObject):
     # Placeholder for variables that are to be set during finalizing.
     _for_finalize = Dict()
 
+    # Cached tuple of sub-SimulationObjects, rebuilt when invalidated by __setattr__
+    _sub_sim_objects = None
+
     def __init__(self, day: date, kiosk: VariableKiosk, *args: list, **kwargs: dict) -> None:
         """Initialize Simulation Object
 
@@ -65,7 +69,7 @@ class SimulationObject(HasTraits, DispatcherObject):
         self.kiosk = kiosk
 
         self.initialize(day, kiosk, *args, **kwargs)
-        self.logger.debug("Component successfully initialized on %s!" % day)
+        self.logger.debug("Component successfully initialized on %s!", day)
 
     def initialize(self, *args, **kwargs):
         msg = "`initialize` method not yet implemented on %s" % self.__class__.__name__
@@ -73,8 +77,10 @@ class SimulationObject(HasTraits, DispatcherObject):
 
     @property
     def logger(self) -> logging.Logger:
-        loggername = "%s.%s" % (self.__class__.__module__, self.__class__.__name__)
-        return logging.getLogger(loggername)
+        kiosk = self.kiosk
+        if kiosk is not None and kiosk.quiet:
+            return quiet_logger
+        return class_logger(self.__class__)
 
     def reset(self) -> None:
         """
@@ -110,11 +116,21 @@ class SimulationObject(HasTraits, DispatcherObject):
         if attr.startswith("_") or type(value) is types.FunctionType:
             HasTraits.__setattr__(self, attr, value)
         elif hasattr(self, attr):
+            if isinstance(value, SimulationObject) or isinstance(self._trait_values.get(attr), SimulationObject):
+                self._invalidate_sub_sim_objects()
             HasTraits.__setattr__(self, attr, value)
         else:
             msg = "Assignment to non-existing attribute '%s' prevented." % attr
             raise AttributeError(msg)
 
+    def _invalidate_sub_sim_objects(self) -> None:
+        """Drop the cached sub-SimulationObjects of this object and signal
+        the Engine that the hierarchy of SimulationObjects has changed.
+        """
+        self._sub_sim_objects = None
+        if self.kiosk is not None:
+            self.kiosk.simobjects_version += 1
+
     def get_variable(self, varname: str) -> object:
         """Return the value of the specified state or rate variable.
 
@@ -201,14 +217,17 @@ class SimulationObject(HasTraits, DispatcherObject):
             obj._delete()
 
     @property
-    def subSimObjects(self) -> list[DispatcherObject]:
-        """Return SimulationObjects embedded within self."""
-
-        subSimObjects = []
-        defined_traits = self.__dict__["_trait_values"]
-        for attr in defined_traits.values():
-            if isinstance(attr, SimulationObject):
-                subSimObjects.append(attr)
+    def subSimObjects(self) -> tuple[DispatcherObject]:
+        """Return SimulationObjects embedded within self.
+
+        The tuple is cached until a SimulationObject attribute is assigned or
+        removed through `__setattr__()`.
+        """
+        subSimObjects = self._sub_sim_objects
+        if subSimObjects is None:
+            defined_traits = self.__dict__["_trait_values"]
+            subSimObjects = tuple(attr for attr in defined_traits.values() if isinstance(attr, SimulationObject))
+            self._sub_sim_objects = subSimObjects
         return subSimObjects
 
     def finalize(self, day: date) -> None:
@@ -284,8 +303,10 @@ class AncillaryObject(HasTraits, DispatcherObject):
 
     @property
     def logger(self) -> logging.Logger:
-        loggername = "%s.%s" % (self.__class__.__module__, self.__class__.__name__)
-        return logging.getLogger(loggername)
+        kiosk = self.kiosk
+        if kiosk is not None and kiosk.quiet:
+            return quiet_logger
+        return class_logger(self.__class__)
 
     def __setattr__(self, attr, value):
         """Set attribute of variable to specified value"""
@@ -9,10 +9,12 @@ Modified by Will Solow, 2024
 """
 
 import logging
+from operator import attrgetter
 import numpy as np
 
-from pcse.utils.traitlets import HasTraits, Float, Int, Instance, Bool, All
+from pcse.utils.traitlets import HasTraits, Float, Int, Instance, Bool, All, Undefined
 from pcse.utils import exceptions as exc
+from pcse.utils.loggers import class_logger
 from pcse.base.variablekiosk import VariableKiosk
 from pcse.util import Afgen
 
@@ -113,6 +115,16 @@ class StatesRatesCommon(HasTraits):
     _valid_vars = Instance(set)
     _locked = Bool(False)
 
+    def __new__(cls, kiosk: VariableKiosk = None, publish: list | str | tuple = None, **kwargs: dict):
+        """Create an instance of the compiled version of the template when
+        the kiosk asks for compiled templates, see `compile_template()`.
+        """
+        if getattr(kiosk, "compiled_templates", False) and not issubclass(
+            cls, (CompiledTemplateMixin, StatesWithImplicitRatesTemplate)
+        ):
+            cls = compile_template(cls, check_publish(publish))
+        return HasTraits.__new__(cls, kiosk, publish, **kwargs)
+
     def __init__(self, kiosk: VariableKiosk = None, publish: list | str | tuple = None) -> None:
         """Set up the common stuff for the states and rates template
         including variables that have to be published in the kiosk
@@ -196,8 +208,7 @@ class StatesRatesCommon(HasTraits):
 
     @property
     def logger(self) -> logging.Logger:
-        loggername = "%s.%s" % (self.__class__.__module__, self.__class__.__name__)
-        return logging.getLogger(loggername)
+        return class_logger(self.__class__)
 
 
 class StatesTemplate(StatesRatesCommon):
@@ -418,3 +429,104 @@ class RatesTemplate(StatesRatesCommon):
         or False (Boolean).
         """
         self._trait_values.update(self._rate_vars_zero)
+
+
+class CompiledTemplateMixin(object):
+    """Mixin for the compiled version of a States/Rates template.
+
+    The compiled class stores the variables in `__slots__` instead of
+    traits. Unpublished variables are plain slots, published variables are
+    properties that write the value directly to the kiosk. Values are
+    validated by their trait when the template is constructed, but not on
+    later assignments.
+    """
+
+    __slots__ = ()
+
+    # Set on the generated class by compile_template()
+    _template_class = None
+    _compiled_storage = {}
+
+    def __init__(self, kiosk: VariableKiosk = None, publish: list | str | tuple = None, **kwargs: dict) -> None:
+        """Initialize all slots to the default value of their trait and
+        validate the initial values before setting up the template.
+        """
+        traits = self._template_class.class_traits()
+        for name, storage in self._compiled_storage.items():
+            default = getattr(traits[name], "default_value", None)
+            object.__setattr__(self, storage, None if default is Undefined else default)
+        for name, value in kwargs.items():
+            if name in traits:
+                kwargs[name] = traits[name]._validate(self, value)
+        self._template_class.__init__(self, kiosk, publish, **kwargs)
+
+    def traits(self, **metadata: dict) -> dict:
+        """Returns the traits of the template class that was compiled."""
+        return self._template_class.class_traits(**metadata)
+
+    def _register_with_kiosk(self, publish: set) -> None:
+        """Register the variables with the variable kiosk. Published variables
+        are written to the kiosk by their property, so no observer is needed.
+        """
+        for attr in self._valid_vars:
+            if attr in publish:
+                publish.remove(attr)
+                self._kiosk.register_variable(id(self), attr, type=self._vartype, publish=True)
+            else:
+                self._kiosk.register_variable(id(self), attr, type=self._vartype, publish=False)
+        if len(publish) > 0:
+            msg = ("Unknown variable(s) specified with the publish " + "keyword: %s") % publish
+            raise exc.PCSEError(msg)
+
+    def zerofy(self) -> None:
+        """Sets the values of all rate values to zero (Int, Float)
+        or False (Boolean), without writing them to the kiosk.
+        """
+        storage = self._compiled_storage
+        for name, value in self._rate_vars_zero.items():
+            object.__setattr__(self, storage[name], value)
+
+
+# Cache of compiled template classes by (template class, published variables)
+_compiled_templates = {}
+
+
+def _published_property(name: str, storage: str) -> property:
+    """Returns a property for published variable `name` that stores the value
+    in slot `storage` and publishes it in the kiosk.
+    """
+
+    def fset(self, value: object) -> None:
+        object.__setattr__(self, storage, value)
+        self._kiosk.set_variable(id(self), name, value)
+
+    return property(attrgetter(storage), fset)
+
+
+def compile_template(cls: type, publish: set) -> type:
+    """Returns the compiled version of States/Rates template `cls` for the
+    given set of published variables.
+
+    Compiled templates are used when the model configuration has
+    `TEMPLATES = "compiled"`. They keep the API of the template but avoid the
+    traitlets validation and notification machinery on every assignment.
+    """
+    key = (cls, frozenset(publish))
+    if key in _compiled_templates:
+        return _compiled_templates[key]
+
+    valid = [name for name in cls.class_traits() if not (name.startswith("_") or name.startswith("trait"))]
+    storage = {name: ("_v_%s" % name if name in publish else name) for name in valid}
+    namespace = {
+        "__slots__": tuple(storage.values()) + ("_kiosk", "_valid_vars", "_locked"),
+        "__module__": cls.__module__,
+        "_template_class": cls,
+        "_compiled_storage": storage,
+    }
+    for name in valid:
+        if name in publish:
+            namespace[name] = _published_property(name, storage[name])
+
+    compiled = type("Compiled%s" % cls.__name__, (CompiledTemplateMixin, cls), namespace)
+    _compiled_templates[key] = compiled
+    return compiled
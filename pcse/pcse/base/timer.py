@@ -81,11 +81,11 @@ class Timer(AncillaryObject):
         # On first call only return the current date, do not increase time
         if self.first_call is True:
             self.first_call = False
-            self.logger.debug("Model time at first call: %s" % self.current_date)
+            self.logger.debug("Model time at first call: %s", self.current_date)
         else:
             self.current_date += self.time_step
             self.day_counter += 1
-            self.logger.debug("Model time updated to: %s" % self.current_date)
+            self.logger.debug("Model time updated to: %s", self.current_date)
 
         # Check if output should be generated
         output = False
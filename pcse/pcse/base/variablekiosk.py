@@ -5,6 +5,8 @@ Written by: Allard de Wit (allard.dewit@wur.nl), April 2014
 Modified by Will Solow, 2024
 """
 
+import numpy as np
+
 from pcse.utils import exceptions as exc
 
 
@@ -86,6 +88,15 @@ class VariableKiosk(dict):
           - variable VAR3, value: undefined
     """
 
+    # Set by the Engine when States/Rates templates should be compiled
+    compiled_templates = False
+    # SignalBus set by the Engine when signals are dispatched directly
+    signal_bus = None
+    # Incremented when SimulationObjects are added to or removed from the hierarchy
+    simobjects_version = 0
+    # Set by the Engine to discard the log messages of its components
+    quiet = False
+
     def __init__(self) -> None:
         """Initialize the class `VariableKiosk`"""
         dict.__init__(self)
@@ -235,3 +246,204 @@ class VariableKiosk(dict):
         """flush the values of all state variable from the kiosk."""
         for key in self.published_states.keys():
             self.pop(key, None)
+
+    def snapshot(self, copy_value: callable = None) -> tuple:
+        """Returns the registrations and values of the kiosk for `restore()`.
+
+        :param copy_value: optional function used to copy mutable values
+        """
+        copy_value = copy_value or (lambda v: v)
+        registrations = (
+            dict(self.registered_states),
+            dict(self.registered_rates),
+            dict(self.published_states),
+            dict(self.published_rates),
+        )
+        return registrations, {k: copy_value(v) for k, v in dict.items(self)}
+
+    def restore(self, snapshot: tuple, copy_value: callable = None) -> None:
+        """Restores the registrations and values returned by `snapshot()`.
+
+        :param copy_value: optional function used to copy mutable values
+        """
+        copy_value = copy_value or (lambda v: v)
+        registrations, values = snapshot
+        self._restore_registrations(registrations)
+        dict.clear(self)
+        dict.update(self, {k: copy_value(v) for k, v in values.items()})
+
+    def _restore_registrations(self, registrations: tuple) -> None:
+        """Restores copies of the registration dictionaries."""
+        self.registered_states = dict(registrations[0])
+        self.registered_rates = dict(registrations[1])
+        self.published_states = dict(registrations[2])
+        self.published_rates = dict(registrations[3])
+
+
+class ColumnarVariableKiosk(VariableKiosk):
+    """VariableKiosk that stores the values of published variables in arrays.
+
+    Each published variable is assigned a slot when it is registered. Float
+    values are stored in a preallocated NumPy array, any other value (ints,
+    dates, deques, arrays) in an object side-table. A boolean mask tracks
+    which slots hold a value, so that flushing the states or rates is a single
+    mask update and a snapshot of the kiosk is a copy of a few arrays.
+
+    The registration logic and the access checks are the same as for the
+    `VariableKiosk`, which this class can replace transparently. It is
+    selected with `KIOSK = "columnar"` in the model configuration.
+    """
+
+    _initial_size = 64
+
+    def __init__(self) -> None:
+        """Initialize the class `ColumnarVariableKiosk`"""
+        VariableKiosk.__init__(self)
+        self._slots = {}
+        self._owners = []
+        self._free_slots = []
+        self._values = np.zeros(self._initial_size)
+        self._objects = [None] * self._initial_size
+        self._is_set = np.zeros(self._initial_size, dtype=bool)
+        self._is_object = np.zeros(self._initial_size, dtype=bool)
+        self._is_state = np.zeros(self._initial_size, dtype=bool)
+
+    def __getitem__(self, item: str) -> object:
+        slot = self._slots.get(item)
+        if slot is None or not self._is_set[slot]:
+            raise KeyError(item)
+        if self._is_object[slot]:
+            return self._objects[slot]
+        return float(self._values[slot])
+
+    def __contains__(self, item: str) -> bool:
+        """Checks if a value has been published for variable item."""
+        slot = self._slots.get(item)
+        return slot is not None and bool(self._is_set[slot])
+
+    def __getattr__(self, item: str) -> object:
+        """Allow use of attribute notation (eg "kiosk.LAI") on published rates or states."""
+        if item.startswith("_"):
+            raise AttributeError(item)
+        return self[item]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return int(self._is_set.sum())
+
+    def keys(self) -> list[str]:
+        return [varname for varname, slot in self._slots.items() if self._is_set[slot]]
+
+    def values(self) -> list[object]:
+        return [self[varname] for varname in self.keys()]
+
+    def items(self) -> list[tuple[str, object]]:
+        return [(varname, self[varname]) for varname in self.keys()]
+
+    def get(self, item: str, default: object = None) -> object:
+        return self[item] if item in self else default
+
+    def pop(self, item: str, *default: object) -> object:
+        if item in self:
+            value = self[item]
+            self._is_set[self._slots[item]] = False
+            return value
+        if default:
+            return default[0]
+        raise KeyError(item)
+
+    def register_variable(self, oid: int, varname: str, type: str, publish: bool = False) -> None:
+        """Register a varname from object with id, with given type and assign
+        a slot to it when it is published. See `VariableKiosk.register_variable()`
+        """
+        VariableKiosk.register_variable(self, oid, varname, type, publish)
+        if publish is True:
+            slot = self._free_slots.pop() if self._free_slots else self._new_slot()
+            self._slots[varname] = slot
+            self._owners[slot] = oid
+            self._is_set[slot] = False
+            self._is_state[slot] = type.upper() == "S"
+
+    def deregister_variable(self, oid: int, varname: str) -> None:
+        """Object with id(object) asks to deregister varname from kiosk and
+        releases its slot. See `VariableKiosk.deregister_variable()`
+        """
+        VariableKiosk.deregister_variable(self, oid, varname)
+        slot = self._slots.pop(varname, None)
+        if slot is not None:
+            self._owners[slot] = None
+            self._objects[slot] = None
+            self._is_set[slot] = False
+            self._free_slots.append(slot)
+
+    def _new_slot(self) -> int:
+        """Returns the next unused slot, growing the arrays when full."""
+        slot = len(self._owners)
+        if slot == len(self._values):
+            size = 2 * len(self._values)
+            self._values = np.resize(self._values, size)
+            self._objects.extend([None] * (size - slot))
+            for name in ("_is_set", "_is_object", "_is_state"):
+                grown = np.zeros(size, dtype=bool)
+                grown[:slot] = getattr(self, name)
+                setattr(self, name, grown)
+        self._owners.append(None)
+        return slot
+
+    def set_variable(self, id: int, varname: str, value: object) -> None:
+        """Let object with id, set the value of variable varname
+
+        :param id: Object id (from python builtin id() function) of the
+            state/rate object registering this variable.
+        :param varname: Name of the variable to be updated
+        :param value: Value to be assigned to the variable.
+        """
+        slot = self._slots.get(varname)
+        if slot is None:
+            msg = "Variable '%s' not published in VariableKiosk."
+            raise exc.VariableKioskError(msg % varname)
+        if self._owners[slot] != id:
+            msg = "Unregistered object tried to set the value " + "of variable '%s': access denied."
+            raise exc.VariableKioskError(msg % varname)
+
+        if type(value) is float:
+            self._values[slot] = value
+            self._is_object[slot] = False
+        else:
+            self._objects[slot] = value
+            self._is_object[slot] = True
+        self._is_set[slot] = True
+
+    def flush_rates(self) -> None:
+        """flush the values of all published rate variable from the kiosk."""
+        self._is_set &= self._is_state
+
+    def flush_states(self) -> None:
+        """flush the values of all state variable from the kiosk."""
+        self._is_set &= ~self._is_state
+
+    def snapshot(self, copy_value: callable = None) -> tuple:
+        """Returns the registrations and values of the kiosk for `restore()`.
+
+        :param copy_value: optional function used to copy mutable values
+        """
+        copy_value = copy_value or (lambda v: v)
+        registrations, _ = VariableKiosk.snapshot(self)
+        arrays = (self._values.copy(), self._is_set.copy(), self._is_object.copy(), self._is_state.copy())
+        objects = [copy_value(v) if v is not None else None for v in self._objects]
+        slots = (dict(self._slots), list(self._owners), list(self._free_slots))
+        return registrations, slots, arrays, objects
+
+    def restore(self, snapshot: tuple, copy_value: callable = None) -> None:
+        """Restores the registrations and values returned by `snapshot()`.
+
+        :param copy_value: optional function used to copy mutable values
+        """
+        copy_value = copy_value or (lambda v: v)
+        registrations, slots, arrays, objects = snapshot
+        self._restore_registrations(registrations)
+        self._slots, self._owners, self._free_slots = dict(slots[0]), list(slots[1]), list(slots[2])
+        self._values, self._is_set, self._is_object, self._is_state = (a.copy() for a in arrays)
+        self._objects = [copy_value(v) if v is not None else None for v in objects]
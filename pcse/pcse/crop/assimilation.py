@@ -8,12 +8,24 @@ from __future__ import print_function
 from math import sqrt, exp, cos, pi
 from collections import deque
 from datetime import date
+import numpy as np
 
 from pcse.utils.traitlets import Instance, Float
 from pcse.util import astro, AfgenTrait
 from pcse.base import ParamTemplate, SimulationObject, VariableKiosk
 from pcse.nasapower import WeatherDataContainer
 
+# Gauss points and weights of the three-point integrations over the day and
+# over the depth of the canopy
+XGAUSS = (0.1127017, 0.5000000, 0.8872983)
+WGAUSS = (0.2777778, 0.4444444, 0.2777778)
+
+# Scattering coefficient of leaves for visible radiation and the derived
+# reflection coefficient of a canopy with horizontal leaves
+SCV = 0.2
+SQV = sqrt(1.0 - SCV)
+REFH = (1.0 - SQV) / (1.0 + SQV)
+
 
 def totass(
     DAYL: float,
@@ -59,22 +71,51 @@ def totass(
     Date   : September 2011
     """
 
-    # Gauss points and weights
-    XGAUSS = [0.1127017, 0.5000000, 0.8872983]
-    WGAUSS = [0.2777778, 0.4444444, 0.2777778]
-
     # calculation of assimilation is done only when it will not be zero
     # (AMAX >0, LAI >0, DAYL >0)
     DTGA = 0.0
     if AMAX > 0.0 and LAI > 0.0 and DAYL > 0.0:
+        # The integration over the canopy of assim() is inlined with the terms
+        # that do not depend on the time of day or depth taken out of the loops
+        AMAX2 = max(2.0, AMAX)
+        LAIC = [LAI * x for x in XGAUSS]
+        EKDIF = [exp(-KDIF * laic) for laic in LAIC]
         for i in range(3):
             HOUR = 12.0 + 0.5 * DAYL * XGAUSS[i]
             SINB = max(0.0, SINLD + COSLD * cos(2.0 * pi * (HOUR + 12.0) / 24.0))
             PAR = 0.5 * AVRAD * SINB * (1.0 + 0.4 * SINB) / DSINBE
             PARDIF = min(PAR, SINB * DIFPP)
             PARDIR = PAR - PARDIF
-            FGROS = assim(AMAX, EFF, LAI, KDIF, SINB, PARDIR, PARDIF)
-            DTGA += FGROS * WGAUSS[i]
+
+            # extinction coefficients KDIF, KDIRBL, KDIRT
+            REFS = REFH * 2.0 / (1.0 + 1.6 * SINB)
+            KDIRBL = (0.5 / SINB) * KDIF / (0.8 * SQV)
+            KDIRT = KDIRBL * SQV
+            VISPP = (1.0 - SCV) * PARDIR / SINB
+
+            FGROS = 0.0
+            for j in range(3):
+                # absorbed diffuse radiation (VISDF),light from direct
+                # origine (VIST) and direct light (VISD)
+                VISDF = (1.0 - REFS) * PARDIF * KDIF * EKDIF[j]
+                VIST = (1.0 - REFS) * PARDIR * KDIRT * exp(-KDIRT * LAIC[j])
+                FSLLA = exp(-KDIRBL * LAIC[j])
+                VISD = (1.0 - SCV) * PARDIR * KDIRBL * FSLLA
+
+                # absorbed flux in W/m2 for shaded leaves and assimilation
+                VISSHD = VISDF + VIST - VISD
+                FGRSH = AMAX * (1.0 - exp(-VISSHD * EFF / AMAX2))
+
+                # assimilation of sunlit leaf area
+                if VISPP <= 0.0:
+                    FGRSUN = FGRSH
+                else:
+                    FGRSUN = AMAX * (1.0 - (AMAX - FGRSH) * (1.0 - exp(-VISPP * EFF / AMAX2)) / (EFF * VISPP))
+                # local assimilation rate (FGL) and integration
+                FGL = FSLLA * FGRSUN + (1.0 - FSLLA) * FGRSH
+                FGROS += FGL * WGAUSS[j]
+
+            DTGA += FGROS * LAI * WGAUSS[i]
     DTGA *= DAYL
 
     return DTGA
@@ -99,12 +140,6 @@ def assim(AMAX: float, EFF: float, LAI: float, KDIF: float, SINB: float, PARDIR:
     Python version:
     Allard de Wit, 2011
     """
-    # Gauss points and weights
-    XGAUSS = [0.1127017, 0.5000000, 0.8872983]
-    WGAUSS = [0.2777778, 0.4444444, 0.2777778]
-
-    SCV = 0.2
-
     # 13.2 extinction coefficients KDIF, KDIRBL, KDIRT
     REFH = (1.0 - sqrt(1.0 - SCV)) / (1.0 + sqrt(1.0 - SCV))
     REFS = REFH * 2.0 / (1.0 + 1.6 * SINB)
@@ -145,6 +180,92 @@ def assim(AMAX: float, EFF: float, LAI: float, KDIF: float, SINB: float, PARDIR:
     return FGROS
 
 
+def totass_array(
+    DAYL: np.ndarray,
+    AMAX: np.ndarray,
+    EFF: np.ndarray,
+    LAI: np.ndarray,
+    KDIF: np.ndarray,
+    AVRAD: np.ndarray,
+    DIFPP: np.ndarray,
+    DSINBE: np.ndarray,
+    SINLD: np.ndarray,
+    COSLD: np.ndarray,
+) -> np.ndarray:
+    """Array version of `totass()` computing the daily total gross CO2
+    assimilation (DTGA) for many fields and/or days at once.
+
+    The inputs are arrays (or scalars) that are broadcast against each other,
+    e.g. the crop variables of N fields with the weather of a single day, and
+    the result has the broadcast shape. The Gaussian integrations over the
+    day and over the canopy are done on two extra trailing axes of length 3.
+    See `totass()` for the variables and units.
+    """
+    DAYL, AMAX, EFF, LAI, KDIF, AVRAD, DIFPP, DSINBE, SINLD, COSLD = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (DAYL, AMAX, EFF, LAI, KDIF, AVRAD, DIFPP, DSINBE, SINLD, COSLD))
+    )
+    active = (AMAX > 0.0) & (LAI > 0.0) & (DAYL > 0.0)
+
+    # Times of day on the last axis
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        HOUR = 12.0 + 0.5 * DAYL[..., None] * np.array(XGAUSS)
+        SINB = np.maximum(0.0, SINLD[..., None] + COSLD[..., None] * np.cos(2.0 * pi * (HOUR + 12.0) / 24.0))
+        PAR = 0.5 * AVRAD[..., None] * SINB * (1.0 + 0.4 * SINB) / DSINBE[..., None]
+        PARDIF = np.minimum(PAR, SINB * DIFPP[..., None])
+        PARDIR = PAR - PARDIF
+        FGROS = assim_array(
+            AMAX[..., None], EFF[..., None], LAI[..., None], KDIF[..., None], SINB, PARDIR, PARDIF
+        )
+        DTGA = (FGROS * np.array(WGAUSS)).sum(axis=-1) * DAYL
+
+    return np.where(active, DTGA, 0.0)
+
+
+def assim_array(
+    AMAX: np.ndarray,
+    EFF: np.ndarray,
+    LAI: np.ndarray,
+    KDIF: np.ndarray,
+    SINB: np.ndarray,
+    PARDIR: np.ndarray,
+    PARDIF: np.ndarray,
+) -> np.ndarray:
+    """Array version of `assim()`, the depths in the canopy are integrated
+    over an extra trailing axis of length 3. Called by `totass_array()`.
+    """
+    AMAX, EFF, LAI, KDIF, SINB, PARDIR, PARDIF = (
+        np.asarray(v, dtype=float)[..., None] for v in (AMAX, EFF, LAI, KDIF, SINB, PARDIR, PARDIF)
+    )
+
+    # extinction coefficients KDIF, KDIRBL, KDIRT
+    REFS = REFH * 2.0 / (1.0 + 1.6 * SINB)
+    KDIRBL = (0.5 / SINB) * KDIF / (0.8 * SQV)
+    KDIRT = KDIRBL * SQV
+
+    # three-point Gaussian integration over LAI
+    LAIC = LAI * np.array(XGAUSS)
+    VISDF = (1.0 - REFS) * PARDIF * KDIF * np.exp(-KDIF * LAIC)
+    VIST = (1.0 - REFS) * PARDIR * KDIRT * np.exp(-KDIRT * LAIC)
+    FSLLA = np.exp(-KDIRBL * LAIC)
+    VISD = (1.0 - SCV) * PARDIR * KDIRBL * FSLLA
+
+    # absorbed flux in W/m2 for shaded leaves and assimilation
+    VISSHD = VISDF + VIST - VISD
+    AMAX2 = np.maximum(2.0, AMAX)
+    FGRSH = AMAX * (1.0 - np.exp(-VISSHD * EFF / AMAX2))
+
+    # assimilation of sunlit leaf area
+    VISPP = (1.0 - SCV) * PARDIR / SINB
+    FGRSUN = np.where(
+        VISPP <= 0.0,
+        FGRSH,
+        AMAX * (1.0 - (AMAX - FGRSH) * (1.0 - np.exp(-VISPP * EFF / AMAX2)) / (EFF * VISPP)),
+    )
+    FGL = FSLLA * FGRSUN + (1.0 - FSLLA) * FGRSH
+
+    return (FGL * np.array(WGAUSS)).sum(axis=-1) * LAI[..., 0]
+
+
 class WOFOST_Assimilation(SimulationObject):
     """Class implementing a WOFOST/SUCROS style assimilation routine including
     effect of changes in atmospheric CO2 concentration.
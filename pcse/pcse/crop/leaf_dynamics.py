@@ -5,9 +5,8 @@ Modified by Will Solow, 2024
 """
 
 from math import exp
-from collections import deque
-from array import array
 from datetime import date
+import numpy as np
 
 from pcse.utils.traitlets import Float, Instance
 from pcse.utils.decorators import prepare_rates, prepare_states
@@ -134,10 +133,13 @@ class Base_WOFOST_Leaf_Dynamics_NPK(SimulationObject):
         NLAI_NPK = Float(-99.0)  # coefficient for the reduction due to nutrient NPK stress of the
         # LAI increase (during juvenile phase)
 
+    # Initial number of leaf classes that fit in the leaf class buffer
+    LEAF_CLASSES_SIZE = 256
+
     class StateVariables(StatesTemplate):
-        LV = Instance(deque)
-        SLA = Instance(deque)
-        LVAGE = Instance(deque)
+        LV = Instance(np.ndarray)
+        SLA = Instance(np.ndarray)
+        LVAGE = Instance(np.ndarray)
         LAIEM = Float(-99.0)
         LASUM = Float(-99.0)
         LAIEXP = Float(-99.0)
@@ -220,11 +222,8 @@ class Base_WOFOST_Leaf_Dynamics_NPK(SimulationObject):
         # in DALV.
         # Note that the actual leaf death is imposed on the array LV during the
         # state integration step.
-        DALV = 0.0
-        for lv, lvage in zip(s.LV, s.LVAGE):
-            if lvage > p.SPAN:
-                DALV += lv
-        r.DALV = DALV
+        LV_old = s.LV[s.LVAGE > p.SPAN]
+        r.DALV = float(np.add.accumulate(LV_old)[-1]) if len(LV_old) > 0 else 0.0
 
         # Total death rate leaves
         r.DRLV = max(r.DSLV, r.DALV)
@@ -267,39 +266,34 @@ class Base_WOFOST_Leaf_Dynamics_NPK(SimulationObject):
         s = self.states
 
         # Leaf Death
-        tLV = array("d", s.LV)
-        tSLA = array("d", s.SLA)
-        tLVAGE = array("d", s.LVAGE)
-        tDRLV = r.DRLV
-
-        # leaf death is imposed on leaves by removing leave classes from the
-        # right side of the deque.
-        for LVweigth in reversed(s.LV):
-            if tDRLV > 0.0:
-                if tDRLV >= LVweigth:  # remove complete leaf class from deque
-                    tDRLV -= LVweigth
-                    tLV.pop()
-                    tLVAGE.pop()
-                    tSLA.pop()
-                else:  # Decrease value of oldest (rightmost) leave class
-                    tLV[-1] -= tDRLV
-                    tDRLV = 0.0
-            else:
-                break
+        # leaf death is imposed on leaves by removing leaf classes from the
+        # oldest (rightmost) end of the leaf classes.
+        LV = self._leaves[0, self._head : self._tail]
+        if 0.0 < r.DRLV < LV[-1]:
+            # Decrease value of oldest (rightmost) leave class
+            self._leaves[0, self._tail - 1] -= r.DRLV
+        elif r.DRLV > 0.0:
+            # death rate that remains before each class is reached, oldest class first
+            tDRLV = np.subtract.accumulate(np.concatenate(([r.DRLV], LV[::-1])))[:-1]
+            # remove complete leaf classes until the remaining death rate is smaller
+            # than the weight of a class
+            removed = (tDRLV > 0.0) & (tDRLV >= LV[::-1])
+            n = len(LV) if removed.all() else int(removed.argmin())
+            self._tail -= n
+            if n < len(LV) and tDRLV[n] > 0.0:
+                # Decrease value of oldest (rightmost) leave class
+                self._leaves[0, self._tail - 1] -= tDRLV[n]
 
         # Integration of physiological age
-        tLVAGE = deque([age + r.FYSAGE for age in tLVAGE])
-        tLV = deque(tLV)
-        tSLA = deque(tSLA)
+        self._leaves[2, self._head : self._tail] += r.FYSAGE
 
         # Compute Leaf Growth
         # new leaves in class 1
-        tLV.appendleft(r.GRLV)
-        tSLA.appendleft(r.SLAT)
-        tLVAGE.appendleft(0.0)
+        self._add_leaf_class(r.GRLV, r.SLAT, 0.0)
+        LV, SLA, LVAGE = self._leaf_classes()
 
         # calculation of new leaf area
-        s.LASUM = sum([lv * sla for lv, sla in zip(tLV, tSLA)])
+        s.LASUM = float(np.add.accumulate(LV * SLA)[-1])
         s.LAI = self._calc_LAI()
         s.LAIMAX = max(s.LAI, s.LAIMAX)
 
@@ -307,14 +301,55 @@ class Base_WOFOST_Leaf_Dynamics_NPK(SimulationObject):
         s.LAIEXP += r.GLAIEX
 
         # Update leaf biomass states
-        s.WLV = sum(tLV)
+        s.WLV = float(np.add.accumulate(LV)[-1])
         s.DWLV += r.DRLV
         s.TWLV = s.WLV + s.DWLV
 
-        # Store final leaf biomass deques
-        self.states.LV = tLV
-        self.states.SLA = tSLA
-        self.states.LVAGE = tLVAGE
+        # Store final leaf classes
+        self.states.LV = LV
+        self.states.SLA = SLA
+        self.states.LVAGE = LVAGE
+
+    def _init_leaf_classes(self, LV: float, SLA: float, LVAGE: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Creates the leaf class buffer holding a first leaf class
+
+        Returns the LV, SLA and LVAGE arrays of the leaf classes.
+        """
+        self._leaves = np.zeros((3, self.LEAF_CLASSES_SIZE))
+        self._head = self._tail = self.LEAF_CLASSES_SIZE
+        self._add_leaf_class(LV, SLA, LVAGE)
+        return self._leaf_classes()
+
+    def _add_leaf_class(self, LV: float, SLA: float, LVAGE: float) -> None:
+        """Adds a new (youngest) leaf class on the left side of the leaf classes
+
+        The leaf classes are kept in a preallocated buffer with the youngest
+        class at `_head` and the oldest class at `_tail - 1`. When the buffer
+        is used up on the left side, the leaf classes are moved to the end of
+        a new buffer, which is doubled in size when more than half full.
+        """
+        if self._head == 0:
+            n = self._tail
+            size = max(self._leaves.shape[1], 2 * n)
+            leaves = np.zeros((3, size))
+            leaves[:, size - n :] = self._leaves[:, :n]
+            self._leaves, self._head, self._tail = leaves, size - n, size
+        self._head -= 1
+        self._leaves[:, self._head] = (LV, SLA, LVAGE)
+
+    def _leaf_classes(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns read-only copies of the LV, SLA and LVAGE of all leaf classes,
+        youngest class first, as rows of a single array.
+
+        Views of the buffer can not be published: a leaf class is added every
+        day, and the ages of all classes and the weight of the oldest class
+        are updated in place. The states published to the kiosk and kept by
+        reference in the full trace would then change after the day they
+        belong to.
+        """
+        leaves = self._leaves[:, self._head : self._tail].copy()
+        leaves.flags.writeable = False
+        return leaves[0], leaves[1], leaves[2]
 
     def reset(self) -> None:
         """Reset states and rates"""
@@ -329,9 +364,7 @@ class Base_WOFOST_Leaf_Dynamics_NPK(SimulationObject):
         TWLV = WLV + DWLV
 
         # First leaf class (SLA, age and weight)
-        SLA = deque([p.SLATB(k.DVS)])
-        LVAGE = deque([0.0])
-        LV = deque([WLV])
+        LV, SLA, LVAGE = self._init_leaf_classes(WLV, p.SLATB(k.DVS), 0.0)
 
         # Initial values for leaf area
         LAIEM = LV[0] * SLA[0]
@@ -384,9 +417,7 @@ class Annual_WOFOST_Leaf_Dynamics_NPK(Base_WOFOST_Leaf_Dynamics_NPK):
         TWLV = WLV + DWLV
 
         # First leaf class (SLA, age and weight)
-        SLA = deque([p.SLATB(k.DVS)])
-        LVAGE = deque([0.0])
-        LV = deque([WLV])
+        LV, SLA, LVAGE = self._init_leaf_classes(WLV, p.SLATB(k.DVS), 0.0)
 
         # Initial values for leaf area
         LAIEM = LV[0] * SLA[0]
@@ -472,9 +503,7 @@ class Perennial_WOFOST_Leaf_Dynamics_NPK(Base_WOFOST_Leaf_Dynamics_NPK):
         TWLV = WLV + DWLV
 
         # First leaf class (SLA, age and weight)
-        SLA = deque([p.SLATB(k.DVS)])
-        LVAGE = deque([0.0])
-        LV = deque([WLV])
+        LV, SLA, LVAGE = self._init_leaf_classes(WLV, p.SLATB(k.DVS), 0.0)
 
         # Initial values for leaf area
         LAIEM = LV[0] * SLA[0]
@@ -536,9 +565,7 @@ class Perennial_WOFOST_Leaf_Dynamics_NPK(Base_WOFOST_Leaf_Dynamics_NPK):
         TWLV = WLV + DWLV
 
         # First leaf class (SLA, age and weight)
-        SLA = deque([p.SLATB(k.DVS)])
-        LVAGE = deque([0.0])
-        LV = deque([WLV])
+        LV, SLA, LVAGE = self._init_leaf_classes(WLV, p.SLATB(k.DVS), 0.0)
 
         # Initial values for leaf area
         LAIEM = LV[0] * SLA[0]
@@ -189,7 +189,7 @@ class Vernalisation(SimulationObject):
             states.ISVERNALISED = True
 
             msg = "Vernalization requirements reached at day %s."
-            self.logger.info(msg % day)
+            self.logger.info(msg, day)
 
         elif self._force_vernalisation:  # Critical DVS for vernalisation reached
             # Force vernalisation, but do not set DOV
@@ -202,7 +202,7 @@ class Vernalisation(SimulationObject):
                 + "but vernalization requirements not yet fulfilled. "
                 + "Forcing vernalization now (VERN=%f)."
             )
-            self.logger.info(msg % (day, states.VERN))
+            self.logger.info(msg, day, states.VERN)
 
         else:  # Reduction factor for phenologic development
             states.ISVERNALISED = False
@@ -445,7 +445,7 @@ class Base_Phenology(SimulationObject):
             raise exc.PCSEError(msg, self.states.STAGE)
 
         msg = "Finished rate calculation for %s"
-        self.logger.debug(msg % day)
+        self.logger.debug(msg, day)
 
     @prepare_states
     def integrate(self, day: datetime.date, delt: float = 1.0) -> None:
@@ -497,7 +497,7 @@ class Base_Phenology(SimulationObject):
             raise exc.PCSEError(msg)
 
         msg = "Finished state integration for %s"
-        self.logger.debug(msg % day)
+        self.logger.debug(msg, day)
 
     def _next_stage(self, day: datetime.date) -> None:
         """Moves states.STAGE to the next phenological stage"""
@@ -535,7 +535,7 @@ class Base_Phenology(SimulationObject):
             raise exc.PCSEError(msg)
 
         msg = "Changed phenological stage '%s' to '%s' on %s"
-        self.logger.info(msg % (current_STAGE, s.STAGE, day))
+        self.logger.info(msg, current_STAGE, s.STAGE, day)
 
     def _on_CROP_HARVEST(self, day: datetime.date) -> None:
         if self.params.CROP_END_TYPE in ["harvest"]:
@@ -759,7 +759,7 @@ class Perennial_Phenology(Base_Phenology):
             raise exc.PCSEError(msg, self.states.STAGE)
 
         msg = "Finished rate calculation for %s"
-        self.logger.debug(msg % day)
+        self.logger.debug(msg, day)
 
     @prepare_states
     def integrate(self, day: datetime.date, delt: float = 1.0) -> None:
@@ -855,7 +855,7 @@ class Perennial_Phenology(Base_Phenology):
             raise exc.PCSEError(msg)
 
         msg = "Finished state integration for %s"
-        self.logger.debug(msg % day)
+        self.logger.debug(msg, day)
         self._DAY_LENGTH = 0
 
     def _next_stage(self, day: datetime.date) -> None:
@@ -895,7 +895,7 @@ class Perennial_Phenology(Base_Phenology):
             raise exc.PCSEError(msg)
 
         msg = "Changed phenological stage '%s' to '%s' on %s"
-        self.logger.info(msg % (current_STAGE, s.STAGE, day))
+        self.logger.info(msg, current_STAGE, s.STAGE, day)
 
     def _on_DORMANT(self, day: datetime.date) -> None:
         """Handler for dormant signal. Reset all nonessential states and rates to 0"""
@@ -15,10 +15,17 @@ Written by: Allard de Wit (allard.dewit@wur.nl), April 2014
 Modified by Will Solow, 2024
 """
 
+import copy
+import types
+from collections import deque
 from datetime import date
+from functools import partial
 
-from pcse.utils.traitlets import Instance, Bool, List, Dict
-from pcse.base import VariableKiosk, AncillaryObject, SimulationObject, BaseEngine, ParameterProvider
+import numpy as np
+
+from pcse.utils.traitlets import Instance, Bool, List, Dict, HasTraits
+from pcse.base import VariableKiosk, ColumnarVariableKiosk, AncillaryObject, SimulationObject, BaseEngine, ParameterProvider
+from pcse.base import OutputBuffer, SignalBus
 from pcse.nasapower import WeatherDataProvider, WeatherDataContainer
 from pcse.agromanager import BaseAgroManager
 from pcse.util import ConfigurationLoader
@@ -26,6 +33,50 @@ from pcse.base.timer import Timer
 from pcse.utils import signals
 from pcse.utils import exceptions as exc
 
+# Attributes of HasTraits objects that hold the trait machinery itself
+# rather than model state
+_HASTRAITS_INTERNALS = ("_trait_values", "_trait_notifiers", "_trait_validators", "_cross_validation_lock")
+
+
+def _copy_state_value(value: object, memo: dict) -> object:
+    """Copy a value of a state attribute so that later in-place changes
+    do not leak into the copy. Immutable values and references to other
+    objects (SimulationObjects, Afgen tables, the kiosk) are returned as is.
+
+    Copies are shared through `memo`, so that an object referenced from
+    several places (e.g. a state and the kiosk) is still shared afterwards.
+    """
+    if not isinstance(value, np.ndarray) and type(value) not in (list, dict, set, deque):
+        return value
+    if id(value) not in memo:
+        memo[id(value)] = value.copy() if isinstance(value, np.ndarray) else copy.deepcopy(value)
+    return memo[id(value)]
+
+
+def _none() -> None:
+    """Accessor for output variables that do not exist."""
+    return None
+
+
+class EngineSnapshot(object):
+    """Container for the state of an Engine as returned by `Engine.snapshot()`.
+
+    It holds copies of the trait values and instance attributes of every
+    stateful object in the simulation (timer, agromanager, crop and soil
+    components with their states/rates), the contents of the VariableKiosk
+    the signal connections and the output buffer. A snapshot can only be
+    restored on the engine that created it.
+    """
+
+    def __init__(
+        self, engine: "Engine", objects: list, kiosk: tuple, connections: dict, output_buffer: tuple = None
+    ) -> None:
+        self.engine_id = id(engine)
+        self.objects = objects
+        self.kiosk = kiosk
+        self.connections = connections
+        self.output_buffer = output_buffer
+
 
 class Engine(BaseEngine):
     """Simulation engine for simulating the combined soil/crop system.
@@ -107,8 +158,18 @@ class Engine(BaseEngine):
     flag_output = Bool(False)
     flag_summary_output = Bool(False)
 
+    # VariableKiosk implementations that can be selected with KIOSK in the
+    # model configuration
+    _kiosks = {"dict": VariableKiosk, "columnar": ColumnarVariableKiosk}
+
+    # Accessors for the output variables, rebuilt after crop/soil start or finish
+    _output_plan = None
+    # Output of the last OUTPUT_BUFFER_DAYS days as arrays
+    _output_buffer = None
+
     # placeholders for variables saved during model execution
     _saved_output = List()
+    _full_trace = List()
     _saved_summary_output = List()
     _saved_terminal_output = Dict()
 
@@ -134,10 +195,50 @@ class Engine(BaseEngine):
         self.parameterprovider = parameterprovider
 
         # Variable kiosk for registering and publishing variables
-        self.kiosk = VariableKiosk()
+        if self.mconf.KIOSK not in self._kiosks:
+            msg = "Unknown KIOSK '%s' in model configuration, should be one of %s" % (
+                self.mconf.KIOSK,
+                list(self._kiosks),
+            )
+            raise exc.PCSEError(msg)
+        self.kiosk = self._kiosks[self.mconf.KIOSK]()
+
+        # States/rates templates of the components are compiled when requested
+        if self.mconf.TEMPLATES not in ("traitlets", "compiled"):
+            msg = "Unknown TEMPLATES '%s' in model configuration, should be 'traitlets' or 'compiled'" % (
+                self.mconf.TEMPLATES
+            )
+            raise exc.PCSEError(msg)
+        self.kiosk.compiled_templates = self.mconf.TEMPLATES == "compiled"
+
+        # Signals are sent through the pydispatch dispatcher or directly to the
+        # receivers by a SignalBus of this engine
+        if self.mconf.SIGNALS not in ("pydispatch", "direct"):
+            msg = "Unknown SIGNALS '%s' in model configuration, should be 'pydispatch' or 'direct'" % (
+                self.mconf.SIGNALS
+            )
+            raise exc.PCSEError(msg)
+        if self.mconf.SIGNALS == "direct":
+            self.kiosk.signal_bus = SignalBus()
+
+        # A quiet engine discards the log messages of all its components
+        self.kiosk.quiet = bool(self.mconf.QUIET)
+
+        # Either all OUTPUT_VARS or only LEAN_OUTPUT_VARS are saved each day
+        if self.mconf.OUTPUT_MODE not in ("full", "lean"):
+            msg = "Unknown OUTPUT_MODE '%s' in model configuration, should be 'full' or 'lean'" % (
+                self.mconf.OUTPUT_MODE
+            )
+            raise exc.PCSEError(msg)
+        if not isinstance(self.mconf.OUTPUT_BUFFER_DAYS, int) or self.mconf.OUTPUT_BUFFER_DAYS < 0:
+            msg = "OUTPUT_BUFFER_DAYS in model configuration should be a non-negative integer, got '%s'" % (
+                self.mconf.OUTPUT_BUFFER_DAYS
+            )
+            raise exc.PCSEError(msg)
 
         # Placeholder for variables to be saved during a model run
         self._saved_output = list()
+        self._full_trace = list()
         self._saved_summary_output = list()
         self._saved_terminal_output = dict()
 
@@ -202,6 +303,81 @@ class Engine(BaseEngine):
         # Calculate initial rates
         self.calc_rates(self.day, self.drv)
 
+    def _stateful_objects(self) -> list[HasTraits]:
+        """Return the engine and all HasTraits objects reachable from the
+        timer, agromanager, crop and soil, including states/rates templates
+        and the layers of a soil profile.
+        """
+        found = {id(self): self}
+        stack = [self.timer, self.agromanager, self.crop, self.soil]
+        while stack:
+            obj = stack.pop()
+            if obj is None or id(obj) in found:
+                continue
+            found[id(obj)] = obj
+            for value in list(obj._trait_values.values()) + list(obj.__dict__.values()):
+                if isinstance(value, HasTraits):
+                    stack.append(value)
+                elif isinstance(value, list) and type(value) is not list:
+                    stack.extend(v for v in value if isinstance(v, HasTraits))
+        return list(found.values())
+
+    def snapshot(self) -> EngineSnapshot:
+        """Capture the complete state of the simulation so that it can be
+        brought back with `restore()`.
+
+        This is much cheaper than instantiating a new Engine because the
+        configuration, parameters, crop/soil components and their kiosk
+        registrations are reused rather than rebuilt.
+        """
+        memo = {}
+        copy_value = lambda v: _copy_state_value(v, memo)
+        objects = []
+        for obj in self._stateful_objects():
+            traits = {k: copy_value(v) for k, v in obj._trait_values.items()}
+            attrs = {
+                k: copy_value(v)
+                for k, v in obj.__dict__.items()
+                if k not in _HASTRAITS_INTERNALS and type(v) is not types.FunctionType
+            }
+            # Compiled states/rates templates keep their values in slots
+            slots = {k: copy_value(getattr(obj, k)) for k in getattr(type(obj), "__slots__", ()) if hasattr(obj, k)}
+            objects.append((obj, traits, attrs, slots))
+        kiosk = self.kiosk.snapshot(copy_value)
+        output_buffer = self._output_buffer.snapshot() if self._output_buffer is not None else None
+
+        return EngineSnapshot(self, objects, kiosk, self._get_connections(), output_buffer)
+
+    def restore(self, snapshot: EngineSnapshot) -> None:
+        """Restore the state of the simulation captured by `snapshot()`.
+
+        Values are written directly into the objects, bypassing trait
+        observers, and the kiosk is restored separately. Components that
+        were created after the snapshot was taken (e.g. a crop started
+        during the season) are detached and disconnected from all signals.
+        The snapshot itself is not modified and can be restored repeatedly.
+        """
+        if snapshot.engine_id != id(self):
+            msg = "Cannot restore a snapshot that was taken from another Engine."
+            raise exc.PCSEError(msg)
+
+        memo = {}
+        copy_value = lambda v: _copy_state_value(v, memo)
+        for obj, traits, attrs, slots in snapshot.objects:
+            obj._trait_values.clear()
+            obj._trait_values.update({k: copy_value(v) for k, v in traits.items()})
+            for k in list(obj.__dict__):
+                if k not in attrs and k not in _HASTRAITS_INTERNALS and type(obj.__dict__[k]) is not types.FunctionType:
+                    del obj.__dict__[k]
+            obj.__dict__.update({k: copy_value(v) for k, v in attrs.items()})
+            for k, v in slots.items():
+                object.__setattr__(obj, k, copy_value(v))
+        self.kiosk.restore(snapshot.kiosk, copy_value)
+        if snapshot.output_buffer is not None:
+            self._output_buffer.restore(snapshot.output_buffer)
+
+        self._set_connections(snapshot.connections)
+
     def calc_rates(self, day: date, drv: WeatherDataContainer) -> None:
         """Calculate the rates for computing rate of state change"""
         # Start rate calculation on individual components
@@ -293,7 +469,7 @@ class Engine(BaseEngine):
         crop_end_type: str = None,
     ) -> None:
         """Starts the crop"""
-        self.logger.debug("Received signal 'CROP_START' on day %s" % day)
+        self.logger.debug("Received signal 'CROP_START' on day %s", day)
 
         if self.crop is not None:
             msg = (
@@ -307,10 +483,11 @@ class Engine(BaseEngine):
         self.parameterprovider.set_active_crop(crop_name, crop_variety, crop_start_type, crop_end_type)
 
         self.crop = self.mconf.CROP(day, self.kiosk, self.parameterprovider)
+        self._output_plan = None
 
     def _on_SOIL_START(self, day: date, soil_name: str = None, soil_variation: str = None) -> None:
         """Starts the soil"""
-        self.logger.debug("Received signal 'SOIL_START' on day %s" % day)
+        self.logger.debug("Received signal 'SOIL_START' on day %s", day)
 
         if self.soil is not None:
             msg = (
@@ -325,6 +502,7 @@ class Engine(BaseEngine):
         self.parameterprovider.set_active_soil(soil_name, soil_variation)
 
         self.soil = self.mconf.SOIL(self.day, self.kiosk, self.parameterprovider)
+        self._output_plan = None
 
     def _on_SOIL_FINISH(self, day: date, soil_delete: bool = False) -> None:
         """Sets the variable 'flag_soil_finish' to True when the signal
@@ -382,6 +560,7 @@ class Engine(BaseEngine):
             self.flag_crop_delete = False
 
         self.crop = None
+        self._output_plan = None
 
     def _finish_soilsimulation(self, day: date, clear_override: bool = False) -> None:
         """Finishes the SoilSimulation object when variable 'flag_soil_finish'
@@ -407,6 +586,7 @@ class Engine(BaseEngine):
             self.flag_soil_delete = False
 
         self.soil = None
+        self._output_plan = None
 
     def _terminate_simulation(self, day: date) -> None:
         """Terminates the entire simulation.
@@ -432,16 +612,75 @@ class Engine(BaseEngine):
         return drv
 
     def _save_output(self, day: date) -> None:
-        """Appends selected model variables to self._saved_output for this day."""
+        """Appends selected model variables to self._saved_output for this day.
+
+        In the 'lean' OUTPUT_MODE only the LEAN_OUTPUT_VARS are saved. With
+        FULL_TRACE enabled, all OUTPUT_VARS of every day are also appended to
+        the trace returned by `get_full_trace()`. With OUTPUT_BUFFER_DAYS set,
+        the values are also appended to the buffer of `get_output_buffer()`.
+        """
         # Switch off the flag for generating output
         self.flag_output = False
 
+        lean = self.mconf.OUTPUT_MODE == "lean"
+        if self._output_plan is None:
+            if not lean:
+                varnames = self.mconf.OUTPUT_VARS
+            elif self.mconf.FULL_TRACE:
+                varnames = list(dict.fromkeys(list(self.mconf.LEAN_OUTPUT_VARS) + list(self.mconf.OUTPUT_VARS)))
+            else:
+                varnames = self.mconf.LEAN_OUTPUT_VARS
+            self._output_plan = self._compile_output_plan(varnames)
+            if self.mconf.OUTPUT_BUFFER_DAYS > 0:
+                varnames = tuple(var for var, _ in self._output_plan)
+                if self._output_buffer is None or self._output_buffer.varnames != varnames:
+                    self._output_buffer = OutputBuffer(varnames, self.mconf.OUTPUT_BUFFER_DAYS)
+
         # find current value of variables to are to be saved
         states = {"day": day}
-        for var in self.mconf.OUTPUT_VARS:
-            states[var] = self.get_variable(var)
+        for var, getter in self._output_plan:
+            states[var] = getter()
+        if self._output_buffer is not None:
+            self._output_buffer.append(day, list(states.values())[1:])
+
+        if self.mconf.FULL_TRACE:
+            if lean:
+                self._full_trace.append({"day": day, **{var: states[var] for var in self.mconf.OUTPUT_VARS}})
+                states = {"day": day, **{var: states[var] for var in self.mconf.LEAN_OUTPUT_VARS}}
+            else:
+                self._full_trace.append(states)
         self._saved_output = [states]
 
+    def _compile_output_plan(self, varnames: list[str]) -> tuple:
+        """Resolve each variable in `varnames` into a direct accessor, giving
+        the same value as `get_variable()` without searching the hierarchy.
+
+        Variables owned by a states/rates object of the current crop or soil
+        are read from that object. Published variables of components that are
+        no longer part of the simulation can only be found in the kiosk and
+        any other variable is None. The plan is valid until a crop or soil
+        is started or finished.
+        """
+        templates = {}
+        for simobj in self.simulation_objects():
+            for template in (simobj.states, simobj.rates):
+                if template is not None:
+                    templates[id(template)] = template
+
+        kiosk = self.kiosk
+        plan = []
+        for var in varnames:
+            v = var if kiosk.variable_exists(var) or not kiosk.variable_exists(var.upper()) else var.upper()
+            oid = kiosk.registered_states.get(v, kiosk.registered_rates.get(v))
+            if oid in templates:
+                getter = partial(getattr, templates[oid], v)
+            elif v in kiosk.published_states or v in kiosk.published_rates:
+                getter = partial(kiosk.get, v)
+            else:
+                getter = partial(_none)
+            plan.append((var, getter))
+        return tuple(plan)
+
     def _save_summary_output(self) -> None:
         """Appends selected model variables to self._saved_summary_output."""
         # find current value of variables to are to be saved
@@ -500,6 +739,31 @@ class Engine(BaseEngine):
 
         return self._saved_output
 
+    def get_output_buffer(self) -> OutputBuffer:
+        """Returns the `OutputBuffer` holding the output of the last
+        OUTPUT_BUFFER_DAYS days as arrays, or None if OUTPUT_BUFFER_DAYS is 0.
+
+        Use `get_output_buffer().export()` to obtain the output of the full
+        season when OUTPUT_BUFFER_DAYS is at least the length of the season.
+        """
+
+        return self._output_buffer
+
+    def get_full_trace(self) -> list[dict[str, object]]:
+        """Returns all OUTPUT_VARS for every day of the simulation when
+        FULL_TRACE is enabled in the model configuration, an empty list otherwise.
+        """
+
+        return self._full_trace
+
+    def add_output_vars(self, varnames: list[str]) -> None:
+        """Adds variables to the LEAN_OUTPUT_VARS saved in 'lean' OUTPUT_MODE.
+
+        :param varnames: list of variable names to be saved from now on
+        """
+        self.mconf.LEAN_OUTPUT_VARS = list(dict.fromkeys(list(self.mconf.LEAN_OUTPUT_VARS) + list(varnames)))
+        self._output_plan = None
+
     def get_summary_output(self) -> dict[str, object]:
         """Returns the summary variables have have been stored during the simulation."""
 
@@ -14,6 +14,7 @@ import yaml
 
 from pcse.base import MultiCropDataProvider
 from pcse.utils import exceptions as exc
+from pcse.utils.loggers import class_logger
 from pcse.util import version_tuple, get_working_directory
 
 
@@ -261,5 +262,4 @@ class YAMLCropDataProvider(MultiCropDataProvider):
 
     @property
     def logger(self) -> logging.Logger:
-        loggername = "%s.%s" % (self.__class__.__module__, self.__class__.__name__)
-        return logging.getLogger(loggername)
+        return class_logger(self.__class__)
@@ -6,9 +6,13 @@ Modified by Will Solow, 2024
 """
 
 import os
+import json
 import datetime as dt
 from math import exp
+from collections.abc import MutableMapping
 import pathlib
+import threading
+from collections import OrderedDict
 
 import numpy as np
 import pandas as pd
@@ -16,8 +20,9 @@ import requests
 import logging
 import pickle
 
-from pcse.util import reference_ET, check_angstromAB
+from pcse.util import reference_ET_array, check_angstromAB
 from pcse.utils import exceptions as exc
+from pcse.utils.loggers import class_logger
 
 # Define some lambdas to take care of unit conversions.
 MJ_to_J = lambda x: x * 1e6
@@ -25,6 +30,15 @@ mm_to_cm = lambda x: x / 10.0
 tdew_to_hpa = lambda x: ea_from_tdew(x) * 10.0
 to_date = lambda d: d.date()
 
+# Binary weather cache files start with CACHE_MAGIC followed by the format version
+CACHE_MAGIC = b"PCSEWDB\x00"
+CACHE_VERSION = 1
+CACHE_ALIGNMENT = 64
+
+# URL of the NASA POWER daily point API, can be pointed to a mirror or a local
+# server through the environment variable PCSE_NASAPOWER_URL
+NASAPOWER_URL = os.environ.get("PCSE_NASAPOWER_URL", "https://power.larc.nasa.gov/api/temporal/daily/point")
+
 
 def ea_from_tdew(tdew: float) -> float:
     """
@@ -247,6 +261,205 @@ class WeatherDataContainer(SlotPickleMixin):
         setattr(self, varname, value)
 
 
+class ColumnarWeatherStore(MutableMapping):
+    """Store of a WeatherDataProvider holding the weather data of member 0 in
+    the columns of a float array, e.g. memory-mapped from a binary cache file.
+
+    :param first_date: date of the first row of `values`
+    :param values: array of shape (days, len(varnames)), NaN for missing values
+    :param present: boolean array of shape (days,) flagging the days with data
+    :param varnames: names of the weather variables in the columns of `values`
+
+    The store behaves like the dictionary of WeatherDataContainers keyed by
+    (date, member_id) used by a WeatherDataProvider, but a container is only
+    created when its day is retrieved. Containers that are stored afterwards
+    take precedence over the array and mark the store as modified.
+    """
+
+    def __init__(self, first_date: dt.date, values: np.ndarray, present: np.ndarray, varnames: list[str]) -> None:
+        self.first = first_date.toordinal()
+        self.values = values
+        self.present = present
+        self.varnames = list(varnames)
+        self.containers = {}
+        self.modified = False
+
+    def _row(self, key: tuple) -> int:
+        """Returns the row of `key` in the array, or None if not present."""
+        try:
+            day, member_id = key
+        except (TypeError, ValueError):
+            return None
+        if member_id != 0 or not isinstance(day, dt.date) or isinstance(day, dt.datetime):
+            return None
+        i = day.toordinal() - self.first
+        if 0 <= i < len(self.present) and self.present[i]:
+            return i
+        return None
+
+    def __getitem__(self, key: tuple) -> WeatherDataContainer:
+        try:
+            return self.containers[key]
+        except KeyError:
+            pass
+        i = self._row(key)
+        if i is None:
+            raise KeyError(key)
+        row = self.values[i]
+        wdc = WeatherDataContainer(
+            DAY=key[0], **{varname: row[j] for j, varname in enumerate(self.varnames) if not np.isnan(row[j])}
+        )
+        self.containers[key] = wdc
+        return wdc
+
+    def __setitem__(self, key: tuple, wdc: WeatherDataContainer) -> None:
+        self.containers[key] = wdc
+        self.modified = True
+
+    def __delitem__(self, key: tuple) -> None:
+        i = self._row(key)
+        if i is None and key not in self.containers:
+            raise KeyError(key)
+        self.containers.pop(key, None)
+        if i is not None:
+            self.present = np.array(self.present)
+            self.present[i] = False
+        self.modified = True
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self.containers or self._row(key) is not None
+
+    def __iter__(self):
+        for i in np.flatnonzero(self.present):
+            yield (dt.date.fromordinal(self.first + int(i)), 0)
+        for key in self.containers:
+            if self._row(key) is None:
+                yield key
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.present)) + sum(1 for key in self.containers if self._row(key) is None)
+
+
+def write_weather_cache(cache_fname: str, store: MutableMapping, meta: dict) -> None:
+    """Writes the weather data in `store` to a binary cache file.
+
+    :param cache_fname: name of the cache file
+    :param store: WeatherDataContainers keyed by (date, member_id)
+    :param meta: site information stored in the header (elevation, latitude,
+        longitude, description, ETmodel)
+
+    The file consists of CACHE_MAGIC, the format version and the length of a
+    JSON header as uint32, the header itself and, aligned to CACHE_ALIGNMENT
+    bytes, a little-endian float64 array of shape (days, variables) followed
+    by a uint8 array flagging the days with data. The arrays hold every day
+    from the first to the last date, so a day is found by its offset. The
+    file is written to a temporary file first and then moved into place.
+    """
+    days = sorted(day for day, member_id in store if member_id == 0)
+    if len(days) != len(store):
+        msg = "Binary weather cache files only support weather data without ensembles."
+        raise exc.WeatherDataProviderError(msg)
+    if not days:
+        msg = "No weather data to write to cache file '%s'." % cache_fname
+        raise exc.WeatherDataProviderError(msg)
+
+    varnames = WeatherDataContainer.sitevar + WeatherDataContainer.required + WeatherDataContainer.optional
+    if isinstance(store, ColumnarWeatherStore) and not store.modified and store.varnames == varnames:
+        # Write the arrays as is, without creating a container for every day
+        first = store.first
+        ndays = len(store.present)
+        values = np.asarray(store.values, dtype="<f8")
+        present = np.asarray(store.present, dtype="u1")
+        days = [dt.date.fromordinal(first)]
+    else:
+        first = days[0].toordinal()
+        ndays = days[-1].toordinal() - first + 1
+        values = np.full((ndays, len(varnames)), np.nan, dtype="<f8")
+        present = np.zeros((ndays,), dtype="u1")
+        for day in days:
+            wdc = store[(day, 0)]
+            i = day.toordinal() - first
+            values[i] = [getattr(wdc, varname, None) for varname in varnames]
+            present[i] = 1
+
+    header = dict(meta, first_date=days[0].isoformat(), ndays=ndays, varnames=varnames)
+    header = json.dumps(header).encode("utf-8")
+    offset = len(CACHE_MAGIC) + 8 + len(header)
+    padding = -offset % CACHE_ALIGNMENT
+
+    tmp_fname = "%s.%i.%i.tmp" % (cache_fname, os.getpid(), threading.get_ident())
+    with open(tmp_fname, "wb") as fp:
+        fp.write(CACHE_MAGIC)
+        fp.write(np.array([CACHE_VERSION, len(header) + padding], dtype="<u4").tobytes())
+        fp.write(header + b" " * padding)
+        fp.write(values.tobytes())
+        fp.write(present.tobytes())
+    os.replace(tmp_fname, cache_fname)
+
+
+def read_weather_cache(cache_fname: str) -> tuple[ColumnarWeatherStore, dict]:
+    """Memory-maps a binary cache file written by `write_weather_cache()`.
+
+    Returns a ColumnarWeatherStore on the data and the header, the pages of
+    the file are shared by all processes reading the same cache file.
+    """
+    with open(cache_fname, "rb") as fp:
+        magic = fp.read(len(CACHE_MAGIC))
+        version, header_len = np.frombuffer(fp.read(8), dtype="<u4")
+        header = fp.read(int(header_len))
+    if magic != CACHE_MAGIC:
+        msg = "File '%s' is not a binary weather cache file." % cache_fname
+        raise exc.WeatherDataProviderError(msg)
+    if version != CACHE_VERSION:
+        msg = "Binary weather cache file '%s' has version %i, expected %i." % (cache_fname, version, CACHE_VERSION)
+        raise exc.WeatherDataProviderError(msg)
+
+    meta = json.loads(header.decode("utf-8"))
+    ndays, nvars = meta["ndays"], len(meta["varnames"])
+    offset = len(CACHE_MAGIC) + 8 + int(header_len)
+    values = np.memmap(cache_fname, dtype="<f8", mode="r", offset=offset, shape=(ndays, nvars))
+    present = np.memmap(cache_fname, dtype="u1", mode="r", offset=offset + values.nbytes, shape=(ndays,))
+    first_date = dt.date.fromisoformat(meta["first_date"])
+    return ColumnarWeatherStore(first_date, values, present.astype(bool), meta["varnames"]), meta
+
+
+def convert_cache_file(cache_fname: str) -> str:
+    """Converts a pickled weather cache file to the binary format.
+
+    The binary file is written next to it with extension '.wcache' and keeps
+    the modification time of the pickled file, so that the age of the cached
+    data is unchanged. Returns the name of the binary cache file.
+    """
+    with open(cache_fname, "rb") as fp:
+        (store, elevation, longitude, latitude, description, ETmodel) = pickle.load(fp)
+    meta = {
+        "elevation": elevation,
+        "longitude": longitude,
+        "latitude": latitude,
+        "description": description,
+        "ETmodel": ETmodel,
+    }
+    binary_fname = os.path.splitext(cache_fname)[0] + ".wcache"
+    write_weather_cache(binary_fname, store, meta)
+    r = os.stat(cache_fname)
+    os.utime(binary_fname, (r.st_atime, r.st_mtime))
+    return binary_fname
+
+
+def convert_cache_files(cache_dir: str) -> list[str]:
+    """Converts all pickled weather cache files ('.cache') in `cache_dir` that
+    have no binary counterpart yet. Returns the names of the new files.
+    """
+    converted = []
+    for fname in sorted(os.listdir(cache_dir)):
+        if not fname.endswith(".cache"):
+            continue
+        cache_fname = os.path.join(cache_dir, fname)
+        if not os.path.exists(os.path.splitext(cache_fname)[0] + ".wcache"):
+            converted.append(convert_cache_file(cache_fname))
+    return converted
+
+
 class WeatherDataProvider(object):
     """Base class for all weather data providers.
 
@@ -277,33 +490,48 @@ class WeatherDataProvider(object):
     angstB = None
     # model used for reference ET
     ETmodel = "PM"
+    # Columnar index of the store, built on first use by _get_columns()
+    _columns = None
 
     def __init__(self):
         self.store = {}
+        self._columns = None
 
     @property
     def logger(self) -> logging.Logger:
-        loggername = "%s.%s" % (self.__class__.__module__, self.__class__.__name__)
-        return logging.getLogger(loggername)
+        return class_logger(self.__class__)
 
     def _dump(self, cache_fname: str) -> None:
-        """Dumps the contents into cache_fname using pickle.
+        """Dumps the contents into cache_fname as a binary cache file.
 
         Dumps the values of self.store, longitude, latitude, elevation and description
         """
-        with open(cache_fname, "wb") as fp:
-            dmp = (self.store, self.elevation, self.longitude, self.latitude, self.description, self.ETmodel)
-            pickle.dump(dmp, fp, pickle.HIGHEST_PROTOCOL)
+        meta = {
+            "elevation": self.elevation,
+            "longitude": self.longitude,
+            "latitude": self.latitude,
+            "description": self.description,
+            "ETmodel": self.ETmodel,
+        }
+        write_weather_cache(cache_fname, self.store, meta)
 
     def _load(self, cache_fname: str) -> None:
-        """Loads the contents from cache_fname using pickle.
+        """Loads the contents from cache_fname.
 
         Loads the values of self.store, longitude, latitude, elevation and description
-        from cache_fname and also sets the self.first_date, self.last_date
+        from cache_fname and also sets the self.first_date, self.last_date. Binary
+        cache files are memory-mapped, older cache files are unpickled.
         """
 
         with open(cache_fname, "rb") as fp:
-            (store, self.elevation, self.longitude, self.latitude, self.description, ETModel) = pickle.load(fp)
+            binary = fp.read(len(CACHE_MAGIC)) == CACHE_MAGIC
+        if binary:
+            store, meta = read_weather_cache(cache_fname)
+            self.elevation, self.longitude, self.latitude = meta["elevation"], meta["longitude"], meta["latitude"]
+            self.description, ETModel = meta["description"], meta["ETmodel"]
+        else:
+            with open(cache_fname, "rb") as fp:
+                (store, self.elevation, self.longitude, self.latitude, self.description, ETModel) = pickle.load(fp)
 
         # Check if the reference ET from the cache file is calculated with the same model as
         # specified by self.ETmodel
@@ -311,7 +539,11 @@ class WeatherDataProvider(object):
             msg = "Mismatch in reference ET from cache file."
             raise exc.PCSEError(msg)
 
-        self.store.update(store)
+        if len(self.store) == 0:
+            self.store = store
+        else:
+            self.store.update(store)
+        self._columns = None
 
     def export(self) -> list[dict]:
         """Exports the contents of the WeatherDataProvider as a list of dictionaries.
@@ -405,25 +637,91 @@ class WeatherDataProvider(object):
             raise exc.WeatherDataProviderError(msg)
 
         self.store[(kd, member_id)] = wdc
+        self._columns = None
+
+    def _get_columns(self) -> tuple:
+        """Returns the weather data (member 0) in columnar form, indexed by
+        the number of days since the first date:
+
+        - the ordinal of the first date
+        - a list with the WeatherDataContainer of each day, None if missing
+        - a float array of shape (days, variables) with the values of each
+          day, NaN if missing
+        - a dictionary mapping variable names to columns of the array
+        """
+        if self._columns is None:
+            if isinstance(self.store, ColumnarWeatherStore) and not self.store.modified:
+                # Containers are created on first access from the arrays
+                columns = {v: i for i, v in enumerate(self.store.varnames)}
+                self._columns = (self.store.first, [None] * len(self.store.present), self.store.values, columns)
+                return self._columns
+
+            days = [day for day, member_id in self.store if member_id == 0]
+            if not days:
+                msg = "No weather data available in %s." % self.__class__.__name__
+                raise exc.WeatherDataProviderError(msg)
+            first = min(days).toordinal()
+            containers = [None] * (max(days).toordinal() - first + 1)
+            for day in days:
+                containers[day.toordinal() - first] = self.store[(day, 0)]
+
+            varnames = WeatherDataContainer.sitevar + WeatherDataContainer.required + WeatherDataContainer.optional
+            values = np.full((len(containers), len(varnames)), np.nan)
+            for i, wdc in enumerate(containers):
+                if wdc is not None:
+                    values[i] = [getattr(wdc, varname, np.nan) for varname in varnames]
+            self._columns = (first, containers, values, {v: i for i, v in enumerate(varnames)})
+        return self._columns
+
+    def get_range(self, start: dt.date, n: int, varnames: list[str]) -> np.ndarray:
+        """Returns the weather variables `varnames` for `n` consecutive days
+        as an array of shape (n, len(varnames)).
+
+        :param start: first day, in any of the formats of `check_keydate()`
+        :param n: number of days
+        :param varnames: names of the weather variables
+        Days without weather data within the available period are NaN.
+        """
+        start = self.check_keydate(start)
+        first, containers, values, columns = self._get_columns()
+        i = start.toordinal() - first
+        if i < 0 or i + n > len(containers):
+            msg = "No weather data for %s - %s." % (start, start + dt.timedelta(days=n - 1))
+            raise exc.WeatherDataProviderError(msg)
+        try:
+            ix = [columns[varname] for varname in varnames]
+        except KeyError as e:
+            msg = "Unknown weather variable %s." % e
+            raise exc.WeatherDataProviderError(msg)
+        return values[i : i + n, ix]
 
     def __call__(self, day: dt.date, member_id: int = 0) -> WeatherDataContainer:
 
+        # Fast path: direct indexing on the day for dates with weather data
+        if member_id == 0 and type(day) is dt.date and (self._columns is not None or len(self.store) > 0):
+            first, containers = self._get_columns()[:2]
+            i = day.toordinal() - first
+            if 0 <= i < len(containers):
+                wdc = containers[i]
+                if wdc is None:
+                    wdc = containers[i] = self.store.get((day, 0))
+                if wdc is not None:
+                    return wdc
+
         if self.supports_ensembles is False and member_id != 0:
             msg = "Retrieving ensemble weather is not supported by %s" % self.__class__.__name__
             raise exc.WeatherDataProviderError(msg)
 
         keydate = self.check_keydate(day)
         if self.supports_ensembles is False:
-            msg = "Retrieving weather data for day %s" % keydate
-            self.logger.debug(msg)
+            self.logger.debug("Retrieving weather data for day %s", keydate)
             try:
                 return self.store[(keydate, 0)]
             except KeyError as e:
                 msg = "No weather data for %s." % keydate
                 raise exc.WeatherDataProviderError(msg)
         else:
-            msg = "Retrieving ensemble weather data for day %s member %i" % (keydate, member_id)
-            self.logger.debug(msg)
+            self.logger.debug("Retrieving ensemble weather data for day %s member %i", keydate, member_id)
             try:
                 return self.store[(keydate, member_id)]
             except KeyError:
@@ -509,6 +807,9 @@ class NASAPowerWeatherDataProvider(WeatherDataProvider):
     HTTP_OK = 200
     angstA = 0.29
     angstB = 0.49
+    # URL of the POWER API and maximum age of cache files in days
+    server = NASAPOWER_URL
+    max_cache_age = 90
 
     def __init__(self, latitude: float, longitude: float, force_update: bool = False, ETmodel: str = "PM") -> None:
 
@@ -543,11 +844,11 @@ class NASAPowerWeatherDataProvider(WeatherDataProvider):
         r = os.stat(cache_file)
         cache_file_date = dt.date.fromtimestamp(r.st_mtime)
         age = (dt.date.today() - cache_file_date).days
-        if age < 90:
+        if age < self.max_cache_age:
             msg = "Start loading weather data from cache file: %s" % cache_file
             self.logger.debug(msg)
 
-            status = self._load_cache_file()
+            status = self._load_cache_file(cache_file)
             if status is not True:
                 msg = "Loading cache file failed, reloading data from NASA Power."
                 self.logger.debug(msg)
@@ -562,14 +863,38 @@ class NASAPowerWeatherDataProvider(WeatherDataProvider):
             except Exception as e:
                 msg = "Reloading data from NASA failed, reverting to (outdated) " + "cache file"
                 self.logger.debug(msg)
-                status = self._load_cache_file()
+                status = self._load_cache_file(cache_file)
                 if status is not True:
                     msg = "Outdated cache file failed loading."
                     raise exc.PCSEError(msg)
 
+    @classmethod
+    def from_powerdata(
+        cls, latitude: float, longitude: float, powerdata: dict, ETmodel: str = "PM"
+    ) -> "NASAPowerWeatherDataProvider":
+        """Creates the provider from POWER data that was already retrieved, e.g.
+        by `pcse.prefetch`, and writes the cache file for the site.
+
+        :param latitude: latitude of the site
+        :param longitude: longitude of the site
+        :param powerdata: JSON response of the POWER API for the site
+        :param ETmodel: "PM"|"P" model for reference evapotranspiration
+        """
+        provider = cls.__new__(cls)
+        WeatherDataProvider.__init__(provider)
+        provider.latitude = float(latitude)
+        provider.longitude = float(longitude)
+        provider.ETmodel = ETmodel
+        provider._process_NASAPower(powerdata, provider.latitude, provider.longitude)
+        return provider
+
     def _get_and_process_NASAPower(self, latitude: float, longitude: float) -> None:
         """Handles the retrieval and processing of the NASA Power data"""
         powerdata = self._query_NASAPower_server(latitude, longitude)
+        self._process_NASAPower(powerdata, latitude, longitude)
+
+    def _process_NASAPower(self, powerdata: dict, latitude: float, longitude: float) -> None:
+        """Processes the POWER data of the site and dumps it to the cache file"""
         if not powerdata:
             msg = (
                 "Failure retrieving POWER data from server. This can be a connection problem with "
@@ -588,8 +913,8 @@ class NASAPowerWeatherDataProvider(WeatherDataProvider):
         # Convert power records to PCSE compatible structure
         df_pcse = self._POWER_to_PCSE(df_power)
 
-        # Start building the weather data containers
-        self._make_WeatherDataContainers(df_pcse.to_dict(orient="records"))
+        # Compute reference ET and store the weather data
+        self._make_WeatherDataContainers(df_pcse)
 
         # dump contents to a cache file
         cache_filename = self._get_cache_filename(latitude, longitude)
@@ -642,66 +967,58 @@ class NASAPowerWeatherDataProvider(WeatherDataProvider):
 
     def _query_NASAPower_server(self, latitude: float, longitude: float) -> str:
         """Query the NASA Power server for data on given latitude/longitude"""
-
-        start_date = dt.date(1983, 7, 1)
-        end_date = dt.date.today()
-
-        # build URL for retrieving data, using new NASA POWER api
-        server = "https://power.larc.nasa.gov/api/temporal/daily/point"
-        payload = {
-            "request": "execute",
-            "parameters": ",".join(self.power_variables),
-            "latitude": latitude,
-            "longitude": longitude,
-            "start": start_date.strftime("%Y%m%d"),
-            "end": end_date.strftime("%Y%m%d"),
-            "community": "AG",
-            "format": "JSON",
-            "user": "anonymous",
-        }
-        msg = "Starting retrieval from NASA Power"
-        self.logger.debug(msg)
-        req = requests.get(server, params=payload)
-
-        if req.status_code != self.HTTP_OK:
-            msg = ("Failed retrieving POWER data, server returned HTTP " + "code: %i on following URL %s") % (
-                req.status_code,
-                req.url,
-            )
-            raise exc.PCSEError(msg)
-
-        msg = "Successfully retrieved data from NASA Power"
-        self.logger.debug(msg)
-        return req.json()
+        return query_NASAPower(latitude, longitude, server=self.server)
 
     def _find_cache_file(self, latitude: float, longitude: float) -> str:
         """Try to find a cache file for given latitude/longitude.
 
         Returns None if the cache file does not exist, else it returns the full path
-        to the cache file.
+        to the cache file. A pickled cache file of the previous format is converted
+        to the binary format, or returned as is if the conversion fails.
         """
         cache_filename = self._get_cache_filename(latitude, longitude)
         if os.path.exists(cache_filename):
             return cache_filename
-        else:
-            return None
 
-    def _get_cache_filename(self, latitude: float, longitude: float) -> str:
+        pickle_filename = os.path.splitext(cache_filename)[0] + ".cache"
+        if os.path.exists(pickle_filename):
+            try:
+                return convert_cache_file(pickle_filename)
+            except (IOError, EnvironmentError, EOFError, pickle.UnpicklingError, exc.PCSEError) as e:
+                msg = "Failed to convert cache file '%s' due to: %s" % (pickle_filename, e)
+                self.logger.warning(msg)
+                return pickle_filename
+        return None
+
+    @classmethod
+    def _get_cache_filename(cls, latitude: float, longitude: float) -> str:
         """Constructs the filename used for cache files given latitude and longitude
 
         The latitude and longitude is coded into the filename by truncating on
         0.1 degree. So the cache filename for a point with lat/lon 52.56/-124.78 will be:
-        NASAPowerWeatherDataProvider_LAT00525_LON-1247.cache
+        NASAPowerWeatherDataProvider_LAT00525_LON-1247.wcache
         """
 
         user_path = pathlib.Path(__file__).parent.resolve()
         PCSE_USER_HOME = os.path.join(user_path, ".pcse")
         METEO_CACHE_DIR = os.path.join(PCSE_USER_HOME, "meteo_cache")
 
-        fname = "%s_LAT%05i_LON%05i.cache" % (self.__class__.__name__, int(latitude * 10), int(longitude * 10))
+        fname = "%s_LAT%05i_LON%05i.wcache" % (cls.__name__, int(latitude * 10), int(longitude * 10))
         cache_filename = os.path.join(METEO_CACHE_DIR, fname)
         return cache_filename
 
+    @classmethod
+    def cache_is_warm(cls, latitude: float, longitude: float) -> bool:
+        """Returns True if a binary cache file younger than `max_cache_age` days
+        exists for the site, so that creating the provider needs no request to
+        the NASA POWER server.
+        """
+        cache_filename = cls._get_cache_filename(latitude, longitude)
+        if not os.path.exists(cache_filename):
+            return False
+        cache_file_date = dt.date.fromtimestamp(os.stat(cache_filename).st_mtime)
+        return (dt.date.today() - cache_file_date).days < cls.max_cache_age
+
     def _write_cache_file(self) -> None:
         """Writes the meteo data from NASA Power to a cache file."""
         cache_filename = self._get_cache_filename(self.latitude, self.longitude)
@@ -711,54 +1028,84 @@ class NASAPowerWeatherDataProvider(WeatherDataProvider):
             msg = "Failed to write cache to file '%s' due to: %s" % (cache_filename, e)
             self.logger.warning(msg)
 
-    def _load_cache_file(self) -> bool:
+    def _load_cache_file(self, cache_filename: str = None) -> bool:
         """Loads the data from the cache file. Return True if successful."""
-        cache_filename = self._get_cache_filename(self.latitude, self.longitude)
+        if cache_filename is None:
+            cache_filename = self._get_cache_filename(self.latitude, self.longitude)
         try:
             self._load(cache_filename)
             msg = "Cache file successfully loaded."
             self.logger.debug(msg)
             return True
-        except (IOError, EnvironmentError, EOFError) as e:
+        except (IOError, EnvironmentError, EOFError, ValueError, exc.WeatherDataProviderError) as e:
             msg = "Failed to load cache from file '%s' due to: %s" % (cache_filename, e)
             self.logger.warning(msg)
             return False
 
-    def _make_WeatherDataContainers(self, recs: pd.DataFrame) -> None:
-        """Create a WeatherDataContainers from recs, compute ET and store the WDC's."""
+    def _make_WeatherDataContainers(self, df_pcse: pd.DataFrame) -> None:
+        """Compute ET for all records of df_pcse at once and store them as a
+        ColumnarWeatherStore, WeatherDataContainers are created when a day is retrieved.
+        """
+        # Reference evapotranspiration in mm/day, invalid inputs result in NaN
+        E0, ES0, ET0 = reference_ET_array(
+            df_pcse.DAY.values,
+            self.latitude,
+            self.elevation,
+            df_pcse.TMIN.values,
+            df_pcse.TMAX.values,
+            df_pcse.IRRAD.values,
+            df_pcse.VAP.values,
+            df_pcse.WIND.values,
+            self.angstA,
+            self.angstB,
+            self.ETmodel,
+        )
+        invalid = np.flatnonzero(np.isnan(E0) | np.isnan(ES0) | np.isnan(ET0))
+        if len(invalid) > 0:
+            rec = df_pcse.iloc[invalid[0]].to_dict()
+            msg = ("Failed to calculate reference ET values on %s. " % rec["DAY"]) + (
+                "With input values:\n %s.\n" % str(rec)
+            )
+            raise exc.PCSEError(msg)
 
-        for rec in recs:
-            # Reference evapotranspiration in mm/day
-            try:
-                E0, ES0, ET0 = reference_ET(
-                    rec["DAY"],
-                    rec["LAT"],
-                    rec["ELEV"],
-                    rec["TMIN"],
-                    rec["TMAX"],
-                    rec["IRRAD"],
-                    rec["VAP"],
-                    rec["WIND"],
-                    self.angstA,
-                    self.angstB,
-                    self.ETmodel,
-                )
-            except ValueError as e:
-                msg = (
-                    ("Failed to calculate reference ET values on %s. " % rec["DAY"])
-                    + ("With input values:\n %s.\n" % str(rec))
-                    + ("Due to error: %s" % e)
+        # update records with ET values converted to cm/day
+        df_pcse = df_pcse.assign(E0=E0 / 10.0, ES0=ES0 / 10.0, ET0=ET0 / 10.0)
+
+        # Same range checks as in WeatherDataContainer, for all days at once
+        for varname, (vmin, vmax) in WeatherDataContainer.ranges.items():
+            if varname not in df_pcse:
+                continue
+            values = df_pcse[varname].values.astype(float)
+            outside = np.flatnonzero(~((values >= vmin) & (values <= vmax)))
+            if len(outside) > 0:
+                i = outside[0]
+                msg = "Value (%s) for meteo variable '%s' outside allowed range (%s, %s) on %s." % (
+                    values[i],
+                    varname,
+                    vmin,
+                    vmax,
+                    df_pcse.DAY.iloc[i],
                 )
                 raise exc.PCSEError(msg)
 
-            # update record with ET values value convert to cm/day
-            rec.update({"E0": E0 / 10.0, "ES0": ES0 / 10.0, "ET0": ET0 / 10.0})
-
-            # Build weather data container from dict 't'
-            wdc = WeatherDataContainer(**rec)
-
-            # add wdc to dictionary for thisdate
-            self._store_WeatherDataContainer(wdc, wdc.DAY)
+        varnames = WeatherDataContainer.sitevar + WeatherDataContainer.required + WeatherDataContainer.optional
+        days = np.asarray(df_pcse.DAY.values, dtype="datetime64[D]").astype(int)
+        first = int(days.min())
+        rows = days - first
+        values = np.full((int(rows.max()) + 1, len(varnames)), np.nan)
+        present = np.zeros((len(values),), dtype=bool)
+        for j, varname in enumerate(varnames):
+            if varname in df_pcse:
+                values[rows, j] = df_pcse[varname].values
+        present[rows] = True
+
+        first_date = dt.date(1970, 1, 1) + dt.timedelta(days=first)
+        store = ColumnarWeatherStore(first_date, values, present, varnames)
+        if len(self.store) == 0:
+            self.store = store
+        else:
+            self.store.update(store)
+        self._columns = None
 
     def _process_POWER_records(self, powerdata: pd.DataFrame) -> pd.DataFrame:
         """Process the meteorological records returned by NASA POWER"""
@@ -801,3 +1148,123 @@ class NASAPowerWeatherDataProvider(WeatherDataProvider):
         )
 
         return df_pcse
+
+
+def query_NASAPower(latitude: float, longitude: float, server: str = None, timeout: float = None) -> dict:
+    """Query the NASA Power server for data on given latitude/longitude
+
+    :param latitude: latitude of the site
+    :param longitude: longitude of the site
+    :param server: URL of the POWER daily point API, defaults to NASAPOWER_URL
+    :param timeout: timeout of the request in seconds
+    """
+
+    start_date = dt.date(1983, 7, 1)
+    end_date = dt.date.today()
+
+    # build URL for retrieving data, using new NASA POWER api
+    server = NASAPOWER_URL if server is None else server
+    payload = {
+        "request": "execute",
+        "parameters": ",".join(NASAPowerWeatherDataProvider.power_variables),
+        "latitude": latitude,
+        "longitude": longitude,
+        "start": start_date.strftime("%Y%m%d"),
+        "end": end_date.strftime("%Y%m%d"),
+        "community": "AG",
+        "format": "JSON",
+        "user": "anonymous",
+    }
+    logger = logging.getLogger(__name__)
+    msg = "Starting retrieval from NASA Power"
+    logger.debug(msg)
+    req = requests.get(server, params=payload, timeout=timeout)
+
+    if req.status_code != NASAPowerWeatherDataProvider.HTTP_OK:
+        msg = ("Failed retrieving POWER data, server returned HTTP " + "code: %i on following URL %s") % (
+            req.status_code,
+            req.url,
+        )
+        raise exc.PCSEError(msg)
+
+    msg = "Successfully retrieved data from NASA Power"
+    logger.debug(msg)
+    return req.json()
+
+
+class WeatherProviderRegistry(object):
+    """Process-wide cache of NASAPowerWeatherDataProviders, so that all
+    environments simulating the same site share one weather store.
+
+    :param max_bytes: maximum approximate size of the cached weather stores,
+        the least recently used providers are dropped beyond this size
+
+    Providers are keyed by latitude and longitude truncated on 0.1 degree,
+    the resolution of the cache files, and the model for reference ET.
+    """
+
+    # Approximate size of a WeatherDataContainer in memory
+    container_nbytes = 400
+
+    def __init__(self, max_bytes: int = 512 * 2**20) -> None:
+        self.max_bytes = max_bytes
+        self._providers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._providers)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate size of all cached weather stores."""
+        return sum(nbytes for _, nbytes in self._providers.values())
+
+    def _provider_nbytes(self, provider: WeatherDataProvider) -> int:
+        """Returns the approximate size of the weather store of `provider`."""
+        if isinstance(provider.store, ColumnarWeatherStore):
+            return provider.store.values.nbytes + len(provider.store.containers) * self.container_nbytes
+        return len(provider.store) * self.container_nbytes
+
+    def get(
+        self, latitude: float, longitude: float, ETmodel: str = "PM", force_update: bool = False
+    ) -> NASAPowerWeatherDataProvider:
+        """Returns the provider for the site, creating it when it is not cached.
+
+        :param latitude: latitude of the site
+        :param longitude: longitude of the site
+        :param ETmodel: "PM"|"P" model for reference evapotranspiration
+        :param force_update: request fresh data from NASA POWER and replace
+            the cached provider
+        """
+        key = (int(latitude * 10), int(longitude * 10), ETmodel)
+        with self._lock:
+            if not force_update and key in self._providers:
+                self._providers.move_to_end(key)
+                return self._providers[key][0]
+
+        provider = NASAPowerWeatherDataProvider(latitude, longitude, force_update=force_update, ETmodel=ETmodel)
+        with self._lock:
+            self._providers[key] = (provider, self._provider_nbytes(provider))
+            self._providers.move_to_end(key)
+            # Keep at least the provider that was just added
+            while len(self._providers) > 1 and self.nbytes > self.max_bytes:
+                self._providers.popitem(last=False)
+        return provider
+
+    def clear(self) -> None:
+        """Drops all cached providers."""
+        with self._lock:
+            self._providers.clear()
+
+
+# Registry shared by all environments in this process
+weather_providers = WeatherProviderRegistry()
+
+
+def get_weather_provider(
+    latitude: float, longitude: float, ETmodel: str = "PM", force_update: bool = False
+) -> NASAPowerWeatherDataProvider:
+    """Returns the NASAPowerWeatherDataProvider for the site from the process-wide
+    registry, see `WeatherProviderRegistry.get()`.
+    """
+    return weather_providers.get(latitude, longitude, ETmodel=ETmodel, force_update=force_update)
@@ -0,0 +1,162 @@
+"""Bulk retrieval of NASA POWER weather data for many sites ahead of a
+simulation run, so that the NASAPowerWeatherDataProvider finds warm cache
+files instead of requesting the data inside the simulation loop.
+
+Sites are downloaded by a bounded pool of threads with retries, and the
+downloaded data is processed (reference ET, cache file) in parallel worker
+processes. The URL of the POWER API can be set to test against a local server.
+"""
+
+import time
+import logging
+import numpy as np
+import requests
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+from pcse.nasapower import NASAPowerWeatherDataProvider, query_NASAPower
+from pcse.utils import exceptions as exc
+
+logger = logging.getLogger(__name__)
+
+
+def grid_sites(
+    lat_low: float, lat_high: float, lon_low: float, lon_high: float, step: float = 0.5
+) -> list[tuple[float, float]]:
+    """Returns the (latitude, longitude) of every point of a grid, bounds included."""
+    latitudes = np.arange(start=lat_low, stop=lat_high + step, step=step)
+    longitudes = np.arange(start=lon_low, stop=lon_high + step, step=step)
+    return [(float(lat), float(lon)) for lat in latitudes for lon in longitudes]
+
+
+def unique_sites(sites: list[tuple[float, float]]) -> list[tuple[float, float]]:
+    """Drops the sites that share a cache file with a previous site, which
+    are the sites within the same 0.1 degree cell.
+    """
+    seen = set()
+    unique = []
+    for latitude, longitude in sites:
+        key = (int(latitude * 10), int(longitude * 10))
+        if key not in seen:
+            seen.add(key)
+            unique.append((latitude, longitude))
+    return unique
+
+
+def fetch_powerdata(
+    latitude: float,
+    longitude: float,
+    server: str = None,
+    retries: int = 3,
+    backoff: float = 2.0,
+    timeout: float = 120.0,
+) -> dict:
+    """Retrieves the POWER data of a site, retrying failed requests.
+
+    :param latitude: latitude of the site
+    :param longitude: longitude of the site
+    :param server: URL of the POWER daily point API, defaults to NASAPOWER_URL
+    :param retries: number of retries after the first failed request
+    :param backoff: seconds to wait before the first retry, doubled on every retry
+    :param timeout: timeout of a request in seconds
+    """
+    for attempt in range(retries + 1):
+        try:
+            powerdata = query_NASAPower(latitude, longitude, server=server, timeout=timeout)
+            if not powerdata:
+                msg = "Empty response retrieving POWER data for lat/lon: (%f, %f)." % (latitude, longitude)
+                raise exc.PCSEError(msg)
+            return powerdata
+        except (requests.RequestException, ValueError, exc.PCSEError) as e:
+            if attempt == retries:
+                raise
+            wait = backoff * 2**attempt
+            msg = "Retrieving POWER data for lat/lon: (%f, %f) failed due to: %s. Retrying in %.1f s."
+            logger.warning(msg % (latitude, longitude, e, wait))
+            time.sleep(wait)
+
+
+def process_powerdata(latitude: float, longitude: float, powerdata: dict, ETmodel: str = "PM") -> str:
+    """Processes the POWER data of a site and writes its cache file.
+    Returns the name of the cache file.
+    """
+    provider = NASAPowerWeatherDataProvider.from_powerdata(latitude, longitude, powerdata, ETmodel=ETmodel)
+    return provider._get_cache_filename(latitude, longitude)
+
+
+def prefetch_weather(
+    sites: list[tuple[float, float]],
+    ETmodel: str = "PM",
+    workers: int = 8,
+    processes: int = 1,
+    retries: int = 3,
+    backoff: float = 2.0,
+    timeout: float = 120.0,
+    server: str = None,
+    force_update: bool = False,
+) -> dict:
+    """Writes the cache files of the NASAPowerWeatherDataProvider for all sites.
+
+    :param sites: list of (latitude, longitude) tuples
+    :param ETmodel: "PM"|"P" model for reference evapotranspiration
+    :param workers: maximum number of concurrent downloads
+    :param processes: number of processes for processing the downloaded data,
+        1 processes the data in the calling process
+    :param retries: number of retries of a failed download
+    :param backoff: seconds to wait before the first retry, doubled on every retry
+    :param timeout: timeout of a request in seconds
+    :param server: URL of the POWER daily point API, defaults to NASAPOWER_URL
+    :param force_update: also download the sites that have a warm cache file
+
+    Sites sharing a cache file are retrieved once. Returns a dictionary
+    mapping each retrieved site to the name of its cache file, or to the
+    exception when the site failed. Sites with a warm cache are skipped and
+    map to None.
+    """
+    results = {}
+    todo = []
+    for site in unique_sites(sites):
+        if not force_update and NASAPowerWeatherDataProvider.cache_is_warm(*site):
+            results[site] = None
+        else:
+            todo.append(site)
+    msg = "Prefetching NASA POWER data for %i sites, %i sites have a warm cache."
+    logger.info(msg % (len(todo), len(results)))
+
+    pool = ProcessPoolExecutor(max_workers=processes) if processes > 1 else None
+    processing = {}
+    with ThreadPoolExecutor(max_workers=workers) as downloads:
+        fetching = {
+            downloads.submit(fetch_powerdata, *site, server=server, retries=retries, backoff=backoff, timeout=timeout): site
+            for site in todo
+        }
+        for future in as_completed(fetching):
+            site = fetching[future]
+            try:
+                powerdata = future.result()
+            except Exception as e:
+                msg = "Failed retrieving POWER data for lat/lon: (%f, %f) due to: %s" % (*site, e)
+                logger.error(msg)
+                results[site] = e
+                continue
+            if pool is None:
+                try:
+                    results[site] = process_powerdata(*site, powerdata, ETmodel)
+                except Exception as e:
+                    msg = "Failed processing POWER data for lat/lon: (%f, %f) due to: %s" % (*site, e)
+                    logger.error(msg)
+                    results[site] = e
+            else:
+                processing[pool.submit(process_powerdata, *site, powerdata, ETmodel)] = site
+
+    if pool is not None:
+        for future in as_completed(processing):
+            site = processing[future]
+            try:
+                results[site] = future.result()
+            except Exception as e:
+                msg = "Failed processing POWER data for lat/lon: (%f, %f) due to: %s" % (*site, e)
+                logger.error(msg)
+                results[site] = e
+        pool.shutdown()
+
+    return results
@@ -549,15 +549,13 @@ class WaterBalanceLayered(SimulationObject):
                 self._DSLR += 1
 
         # conductivities and Matric Flux Potentials for all layers
-        pF = np.zeros_like(s.MSM)
-        conductivity = np.zeros_like(s.MSM)
-        matricfluxpot = np.zeros_like(s.MSM)
-        for i, layer in enumerate(self.soil_profile):
-            pF[i] = layer.PFfromSM(s.MSM[i])
-            conductivity[i] = 10 ** layer.CONDfromPF(pF[i])
-            matricfluxpot[i] = layer.MFPfromPF(pF[i])
-            if self.soil_profile.GroundWater:
-                raise NotImplementedError("Groundwater influence not yet implemented.")
+        sp = self.soil_profile
+        if sp.GroundWater:
+            raise NotImplementedError("Groundwater influence not yet implemented.")
+        pF = sp.PFfromSM(s.MSM)
+        # 10**x is done in Python as numpy.power can differ in the last digit
+        conductivity = np.array([10**cond for cond in sp.CONDfromPF(pF).tolist()])
+        matricfluxpot = sp.MFPfromPF(pF)
 
         # Potentially infiltrating rainfall
         if p.MIFUNRN == 0:
@@ -637,115 +635,42 @@ class WaterBalanceLayered(SimulationObject):
         # drainage
         DMAX = 0.0
 
-        LIMDRY = np.zeros_like(s.MSM)
-        LIMWET = np.zeros_like(s.MSM)
-        TSL = [l.Thickness for l in self.soil_profile]
-        for il in reversed(range(len(s.MSM))):
-            # limiting DOWNWARD flow rate
-            # == wet conditions: the soil conductivity is larger
-            #    the soil conductivity is the flow rate for gravity only
-            #    this limit is DOWNWARD only
-            # == dry conditions: the MFP gradient
-            #    the MFP gradient is larger for dry conditions
-            #    allows SOME upward flow
-            if il == 0:  # Top soil layer
-                LIMWET[il] = self.soil_profile.SurfaceConductivity
-                LIMDRY[il] = 0.0
-            else:
-                # the limit under wet conditions is a unit gradient
-                LIMWET[il] = (TSL[il - 1] + TSL[il]) / (TSL[il - 1] / conductivity[il - 1] + TSL[il] / conductivity[il])
-
-                # compute dry flow given gradients in matric flux potential
-                if self.soil_profile[il - 1] == self.soil_profile[il]:
-                    # Layers il-1 and il have same properties: flow rates are estimated from
-                    # the gradient in Matric Flux Potential
-                    LIMDRY[il] = 2.0 * (matricfluxpot[il - 1] - matricfluxpot[il]) / (TSL[il - 1] + TSL[il])
-                    if LIMDRY[il] < 0.0:
-                        # upward flow rate ; amount required for equal water content is required below
-                        MeanSM = (s.MWC[il - 1] + s.MWC[il]) / (TSL[il - 1] + TSL[il])
-                        EqualPotAmount = s.MWC[il - 1] - TSL[il - 1] * MeanSM  # should be negative like the flow
-                else:
-                    # iterative search to PF at layer boundary (by bisection)
-                    il1 = il - 1
-                    il2 = il
-                    PF1 = pF[il1]
-                    PF2 = pF[il2]
-                    MFP1 = matricfluxpot[il1]
-                    MFP2 = matricfluxpot[il2]
-                    for z in range(self.MaxFlowIter):  # Loop counter not used here
-                        PFx = (PF1 + PF2) / 2.0
-                        Flow1 = 2.0 * (+MFP1 - self.soil_profile[il1].MFPfromPF(PFx)) / TSL[il1]
-                        Flow2 = 2.0 * (-MFP2 + self.soil_profile[il2].MFPfromPF(PFx)) / TSL[il2]
-                        if abs(Flow1 - Flow2) < self.TinyFlow:
-                            # sufficient accuracy
-                            break
-                        elif abs(Flow1) > abs(Flow2):
-                            # flow in layer 1 is larger ; PFx must shift in the direction of PF1
-                            PF2 = PFx
-                        elif abs(Flow1) < abs(Flow2):
-                            # flow in layer 2 is larger ; PFx must shift in the direction of PF2
-                            PF1 = PFx
-                    else:  # No break
-                        msg = (
-                            "WATFDGW: LIMDRY flow iteration failed. Are your soil moisture and "
-                            + "conductivity curves decreasing with increasing pF?"
-                        )
-                        raise exc.PCSEError(msg)
-                    LIMDRY[il] = (Flow1 + Flow2) / 2.0
-
-                    if LIMDRY[il] < 0.0:
-                        # upward flow rate ; amount required for equal potential is required below
-                        Eq1 = -s.MWC[il2]
-                        Eq2 = 0.0
-                        for z in range(self.MaxFlowIter):
-                            EqualPotAmount = (Eq1 + Eq2) / 2.0
-                            SM1 = (s.MWC[il1] - EqualPotAmount) / TSL[il1]
-                            SM2 = (s.MWC[il2] + EqualPotAmount) / TSL[il2]
-                            PF1 = self.soil_profile[il1].SMfromPF(SM1)
-                            PF2 = self.soil_profile[il2].SMfromPF(SM2)
-                            if abs(Eq1 - Eq2) < self.TinyFlow:
-                                # sufficient accuracy
-                                break
-                            elif PF1 > PF2:
-                                # suction in top layer 1 is larger ; absolute amount should be larger
-                                Eq2 = EqualPotAmount
-                            else:
-                                # suction in bottom layer 1 is larger ; absolute amount should be reduced
-                                Eq1 = EqualPotAmount
-                        else:
-                            msg = (
-                                "WATFDGW: Limiting amount iteration in dry flow failed. Are your soil moisture "
-                                "and conductivity curves decreasing with increase pF?"
-                            )
-                            raise exc.PCSEError(msg)
+        LIMDRY, LIMWET, EqualPotAmount = self._limit_flows(pF, conductivity, matricfluxpot)
 
+        # The limits on the flow through the top of each layer depend on the flow
+        # through its bottom, so this is computed from the bottom layer upward
+        LIMDRY, LIMWET, EqualPotAmount = LIMDRY.tolist(), LIMWET.tolist(), EqualPotAmount.tolist()
+        MWC = s.MWC.tolist()
+        WTRALY_ = np.asarray(WTRALY, dtype=float).tolist()
+        WCFC, WC0 = sp.WCFC.tolist(), sp.WC0.tolist()
+        FlowMX_ = FlowMX.tolist()
+        for il in reversed(range(len(MWC))):
             FlowDown = True  # default
             if LIMDRY[il] < 0.0:
                 # upward flow (negative !) is limited by fraction of amount required for equilibrium
-                FlowMax = max(LIMDRY[il], EqualPotAmount * self.UpwardFlowLimit)
+                FlowMax = max(LIMDRY[il], EqualPotAmount[il] * self.UpwardFlowLimit)
                 if il > 0:
                     # upward flow is limited by amount required to bring target layer at equilibrium/field capacity
-                    # if (il==2) write (*,*) '2: ',FlowMax, LIMDRY(il), EqualPotAmount * UpwardFlowLimit
-                    if self.soil_profile.GroundWater:
+                    if sp.GroundWater:
                         # soil does not drain below equilibrium with groundwater
                         # FCequil = MAX(WCFC(il-1), EquilWater(il-1))
                         raise NotImplementedError("Groundwater influence not implemented yet.")
                     else:
                         # free drainage
-                        FCequil = self.soil_profile[il - 1].WCFC
+                        FCequil = WCFC[il - 1]
 
-                    TargetLimit = WTRALY[il - 1] + FCequil - s.MWC[il - 1] / delt
+                    TargetLimit = WTRALY_[il - 1] + FCequil - MWC[il - 1] / delt
                     if TargetLimit > 0.0:
                         # target layer is "dry": below field capacity ; limit upward flow
                         FlowMax = max(FlowMax, -1.0 * TargetLimit)
                         # there is no saturation prevention since upward flow leads to a decrease of WC[il]
                         # instead flow is limited in order to prevent a negative water content
-                        FlowMX[il] = max(FlowMax, FlowMX[il + 1] + WTRALY[il] - s.MWC[il] / delt)
+                        FlowMX_[il] = max(FlowMax, FlowMX_[il + 1] + WTRALY_[il] - MWC[il] / delt)
                         FlowDown = False
-                    elif self.soil_profile.GroundWater:
+                    elif sp.GroundWater:
                         # target layer is "wet", above field capacity. Since gravity is neglected
                         # in the matrix potential model, this "wet" upward flow is neglected.
-                        FlowMX[il] = 0.0
+                        FlowMX_[il] = 0.0
                         FlowDown = True
                     else:
                         # target layer is "wet", above field capacity, without groundwater
@@ -758,25 +683,27 @@ class WaterBalanceLayered(SimulationObject):
                 FlowMax = max(LIMDRY[il], LIMWET[il])
                 # this prevents saturation of layer il
                 # maximum top boundary flow is bottom boundary flow plus saturation deficit plus sink
-                FlowMX[il] = min(FlowMax, FlowMX[il + 1] + (self.soil_profile[il].WC0 - s.MWC[il]) / delt + WTRALY[il])
+                FlowMX_[il] = min(FlowMax, FlowMX_[il + 1] + (WC0[il] - MWC[il]) / delt + WTRALY_[il])
         # end for
+        FlowMX = np.array(FlowMX_)
 
         r.MRIN = min(RINPRE, FlowMX[0])
 
         # contribution of layers to soil evaporation in case of drought upward flow is allowed
-        EVSL = np.zeros_like(s.MSM)
-        for il, layer in enumerate(self.soil_profile):
+        WCW = sp.WCW.tolist()
+        EVSL_ = [0.0] * len(MWC)
+        for il in range(len(MWC)):
             if il == 0:
-                EVSL[il] = min(r.MEVS, (s.MWC[il] - layer.WCW) / delt + r.MRIN - WTRALY[il])
-                EVrest = r.MEVS - EVSL[il]
+                EVSL_[il] = min(r.MEVS, (MWC[il] - WCW[il]) / delt + r.MRIN - WTRALY_[il])
+                EVrest = r.MEVS - EVSL_[il]
             else:
-                Available = max(0.0, (s.MWC[il] - layer.WCW) / delt - WTRALY[il])
+                Available = max(0.0, (MWC[il] - WCW[il]) / delt - WTRALY_[il])
                 if Available >= EVrest:
-                    EVSL[il] = EVrest
+                    EVSL_[il] = EVrest
                     EVrest = 0.0
                     break
                 else:
-                    EVSL[il] = Available
+                    EVSL_[il] = Available
                     EVrest = EVrest - Available
         # reduce evaporation if entire profile becomes airdry
         # there is no evaporative flow through lower boundary of layer NSL
@@ -784,32 +711,28 @@ class WaterBalanceLayered(SimulationObject):
 
         # Convert contribution of soil layers to EVS as an upward flux
         # evaporative flow (taken positive !!!!) at layer boundaries
-        NSL = len(s.MSM)
+        NSL = len(MWC)
         EVflow = np.zeros_like(FlowMX)
-        EVflow[0] = r.MEVS
-        for il in range(1, NSL):
-            EVflow[il] = EVflow[il - 1] - EVSL[il - 1]
+        EVflow[:NSL] = np.subtract.accumulate([r.MEVS] + EVSL_[: NSL - 1])
         EVflow[NSL] = 0.0  # see comment above
+        EVflow_ = EVflow.tolist()
 
         # limit downward flows as to not get below field capacity / equilibrium content
-        Flow = np.zeros_like(FlowMX)
-        r.MDWC = np.zeros_like(s.MSM)
-        Flow[0] = r.MRIN - EVflow[0]
-        for il, layer in enumerate(self.soil_profile):
-            if self.soil_profile.GroundWater:
-                # soil does not drain below equilibrium with groundwater
-                # WaterLeft = max(self.WCFC[il], EquilWater[il])
-                raise NotImplementedError("Groundwater influence not implemented yet.")
-            else:
-                # free drainage
-                WaterLeft = layer.WCFC
-            MXLOSS = (s.MWC[il] - WaterLeft) / delt  # maximum loss
-            Excess = max(0.0, MXLOSS + Flow[il] - WTRALY[il])  # excess of water (positive)
-            Flow[il + 1] = min(
-                FlowMX[il + 1], Excess - EVflow[il + 1]
-            )  # note that a negative (upward) flow is not affected
-            # rate of change
-            r.MDWC[il] = Flow[il] - Flow[il + 1] - WTRALY[il]
+        if sp.GroundWater:
+            # soil does not drain below equilibrium with groundwater
+            # WaterLeft = max(self.WCFC[il], EquilWater[il])
+            raise NotImplementedError("Groundwater influence not implemented yet.")
+        Flow_ = [0.0] * (NSL + 1)
+        Flow_[0] = r.MRIN - EVflow_[0]
+        for il in range(NSL):
+            # free drainage
+            WaterLeft = WCFC[il]
+            MXLOSS = (MWC[il] - WaterLeft) / delt  # maximum loss
+            Excess = max(0.0, MXLOSS + Flow_[il] - WTRALY_[il])  # excess of water (positive)
+            Flow_[il + 1] = min(FlowMX_[il + 1], Excess - EVflow_[il + 1])  # note that a negative (upward) flow is not affected
+        Flow = np.array(Flow_)
+        # rate of change
+        r.MDWC = Flow[:-1] - Flow[1:] - WTRALY
 
         # Flow at the bottom of the profile
         r.MBOTTOMFLOW = Flow[-1]
@@ -843,11 +766,8 @@ class WaterBalanceLayered(SimulationObject):
         r = self.rates
 
         # amount of water in soil layers ; soil moisture content
-        SM = np.zeros_like(s.MSM)
-        WC = np.zeros_like(s.MWC)
-        for il, layer in enumerate(self.soil_profile):
-            WC[il] = s.MWC[il] + r.MDWC[il] * delt
-            SM[il] = WC[il] / layer.Thickness
+        WC = s.MWC + r.MDWC * delt
+        SM = WC / self.soil_profile.Thickness
         # NOTE: We cannot replace WC[il] with s.WC[il] above because the kiosk will not
         # be updated since traitlets cannot monitor changes within lists/arrays.
         # So we have to assign:
@@ -888,30 +808,17 @@ class WaterBalanceLayered(SimulationObject):
             self.soil_profile.determine_rooting_status(RD, self._RDM)
 
         # compute summary values for rooted, potentially rooted and unrooted soil compartments
-        W = 0.0
-        WAVUPP = 0.0
-        WLOW = 0.0
-        WAVLOW = 0.0
-        WBOT = 0.0
-        WAVBOT = 0.0
-
-        # get W and WLOW and available water amounts
-        for il, layer in enumerate(self.soil_profile):
-            W += s.MWC[il] * layer.Wtop
-            WLOW += s.MWC[il] * layer.Wpot
-            WBOT += s.MWC[il] * layer.Wund
-            WAVUPP += (s.MWC[il] - layer.WCW) * layer.Wtop
-            WAVLOW += (s.MWC[il] - layer.WCW) * layer.Wpot
-            WAVBOT += (s.MWC[il] - layer.WCW) * layer.Wund
-
-        # Update states
-        s.MW = W
-        s.MWLOW = WLOW
+        # get W and WLOW and available water amounts, the sums are accumulated from
+        # the top layer downward
+        Wtop, Wpot, Wund = self.soil_profile.layer_weights()
+        WAV = s.MWC - self.soil_profile.WCW
+        s.MW = float(np.add.accumulate(s.MWC * Wtop)[-1])
+        s.MWLOW = float(np.add.accumulate(s.MWC * Wpot)[-1])
         s.MWWLOW = s.MW + s.MWLOW
-        s.MWBOT = WBOT
-        s.MWAVUPP = WAVUPP
-        s.MWAVLOW = WAVLOW
-        s.MWAVBOT = WAVBOT
+        s.MWBOT = float(np.add.accumulate(s.MWC * Wund)[-1])
+        s.MWAVUPP = float(np.add.accumulate(WAV * Wtop)[-1])
+        s.MWAVLOW = float(np.add.accumulate(WAV * Wpot)[-1])
+        s.MWAVBOT = float(np.add.accumulate(WAV * Wund)[-1])
 
         self._RDold = RD
         s.MSM_MEAN = s.MW / RD
@@ -941,6 +848,117 @@ class WaterBalanceLayered(SimulationObject):
                 msg = "Waterbalance not closing on %s with checksum: %f" % (day, checksum)
                 raise exc.WaterBalanceError(msg)
 
+    def _limit_flows(
+        self, pF: np.ndarray, conductivity: np.ndarray, matricfluxpot: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Computes the limits on the flow through the top boundary of all layers.
+
+        Returns the flow limits under wet (LIMWET) and dry (LIMDRY) conditions and,
+        for an upward dry flow, the amount required to bring the two layers at the
+        boundary at equal potential (EqualPotAmount). Boundaries between layers with
+        different properties require a search for the pF at the boundary by bisection,
+        which is done for all these boundaries at once.
+        """
+        s = self.states
+        sp = self.soil_profile
+        TSL = sp.Thickness
+        MWC = s.MWC
+
+        # limiting DOWNWARD flow rate
+        # == wet conditions: the soil conductivity is larger
+        #    the soil conductivity is the flow rate for gravity only
+        #    this limit is DOWNWARD only
+        # == dry conditions: the MFP gradient
+        #    the MFP gradient is larger for dry conditions
+        #    allows SOME upward flow
+        LIMDRY = np.zeros_like(MWC)
+        LIMWET = np.zeros_like(MWC)
+        EqualPotAmount = np.zeros_like(MWC)
+        # Top soil layer
+        LIMWET[0] = sp.SurfaceConductivity
+        # the limit under wet conditions is a unit gradient
+        LIMWET[1:] = (TSL[:-1] + TSL[1:]) / (TSL[:-1] / conductivity[:-1] + TSL[1:] / conductivity[1:])
+
+        # Layers il-1 and il have same properties: flow rates are estimated from
+        # the gradient in Matric Flux Potential
+        same = np.flatnonzero(sp.same_type) + 1
+        if len(same) > 0:
+            LIMDRY[same] = 2.0 * (matricfluxpot[same - 1] - matricfluxpot[same]) / (TSL[same - 1] + TSL[same])
+            # upward flow rate ; amount required for equal water content is required below
+            MeanSM = (MWC[same - 1] + MWC[same]) / (TSL[same - 1] + TSL[same])
+            EqualPotAmount[same] = MWC[same - 1] - TSL[same - 1] * MeanSM  # should be negative like the flow
+
+        # Layers il-1 and il have different properties: iterative search to PF at
+        # layer boundary (by bisection)
+        il2 = np.flatnonzero(~sp.same_type) + 1
+        if len(il2) == 0:
+            return LIMDRY, LIMWET, EqualPotAmount
+        il1 = il2 - 1
+        PF1 = pF[il1]
+        PF2 = pF[il2]
+        MFP1 = matricfluxpot[il1]
+        MFP2 = matricfluxpot[il2]
+        Flow1 = np.zeros(len(il2))
+        Flow2 = np.zeros(len(il2))
+        active = np.ones(len(il2), dtype=bool)
+        for z in range(self.MaxFlowIter):  # Loop counter not used here
+            a = np.flatnonzero(active)
+            PFx = (PF1[a] + PF2[a]) / 2.0
+            Flow1[a] = 2.0 * (+MFP1[a] - sp.MFPfromPF(PFx, rows=il1[a])) / TSL[il1[a]]
+            Flow2[a] = 2.0 * (-MFP2[a] + sp.MFPfromPF(PFx, rows=il2[a])) / TSL[il2[a]]
+            diff = np.abs(Flow1[a]) - np.abs(Flow2[a])
+            # sufficient accuracy
+            done = np.abs(Flow1[a] - Flow2[a]) < self.TinyFlow
+            # flow in layer 1 is larger ; PFx must shift in the direction of PF1
+            PF2[a] = np.where(~done & (diff > 0.0), PFx, PF2[a])
+            # flow in layer 2 is larger ; PFx must shift in the direction of PF2
+            PF1[a] = np.where(~done & (diff < 0.0), PFx, PF1[a])
+            active[a[done]] = False
+            if not active.any():
+                break
+        else:  # No break
+            msg = (
+                "WATFDGW: LIMDRY flow iteration failed. Are your soil moisture and "
+                + "conductivity curves decreasing with increasing pF?"
+            )
+            raise exc.PCSEError(msg)
+        LIMDRY[il2] = (Flow1 + Flow2) / 2.0
+
+        # upward flow rate ; amount required for equal potential is required below
+        upward = LIMDRY[il2] < 0.0
+        il1, il2 = il1[upward], il2[upward]
+        if len(il2) == 0:
+            return LIMDRY, LIMWET, EqualPotAmount
+        Eq1 = -MWC[il2]
+        Eq2 = np.zeros(len(il2))
+        Amount = np.zeros(len(il2))
+        active = np.ones(len(il2), dtype=bool)
+        for z in range(self.MaxFlowIter):
+            a = np.flatnonzero(active)
+            Amount[a] = (Eq1[a] + Eq2[a]) / 2.0
+            SM1 = (MWC[il1[a]] - Amount[a]) / TSL[il1[a]]
+            SM2 = (MWC[il2[a]] + Amount[a]) / TSL[il2[a]]
+            PF1 = sp.SMfromPF(SM1, rows=il1[a])
+            PF2 = sp.SMfromPF(SM2, rows=il2[a])
+            # sufficient accuracy
+            done = np.abs(Eq1[a] - Eq2[a]) < self.TinyFlow
+            # suction in top layer 1 is larger ; absolute amount should be larger
+            Eq2[a] = np.where(~done & (PF1 > PF2), Amount[a], Eq2[a])
+            # suction in bottom layer 1 is larger ; absolute amount should be reduced
+            Eq1[a] = np.where(~done & ~(PF1 > PF2), Amount[a], Eq1[a])
+            active[a[done]] = False
+            if not active.any():
+                break
+        else:
+            msg = (
+                "WATFDGW: Limiting amount iteration in dry flow failed. Are your soil moisture "
+                "and conductivity curves decreasing with increase pF?"
+            )
+            raise exc.PCSEError(msg)
+        EqualPotAmount[il2] = Amount
+
+        return LIMDRY, LIMWET, EqualPotAmount
+
     def _determine_rooting_depth(self) -> float:
         """Determines appropriate use of the rooting depth (RD)
 
@@ -8,7 +8,7 @@ Modified by: Will Solow, 2025
 from math import sqrt
 import numpy as np
 from pcse.utils.traitlets import Float, Int, Instance, Enum, Unicode, Bool, HasTraits, List
-from pcse.util import Afgen, DotMap
+from pcse.util import Afgen, StackedAfgen, DotMap
 
 from pcse.utils import exceptions as exc
 
@@ -207,6 +207,19 @@ class SoilProfile(list):
                 value = SoilLayer(value, sp.PFFieldCapacity, sp.PFWiltingPoint)
             setattr(self, attr, value)
 
+        # Tables and properties of all layers stacked into arrays, so that they
+        # can be computed for all layers at once, e.g. `self.PFfromSM(SM)`
+        self.SMfromPF = StackedAfgen([layer.SMfromPF for layer in self])
+        self.PFfromSM = StackedAfgen([layer.PFfromSM for layer in self])
+        self.CONDfromPF = StackedAfgen([layer.CONDfromPF for layer in self])
+        self.MFPfromPF = StackedAfgen([layer.MFPfromPF for layer in self])
+        self.Thickness = np.array([layer.Thickness for layer in self])
+        self.WC0 = np.array([layer.WC0 for layer in self])
+        self.WCW = np.array([layer.WCW for layer in self])
+        self.WCFC = np.array([layer.WCFC for layer in self])
+        # Flags for the boundaries between layer i-1 and i whether both layers have the same properties
+        self.same_type = np.array([self[i - 1] == self[i] for i in range(1, len(self))], dtype=bool)
+
     def determine_rooting_status(self, RD: float, RDM: float) -> None:
         """Determines the rooting status of the soil layers and update layer weights.
 
@@ -263,6 +276,14 @@ class SoilProfile(list):
                 msg = "Unknown rooting status: %s" % layer.rooting_status
                 raise exc.PCSEError(msg)
 
+    def layer_weights(self) -> np.ndarray:
+        """Returns the weights of all layers as an array with rows Wtop, Wpot and Wund.
+
+        The weights are read from the layers because these are the values that
+        are restored with the state of the simulation.
+        """
+        return np.array([(layer.Wtop, layer.Wpot, layer.Wund) for layer in self]).T
+
     def validate_max_rooting_depth(self, RDM: float) -> None:
         """Validate that the maximum rooting depth coincides with a layer boundary.
 
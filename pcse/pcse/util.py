@@ -9,6 +9,7 @@ from pathlib import Path
 import datetime
 from math import cos, sin, asin, sqrt, exp, pi, radians
 from collections import namedtuple
+from functools import lru_cache
 from bisect import bisect_left
 import textwrap
 from collections.abc import Iterable
@@ -45,6 +46,16 @@ class ConfigurationLoader(object):
     model_config_file = None
     description = None
 
+    # Defaults for optional attributes
+    KIOSK = "dict"
+    TEMPLATES = "traitlets"
+    OUTPUT_MODE = "full"
+    LEAN_OUTPUT_VARS = []
+    FULL_TRACE = False
+    OUTPUT_BUFFER_DAYS = 0
+    SIGNALS = "pydispatch"
+    QUIET = False
+
     def __init__(self, config: str | Path | dict) -> None:
 
         if isinstance(config, (str, Path)):
@@ -127,6 +138,10 @@ class ConfigurationLoader(object):
         return msg
 
 
+# Argument types for which Afgen and MultiAfgen return an array
+_ARRAY_TYPES = frozenset((np.ndarray, np.memmap, list, tuple))
+
+
 class Afgen(object):
     """Emulates the AFGEN function in WOFOST.
 
@@ -150,6 +165,12 @@ class Afgen(object):
         10.0
         >>> f(-1)
         0.0
+
+    The table is also stored as NumPy arrays, so that `f` can be called with
+    an array of X values, returning an array of interpolated values::
+
+        >>> f(np.array([0.5, 1.5, 6.0]))
+        array([ 0.5  ,  2.125, 10.   ])
     """
 
     def _check_x_ascending(self, tbl_xy: list[float]) -> tuple[list, list]:
@@ -193,8 +214,15 @@ class Afgen(object):
         intervals = list(zip(x_list, x_list[1:], y_list, y_list[1:]))
         self.slopes = [(y2 - y1) / (x2 - x1) for x1, x2, y1, y2 in intervals]
 
-    def __call__(self, x: float) -> float:
+        # Table as arrays for evaluation of arrays of X values
+        self._x = np.array(x_list)
+        self._y = np.array(y_list)
+        self._slopes = np.array(self.slopes)
 
+    def __call__(self, x: float | np.ndarray) -> float | np.ndarray:
+
+        if type(x) in _ARRAY_TYPES:
+            return self._call_array(x)
         if x <= self.x_list[0]:
             return self.y_list[0]
         if x >= self.x_list[-1]:
@@ -205,6 +233,15 @@ class Afgen(object):
 
         return v
 
+    def _call_array(self, x: np.ndarray) -> np.ndarray:
+        """Interpolates the table at an array of X values."""
+        x = np.asarray(x, dtype=float)
+        if len(self._slopes) == 0:
+            return np.full(x.shape, self._y[0])
+        i = np.clip(np.searchsorted(self._x, x, side="left") - 1, 0, len(self._slopes) - 1)
+        v = self._y[i] + self._slopes[i] * (x - self._x[i])
+        return np.where(x <= self._x[0], self._y[0], np.where(x >= self._x[-1], self._y[-1], v))
+
 
 class MultiAfgen(object):
     """Emulates the AFGEN function in WOFOST for multi dimensional trait tables"""
@@ -261,18 +298,125 @@ class MultiAfgen(object):
         intervals = list(zip(z_list, z_list[1:], xy_list, xy_list[1:]))
         self.slopes = [(y2 - y1) / (x2 - x1) for x1, x2, y1, y2 in intervals]
 
-    def __call__(self, z: float, x: float) -> float:
-
+        # The rows share the X values, so the Y values of the rows and their
+        # slopes along Z are kept as a table with a row for each Z value
+        self._rows = [Afgen(xy) for xy in xy_list]
+        self._x = self._rows[0]._x
+        self._y = np.array([row.y_list for row in self._rows])
+        self._z = np.array(z_list)
+        self._zslopes = np.diff(self._y, axis=0) / np.diff(self._z)[:, None]
+        self.x_list = self._rows[0].x_list
+        self.y_table = self._y.tolist()
+        self.z_slopes = self._zslopes.tolist()
+
+    def __call__(self, z: float | np.ndarray, x: float | np.ndarray) -> float | np.ndarray:
+
+        if type(z) in _ARRAY_TYPES or type(x) in _ARRAY_TYPES:
+            return self._call_array(z, x)
         if z <= self.z_list[0]:
-            return Afgen(self.xy_list[0])(x)
+            return self._rows[0](x)
         if z >= self.z_list[-1]:
-            return Afgen(self.xy_list[-1])(x)
+            return self._rows[-1](x)
 
+        # Interpolate the row at z only for the X interval that contains x
         i = bisect_left(self.z_list, z) - 1
+        dz = z - self.z_list[i]
+        y, s = self.y_table[i], self.z_slopes[i]
+        x_list = self.x_list
+        if x <= x_list[0]:
+            return y[0] + s[0] * dz
+        if x >= x_list[-1]:
+            return y[-1] + s[-1] * dz
+
+        j = bisect_left(x_list, x) - 1
+        y1 = y[j] + s[j] * dz
+        y2 = y[j + 1] + s[j + 1] * dz
+        return y1 + (y2 - y1) / (x_list[j + 1] - x_list[j]) * (x - x_list[j])
+
+    def _call_array(self, z: np.ndarray, x: np.ndarray) -> np.ndarray:
+        """Interpolates the table at arrays of Z and X values, which are
+        broadcast against each other.
+        """
+        z, x = np.broadcast_arrays(np.asarray(z, dtype=float), np.asarray(x, dtype=float))
 
-        v = self.xy_list[i] + self.slopes[i] * (z - self.z_list[i])
+        # Y values of the rows at z, with an extra last axis over X
+        if len(self._z) == 1:
+            y = np.broadcast_to(self._y[0], z.shape + self._y[0].shape)
+        else:
+            i = np.clip(np.searchsorted(self._z, z, side="left") - 1, 0, len(self._z) - 2)
+            y = self._y[i] + self._zslopes[i] * (z - self._z[i])[..., None]
+            y = np.where((z <= self._z[0])[..., None], self._y[0], y)
+            y = np.where((z >= self._z[-1])[..., None], self._y[-1], y)
+
+        # Interpolation of the rows at x
+        if len(self._x) == 1:
+            return y[..., 0].copy()
+        j = np.clip(np.searchsorted(self._x, x, side="left") - 1, 0, len(self._x) - 2)[..., None]
+        y1 = np.take_along_axis(y, j, axis=-1)[..., 0]
+        y2 = np.take_along_axis(y, j + 1, axis=-1)[..., 0]
+        x1, x2 = self._x[j[..., 0]], self._x[j[..., 0] + 1]
+        v = y1 + (y2 - y1) / (x2 - x1) * (x - x1)
+        return np.where(x <= self._x[0], y[..., 0], np.where(x >= self._x[-1], y[..., -1], v))
+
+
+class StackedAfgen(object):
+    """Stack of Afgen tables that are evaluated together, e.g. a table for
+    every layer of a soil profile.
+
+    :param afgens: list of Afgen tables, the tables may differ in their X
+        values and number of points
+
+    Calling the stack with an array of X values interpolates table i at the
+    i-th value, or at the tables given by `rows`. The tables are padded to
+    the same length, so that all interpolations are done in one pass with
+    the same arithmetic as `Afgen`, which gives identical results.
+    """
+
+    def __init__(self, afgens: list[Afgen]) -> None:
+        self.afgens = list(afgens)
+        n = max(len(afgen.x_list) for afgen in self.afgens)
+        self._x = np.full((len(self.afgens), n), np.inf)
+        self._y = np.zeros((len(self.afgens), n))
+        self._slopes = np.zeros((len(self.afgens), n))
+        for i, afgen in enumerate(self.afgens):
+            self._x[i, : len(afgen.x_list)] = afgen.x_list
+            self._y[i, : len(afgen.y_list)] = afgen.y_list
+            self._slopes[i, : len(afgen.slopes)] = afgen.slopes
+        last = np.array([len(afgen.x_list) - 1 for afgen in self.afgens])
+        rows = np.arange(len(self.afgens))
+
+        # Flattened tables, the table values of row i start at i * n
+        self._offset = rows * n
+        self._imax = self._offset + np.maximum(last - 1, 0)
+        self._xflat = self._x.ravel()
+        self._yflat = self._y.ravel()
+        self._sflat = self._slopes.ravel()
+        self._x0, self._y0 = self._x[:, 0].copy(), self._y[:, 0].copy()
+        self._xn, self._yn = self._x[rows, last], self._y[rows, last]
+
+    def __len__(self) -> int:
+        return len(self.afgens)
+
+    def __getitem__(self, index: int) -> Afgen:
+        return self.afgens[index]
+
+    def __call__(self, x: np.ndarray, rows: np.ndarray = None) -> np.ndarray:
+        x = np.asarray(x, dtype=float)
+        if rows is None:
+            X, offset, imax = self._x, self._offset, self._imax
+            x0, y0, xn, yn = self._x0, self._y0, self._xn, self._yn
+        else:
+            X, offset, imax = self._x[rows], self._offset[rows], self._imax[rows]
+            x0, y0, xn, yn = self._x0[rows], self._y0[rows], self._xn[rows], self._yn[rows]
 
-        return Afgen(v)(x)
+        # Index of the interval as given by bisect_left, the padding is never counted
+        i = (X < x[:, None]).sum(axis=1) + (offset - 1)
+        i = np.minimum(np.maximum(i, offset), imax)
+        v = self._yflat[i] + self._sflat[i] * (x - self._xflat[i])
+        v[x >= xn] = yn[x >= xn]
+        v[x <= x0] = y0[x <= x0]
+
+        return v
 
 
 class AfgenTrait(TraitType):
@@ -387,7 +531,89 @@ def doy(day: dt.date) -> int:
         raise RuntimeError(msg)
 
 
-def astro(day: dt.date, latitude: float, radiation: float, _cache: dict = {}) -> astro_nt:
+# Number of latitudes for which the season tables of `astro_table()` are kept
+# and number of (day, latitude, radiation) results kept by `astro()`
+ASTRO_TABLE_CACHE_SIZE = 256
+ASTRO_CACHE_SIZE = 16384
+
+astro_table_nt = namedtuple("AstroTable", "DEC, SC, SINLD, COSLD, DAYL, DAYLP, DSINB, DSINBE, rows")
+
+
+@lru_cache(maxsize=ASTRO_TABLE_CACHE_SIZE)
+def astro_table(latitude: float) -> astro_table_nt:
+    """Computes the radiation independent terms of `astro()` for every
+    day-of-year at a latitude.
+
+    :param latitude:    latitude of location
+
+    Output is a `namedtuple` of arrays of length 367 indexed by day-of-year
+    (index 0 is unused) with the declination (DEC), solar constant (SC),
+    SINLD, COSLD, DAYL, DAYLP, and the integrals of the sine of solar height
+    DSINB and DSINBE. `rows` holds the same values per day-of-year as a tuple
+    of floats (SC, SINLD, COSLD, DAYL, DAYLP, DSINB, DSINBE) for fast scalar
+    access. The tables of the most recently used latitudes are cached.
+    """
+    if abs(latitude) > 90.0:
+        msg = "Latitude not between -90 and 90"
+        raise RuntimeError(msg)
+    LAT = latitude
+
+    # constants
+    RAD = radians(1.0)
+    ANGLE = -4.0
+
+    # The table is computed once per latitude with the same scalar functions
+    # as before, so that the results do not differ in the last digits
+    rows = []
+    for IDAY in range(367):
+        # Declination and solar constant for this day
+        DEC = -asin(sin(23.45 * RAD) * cos(2.0 * pi * (float(IDAY) + 10.0) / 365.0))
+        SC = 1370.0 * (1.0 + 0.033 * cos(2.0 * pi * float(IDAY) / 365.0))
+
+        # calculation of daylength from intermediate variables
+        # SINLD, COSLD and AOB
+        SINLD = sin(RAD * LAT) * sin(DEC)
+        COSLD = cos(RAD * LAT) * cos(DEC)
+        AOB = SINLD / COSLD
+
+        # For very high latitudes and days in summer and winter a limit is
+        # inserted to avoid math errors when daylength reaches 24 hours in
+        # summer or 0 hours in winter.
+
+        # Calculate solution for base=0 degrees
+        if abs(AOB) <= 1.0:
+            DAYL = 12.0 * (1.0 + 2.0 * asin(AOB) / pi)
+            # integrals of sine of solar height
+            DSINB = 3600.0 * (DAYL * SINLD + 24.0 * COSLD * sqrt(1.0 - AOB**2) / pi)
+            DSINBE = 3600.0 * (
+                DAYL * (SINLD + 0.4 * (SINLD**2 + COSLD**2 * 0.5))
+                + 12.0 * COSLD * (2.0 + 3.0 * 0.4 * SINLD) * sqrt(1.0 - AOB**2) / pi
+            )
+        else:
+            DAYL = 24.0 if AOB > 1.0 else 0.0
+            # integrals of sine of solar height
+            DSINB = 3600.0 * (DAYL * SINLD)
+            DSINBE = 3600.0 * (DAYL * (SINLD + 0.4 * (SINLD**2 + COSLD**2 * 0.5)))
+
+        # Calculate solution for base=-4 (ANGLE) degrees
+        AOB_CORR = (-sin(ANGLE * RAD) + SINLD) / COSLD
+        if abs(AOB_CORR) <= 1.0:
+            DAYLP = 12.0 * (1.0 + 2.0 * asin(AOB_CORR) / pi)
+        elif AOB_CORR > 1.0:
+            DAYLP = 24.0
+        else:
+            DAYLP = 0.0
+
+        rows.append((DEC, SC, SINLD, COSLD, DAYL, DAYLP, DSINB, DSINBE))
+
+    columns = [np.array(column) for column in zip(*rows)]
+    for column in columns:
+        column.flags.writeable = False
+    rows = tuple(row[1:] for row in rows)
+    return astro_table_nt(*columns, rows)
+
+
+def astro(day: dt.date, latitude: float, radiation: float) -> astro_nt:
     """python version of ASTRO routine by Daniel van Kraalingen.
 
     This subroutine calculates astronomic daylength, diurnal radiation
@@ -409,6 +635,10 @@ def astro(day: dt.date, latitude: float, radiation: float, _cache: dict = {}) ->
         DSINBE    Daily total of effective solar height         s
         ANGOT     Angot radiation at top of atmosphere       J m-2 d-1
 
+    The radiation independent terms are taken from the season table of
+    `astro_table()`, the results for recent (day, latitude, radiation)
+    combinations are kept in a bounded cache.
+
     Authors: Daniel van Kraalingen
     Date   : April 1991
 
@@ -416,71 +646,13 @@ def astro(day: dt.date, latitude: float, radiation: float, _cache: dict = {}) ->
     Author      : Allard de Wit
     Date        : January 2011
     """
+    return _astro(doy(day), latitude, radiation)
 
-    # Check for range of latitude
-    if abs(latitude) > 90.0:
-        msg = "Latitude not between -90 and 90"
-        raise RuntimeError(msg)
-    LAT = latitude
-
-    # Determine day-of-year (IDAY) from day
-    IDAY = doy(day)
-
-    # reassign radiation
-    AVRAD = radiation
-
-    # Test if variables for given (day, latitude, radiation) were already calculated
-    # in a previous run. If not (e.g. KeyError) calculate the variables, store
-    # in cache and return the value.
-    try:
-        return _cache[(IDAY, LAT, AVRAD)]
-    except KeyError:
-        pass
-
-    # constants
-    RAD = radians(1.0)
-    ANGLE = -4.0
-
-    # Declination and solar constant for this day
-    DEC = -asin(sin(23.45 * RAD) * cos(2.0 * pi * (float(IDAY) + 10.0) / 365.0))
-    SC = 1370.0 * (1.0 + 0.033 * cos(2.0 * pi * float(IDAY) / 365.0))
-
-    # calculation of daylength from intermediate variables
-    # SINLD, COSLD and AOB
-    SINLD = sin(RAD * LAT) * sin(DEC)
-    COSLD = cos(RAD * LAT) * cos(DEC)
-    AOB = SINLD / COSLD
-
-    # For very high latitudes and days in summer and winter a limit is
-    # inserted to avoid math errors when daylength reaches 24 hours in
-    # summer or 0 hours in winter.
 
-    # Calculate solution for base=0 degrees
-    if abs(AOB) <= 1.0:
-        DAYL = 12.0 * (1.0 + 2.0 * asin(AOB) / pi)
-        # integrals of sine of solar height
-        DSINB = 3600.0 * (DAYL * SINLD + 24.0 * COSLD * sqrt(1.0 - AOB**2) / pi)
-        DSINBE = 3600.0 * (
-            DAYL * (SINLD + 0.4 * (SINLD**2 + COSLD**2 * 0.5))
-            + 12.0 * COSLD * (2.0 + 3.0 * 0.4 * SINLD) * sqrt(1.0 - AOB**2) / pi
-        )
-    else:
-        if AOB > 1.0:
-            DAYL = 24.0
-        if AOB < -1.0:
-            DAYL = 0.0
-        # integrals of sine of solar height
-        DSINB = 3600.0 * (DAYL * SINLD)
-        DSINBE = 3600.0 * (DAYL * (SINLD + 0.4 * (SINLD**2 + COSLD**2 * 0.5)))
-
-    # Calculate solution for base=-4 (ANGLE) degrees
-    AOB_CORR = (-sin(ANGLE * RAD) + SINLD) / COSLD
-    if abs(AOB_CORR) <= 1.0:
-        DAYLP = 12.0 * (1.0 + 2.0 * asin(AOB_CORR) / pi)
-    elif AOB_CORR > 1.0:
-        DAYLP = 24.0
-    elif AOB_CORR < -1.0:
-        DAYLP = 0.0
+@lru_cache(maxsize=ASTRO_CACHE_SIZE)
+def _astro(IDAY: int, LAT: float, AVRAD: float) -> astro_nt:
+    """Computes `astro()` for a day-of-year, see `astro()`."""
+    SC, SINLD, COSLD, DAYL, DAYLP, DSINB, DSINBE = astro_table(LAT).rows[IDAY]
 
     # extraterrestrial radiation and atmospheric transmission
     ANGOT = SC * DSINB
@@ -502,13 +674,50 @@ def astro(day: dt.date, latitude: float, radiation: float, _cache: dict = {}) ->
 
     DIFPP = FRDIF * ATMTR * 0.5 * SC
 
-    retvalue = astro_nt(DAYL, DAYLP, SINLD, COSLD, DIFPP, ATMTR, DSINBE, ANGOT)
-    _cache[(IDAY, LAT, AVRAD)] = retvalue
+    return astro_nt(DAYL, DAYLP, SINLD, COSLD, DIFPP, ATMTR, DSINBE, ANGOT)
 
-    return retvalue
 
+def doy_array(days: Iterable) -> np.ndarray:
+    """Converts a sequence of dates or a datetime64 array to an integer array
+    of day-of-year (Jan 1st = doy 1)"""
+    days = np.asarray(days, dtype="datetime64[D]")
+    return (days - days.astype("datetime64[Y]")).astype(int) + 1
+
+
+def astro_array(days: Iterable, latitude: float, radiation: np.ndarray) -> astro_nt:
+    """Array version of `astro()` for a series of days at a single location.
+
+    :param days:        sequence of date objects or a datetime64 array
+    :param latitude:    latitude of location
+    :param radiation:   array of daily global incoming radiation (J/m2/day)
+
+    Output is an `astro_nt` namedtuple with the same tags as `astro()`,
+    holding an array with a value for each day. The branches of `astro()`
+    for polar day and night are applied element-wise.
+    """
+    IDAY = doy_array(days)
+    AVRAD = np.asarray(radiation, dtype=float)
+    t = astro_table(latitude)
+    SC, SINLD, COSLD, DAYL, DAYLP, DSINB, DSINBE = (
+        column[IDAY] for column in (t.SC, t.SINLD, t.COSLD, t.DAYL, t.DAYLP, t.DSINB, t.DSINBE)
+    )
+
+    # extraterrestrial radiation and atmospheric transmission
+    ANGOT = SC * DSINB
+    ATMTR = np.divide(AVRAD, ANGOT, out=np.zeros_like(ANGOT), where=DAYL > 0.0)
+
+    # estimate fraction diffuse irradiation
+    FRDIF = np.select(
+        [ATMTR > 0.75, ATMTR > 0.35, ATMTR > 0.07],
+        [0.23, 1.33 - 1.46 * ATMTR, 1.0 - 2.3 * (ATMTR - 0.07) ** 2],
+        default=1.0,
+    )
+    DIFPP = FRDIF * ATMTR * 0.5 * SC
 
-def daylength(day: dt.date, latitude: float, angle: float = -4, _cache: dict = {}) -> float:
+    return astro_nt(DAYL, DAYLP, SINLD, COSLD, DIFPP, ATMTR, DSINBE, ANGOT)
+
+
+def daylength(day: dt.date, latitude: float, angle: float = -4) -> float:
     """Calculates the daylength for a given day, altitude and base.
 
     :param day:         date/datetime object
@@ -517,26 +726,23 @@ def daylength(day: dt.date, latitude: float, angle: float = -4, _cache: dict = {
         is `angle` degrees under the horizon. Default is -4 degrees.
 
     Derived from the WOFOST routine ASTRO.FOR and simplified to include only
-    daylength calculation. Results are being cached for performance
+    daylength calculation. The default angle is taken from the season table
+    of `astro_table()`, other angles are kept in a bounded cache.
     """
-    # from unum.units import h
+    IDAY = doy(day)
+    if angle == -4:
+        return astro_table(latitude).rows[IDAY][4]
+    return _daylength(IDAY, latitude, angle)
 
+
+@lru_cache(maxsize=ASTRO_CACHE_SIZE)
+def _daylength(IDAY: int, latitude: float, angle: float) -> float:
+    """Computes `daylength()` for a day-of-year, see `daylength()`."""
     # Check for range of latitude
     if abs(latitude) > 90.0:
         msg = "Latitude not between -90 and 90"
         raise RuntimeError(msg)
 
-    # Calculate day-of-year from date object day
-    IDAY = doy(day)
-
-    # Test if daylength for given (day, latitude, angle) was already calculated
-    # in a previous run. If not (e.g. KeyError) calculate the daylength, store
-    # in cache and return the value.
-    try:
-        return _cache[(IDAY, latitude, angle)]
-    except KeyError:
-        pass
-
     # constants
     RAD = radians(1.0)
 
@@ -556,9 +762,6 @@ def daylength(day: dt.date, latitude: float, angle: float = -4, _cache: dict = {
     else:
         DAYLP = 0.0
 
-    # store results in cache
-    _cache[(IDAY, latitude, angle)] = DAYLP
-
     return DAYLP
 
 
@@ -873,6 +1076,148 @@ def penman_monteith(
     return ET0
 
 
+def reference_ET_array(
+    DAY: Iterable,
+    LAT: float,
+    ELEV: float,
+    TMIN: np.ndarray,
+    TMAX: np.ndarray,
+    IRRAD: np.ndarray,
+    VAP: np.ndarray,
+    WIND: np.ndarray,
+    ANGSTA: float,
+    ANGSTB: float,
+    ETMODEL: str = "PM",
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Array version of `reference_ET()` for a series of days at a single location.
+
+    DAY is a sequence of dates or a datetime64 array, the weather variables
+    are arrays with a value for each day. Returns a tuple of arrays (E0, ES0, ET0),
+    see `reference_ET()` for the variables and units.
+    """
+    if ETMODEL not in ["PM", "P"]:
+        msg = "Variable ETMODEL can have values 'PM'|'P' only."
+        raise RuntimeError(msg)
+
+    r = astro_array(DAY, LAT, IRRAD)
+    E0, ES0, ET0 = penman_array(r.ATMTR, ELEV, TMIN, TMAX, IRRAD, VAP, WIND, ANGSTA, ANGSTB)
+    if ETMODEL == "PM":
+        ET0 = penman_monteith_array(r.ANGOT, ELEV, TMIN, TMAX, IRRAD, VAP, WIND)
+
+    return E0, ES0, ET0
+
+
+def penman_array(
+    ATMTR: np.ndarray,
+    ELEV: float,
+    TMIN: np.ndarray,
+    TMAX: np.ndarray,
+    AVRAD: np.ndarray,
+    VAP: np.ndarray,
+    WIND2: np.ndarray,
+    ANGSTA: float,
+    ANGSTB: float,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Array version of `penman()`.
+
+    Takes the atmospheric transmission (ATMTR) of each day from `astro_array()`
+    instead of the date and latitude. Invalid input (e.g. a negative vapour
+    pressure) results in NaN rather than an exception.
+    """
+    PSYCON = 0.67
+    REFCFW = 0.05
+    REFCFS = 0.15
+    REFCFC = 0.25
+    LHVAP = 2.45e6
+    STBC = 5.670373e-8 * 24 * 60 * 60
+
+    TMIN, TMAX, AVRAD, VAP, WIND2 = (np.asarray(v, dtype=float) for v in (TMIN, TMAX, AVRAD, VAP, WIND2))
+    TMPA = (TMIN + TMAX) / 2.0
+    TDIF = TMAX - TMIN
+    BU = 0.54 + 0.35 * np.clip((TDIF - 12.0) / 4.0, 0.0, 1.0)
+
+    PBAR = 1013.0 * np.exp(-0.034 * ELEV / (TMPA + 273.0))
+    GAMMA = PSYCON * PBAR / 1013.0
+
+    SVAP = 6.10588 * np.exp(17.32491 * TMPA / (TMPA + 238.102))
+    DELTA = 238.102 * 17.32491 * SVAP / (TMPA + 238.102) ** 2
+    VAP = np.minimum(VAP, SVAP)
+
+    RELSSD = np.clip((ATMTR - abs(ANGSTA)) / abs(ANGSTB), 0.0, 1.0)
+
+    with np.errstate(invalid="ignore"):
+        RB = STBC * (TMPA + 273.0) ** 4 * (0.56 - 0.079 * np.sqrt(VAP)) * (0.1 + 0.9 * RELSSD)
+
+    RNW = (AVRAD * (1.0 - REFCFW) - RB) / LHVAP
+    RNS = (AVRAD * (1.0 - REFCFS) - RB) / LHVAP
+    RNC = (AVRAD * (1.0 - REFCFC) - RB) / LHVAP
+
+    EA = 0.26 * np.maximum(0.0, (SVAP - VAP)) * (0.5 + BU * WIND2)
+    EAC = 0.26 * np.maximum(0.0, (SVAP - VAP)) * (1.0 + BU * WIND2)
+
+    E0 = (DELTA * RNW + GAMMA * EA) / (DELTA + GAMMA)
+    ES0 = (DELTA * RNS + GAMMA * EA) / (DELTA + GAMMA)
+    ET0 = (DELTA * RNC + GAMMA * EAC) / (DELTA + GAMMA)
+
+    # Ensure reference evaporation >= 0., np.maximum propagates NaN
+    return np.maximum(0.0, E0), np.maximum(0.0, ES0), np.maximum(0.0, ET0)
+
+
+def penman_monteith_array(
+    ANGOT: np.ndarray,
+    ELEV: float,
+    TMIN: np.ndarray,
+    TMAX: np.ndarray,
+    AVRAD: np.ndarray,
+    VAP: np.ndarray,
+    WIND2: np.ndarray,
+) -> np.ndarray:
+    """Array version of `penman_monteith()`.
+
+    Takes the Angot radiation (ANGOT) of each day from `astro_array()`
+    instead of the date and latitude. Invalid input (e.g. a negative vapour
+    pressure) results in NaN rather than an exception.
+    """
+    PSYCON = 0.665
+    REFCFC = 0.23
+    CRES = 70.0
+    LHVAP = 2.45e6
+    STBC = 4.903e-3
+    G = 0.0
+
+    TMIN, TMAX, AVRAD, VAP, WIND2 = (np.asarray(v, dtype=float) for v in (TMIN, TMAX, AVRAD, VAP, WIND2))
+    TMPA = (TMIN + TMAX) / 2.0
+    VAP = hPa2kPa(VAP)
+
+    T = 293.0
+    PATM = 101.3 * pow((T - (0.0065 * ELEV)) / T, 5.26)
+    GAMMA = PSYCON * PATM * 1.0e-3
+
+    SVAP_TMPA = 0.6108 * np.exp((17.27 * TMPA) / (237.3 + TMPA))
+    DELTA = (4098.0 * SVAP_TMPA) / (TMPA + 237.3) ** 2
+
+    SVAP_TMAX = 0.6108 * np.exp((17.27 * TMAX) / (237.3 + TMAX))
+    SVAP_TMIN = 0.6108 * np.exp((17.27 * TMIN) / (237.3 + TMIN))
+    SVAP = (SVAP_TMAX + SVAP_TMIN) / 2.0
+    VAP = np.minimum(VAP, SVAP)
+
+    STB_TMAX = STBC * Celsius2Kelvin(TMAX) ** 4
+    STB_TMIN = STBC * Celsius2Kelvin(TMIN) ** 4
+    with np.errstate(invalid="ignore"):
+        RNL_TMP = ((STB_TMAX + STB_TMIN) / 2.0) * (0.34 - 0.14 * np.sqrt(VAP))
+
+    CSKYRAD = (0.75 + (2e-05 * ELEV)) * np.asarray(ANGOT, dtype=float)
+    clear_sky = CSKYRAD > 0
+    RATIO = np.divide(AVRAD, CSKYRAD, out=np.zeros_like(CSKYRAD), where=clear_sky)
+    RNL = RNL_TMP * (1.35 * RATIO - 0.35)
+    RN = ((1 - REFCFC) * AVRAD - RNL) / LHVAP
+    EA = (900.0 / (TMPA + 273)) * WIND2 * (SVAP - VAP)
+    MGAMMA = GAMMA * (1.0 + (CRES / 208.0 * WIND2))
+
+    ET0 = (DELTA * (RN - G)) / (DELTA + MGAMMA) + (GAMMA * EA) / (DELTA + MGAMMA)
+    return np.where(clear_sky, np.maximum(0.0, ET0), 0.0)
+
+
 def check_angstromAB(xA: float, xB: float) -> list[float, float]:
     """Routine checks validity of Angstrom coefficients.
 
@@ -5,5 +5,6 @@ Modified by Will Solow, 2024
 """
 
 from pcse.utils import decorators
+from pcse.utils import loggers
 from pcse.utils import signals
 from pcse.utils import traitlets
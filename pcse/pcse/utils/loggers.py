@@ -0,0 +1,32 @@
+"""Loggers for PCSE objects.
+
+Every PCSE class logs to a logger named after its module and class. These
+loggers are cached per class, so that looking up the logger of an object
+on every simulated day does not build the name and query the logging module
+each time. Messages should be passed with their arguments, e.g.
+`self.logger.debug("Model time updated to: %s", day)`, so that the message
+is only formatted when the level is enabled.
+
+Engines that are configured with QUIET discard all log messages of their
+components through the `quiet_logger`.
+"""
+
+import logging
+
+# Loggers of the PCSE classes, created on first use
+_class_loggers = {}
+
+# Logger for the objects of a quiet Engine. It is not part of the logging
+# hierarchy and is disabled, so that it discards all records.
+quiet_logger = logging.Logger("pcse.quiet")
+quiet_logger.disabled = True
+
+
+def class_logger(cls: type) -> logging.Logger:
+    """Return the logger named "<module>.<class>" of class `cls`."""
+    try:
+        return _class_loggers[cls]
+    except KeyError:
+        logger = logging.getLogger("%s.%s" % (cls.__module__, cls.__name__))
+        _class_loggers[cls] = logger
+        return logger
@@ -535,5 +535,22 @@ class NPK_Args:
     """Amount of water coefficient in cm/water"""
     irrig_amount: float = 0.5
 
+    """Variable kiosk backend of the crop model, `dict` or `columnar`"""
+    kiosk: str = "dict"
+    """States/rates templates of the crop model, `traitlets` or `compiled`"""
+    templates: str = "traitlets"
+    """Signal dispatch of the crop model, `pydispatch` or `direct` to call the
+    connected handlers directly"""
+    signals: str = "pydispatch"
+    """If True, the crop model discards all its log messages"""
+    quiet: bool = False
+    """Output of the crop model, `lean` to record only the variables the environment
+    uses or `full` to record all output variables"""
+    output_mode: str = "lean"
+    """If True, the crop model also keeps a trace of all output variables for every day"""
+    full_trace: bool = False
+    """Number of days of crop model output kept as arrays, 0 to disable"""
+    output_buffer_days: int = 0
+
     """Path to assets file"""
     assets_fpath: str = f"{os.getcwd()}/pcse_gym/pcse_gym/assets/"
@@ -0,0 +1,347 @@
+"""Chunked on-disk datasets of trajectories generated from WOFOST Gym
+environments.
+
+A dataset is a folder with a `dataset.json` index and one subfolder per
+chunk. A chunk holds one fixed-dtype `.npy` file per field (e.g. `obs`,
+`actions`, `rewards`), the offsets of its episodes in `episode_starts.npy`
+and the info of every episode in `infos.json`, with the dates of the info
+stored as ISO strings and read back as dates. Episodes are never split
+across chunks, so a chunk can be read on its own and the arrays of a chunk
+can be memory-mapped.
+"""
+
+import os
+import re
+import json
+import shutil
+from datetime import date, datetime
+import numpy as np
+
+from pcse_gym import exceptions as exc
+
+INDEX_FILE = "dataset.json"
+STARTS_FILE = "episode_starts.npy"
+INFOS_FILE = "infos.json"
+ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}(T\d{2}:\d{2}:\d{2}(\.\d+)?)?$")
+
+
+def _to_json(obj: object) -> object:
+    """
+    Convert an episode info to JSON compatible types. Dates are converted to
+    ISO strings, also when they are keys of a dictionary (e.g. `env.log`)
+    """
+    if isinstance(obj, dict):
+        return {(k.isoformat() if isinstance(k, (date, datetime)) else str(k)): _to_json(v) for k, v in obj.items()}
+    elif isinstance(obj, (list, tuple)):
+        return [_to_json(v) for v in obj]
+    elif isinstance(obj, np.ndarray):
+        return _to_json(obj.tolist())
+    elif isinstance(obj, np.generic):
+        return obj.item()
+    elif isinstance(obj, (date, datetime)):
+        return obj.isoformat()
+    elif obj is None or isinstance(obj, (bool, int, float, str)):
+        return obj
+    return str(obj)
+
+
+def _from_json(obj: object) -> object:
+    """
+    Convert an episode info read from JSON back to the types of the episode,
+    the inverse of `_to_json()` for dates
+    """
+    if isinstance(obj, dict):
+        return {_from_json(k): _from_json(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [_from_json(v) for v in obj]
+    elif isinstance(obj, str) and ISO_DATE.match(obj):
+        return datetime.fromisoformat(obj) if "T" in obj else date.fromisoformat(obj)
+    return obj
+
+
+def _read_infos(fpath: str) -> list:
+    """
+    Read the infos of the episodes of a chunk
+    """
+    with open(fpath, "r") as fp:
+        return _from_json(json.load(fp))
+
+
+def _write_json(fpath: str, obj: object) -> None:
+    """
+    Write a JSON file atomically, so that a crash never leaves a partial file
+    """
+    with open(f"{fpath}.tmp", "w") as fp:
+        json.dump(obj, fp)
+    os.replace(f"{fpath}.tmp", fpath)
+
+
+class DatasetWriter:
+    """
+    Streams episodes to a chunked dataset while they are generated.
+
+    Episodes are buffered until `chunk_size` transitions are buffered and then
+    written as one chunk, so that memory use does not depend on the size of
+    the dataset and a crash only loses the episodes of the current chunk. The
+    fields and their dtype and shape are fixed by the first episode, later
+    episodes are cast to them.
+    """
+
+    def __init__(self, path: str, chunk_size: int = 65536, attrs: dict = None, mode: str = "w") -> None:
+        """
+        Open the dataset at `path` for writing.
+
+        Args:
+            path: folder of the dataset
+            chunk_size: number of transitions after which a chunk is written
+            attrs: JSON compatible attributes of the dataset, e.g. `output_vars`
+            mode: "w" to create the dataset, replacing an existing dataset at
+                `path`, or "a" to append to an existing dataset
+        """
+        if mode not in ["w", "a"]:
+            msg = f"Dataset mode `{mode}` must be one of `w` or `a`"
+            raise exc.DatasetException(msg)
+        assert chunk_size > 0, f"Chunk size `{chunk_size}` must be positive"
+
+        self.path = path
+        self.chunk_size = chunk_size
+        index_fpath = os.path.join(path, INDEX_FILE)
+
+        if mode == "a" and os.path.isfile(index_fpath):
+            with open(index_fpath, "r") as fp:
+                self.index = json.load(fp)
+            if attrs is not None:
+                self.index["attrs"].update(_to_json(attrs))
+        else:
+            if os.path.isfile(index_fpath):
+                shutil.rmtree(path)
+            elif os.path.isdir(path) and os.listdir(path):
+                msg = f"Folder `{path}` is not empty and not a dataset"
+                raise exc.DatasetException(msg)
+            os.makedirs(path, exist_ok=True)
+            self.index = {
+                "fields": None,
+                "attrs": {} if attrs is None else _to_json(attrs),
+                "transitions": 0,
+                "episodes": 0,
+                "chunks": [],
+            }
+        _write_json(index_fpath, self.index)
+
+        self._buffer = []
+        self._buffered = 0
+        self._closed = False
+
+    def __enter__(self) -> "DatasetWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        """
+        Number of transitions in the dataset, including the buffered transitions
+        """
+        return self.index["transitions"] + self._buffered
+
+    def add_episode(self, info: dict = None, **fields: np.ndarray) -> None:
+        """
+        Add an episode to the dataset.
+
+        Args:
+            info: info of the episode, saved as JSON
+            fields: arrays of the episode with one row per transition
+        """
+        if self._closed:
+            msg = f"Dataset `{self.path}` is closed"
+            raise exc.DatasetException(msg)
+
+        arrays = {k: np.asarray(v) for k, v in fields.items()}
+        if self.index["fields"] is None:
+            self.index["fields"] = {
+                k: {"dtype": v.dtype.str, "shape": list(v.shape[1:])} for k, v in arrays.items()
+            }
+        spec = self.index["fields"]
+        if arrays.keys() != spec.keys():
+            msg = f"Episode fields `{sorted(arrays)}` do not match dataset fields `{sorted(spec)}`"
+            raise exc.DatasetException(msg)
+
+        length = None
+        for k, v in arrays.items():
+            if list(v.shape[1:]) != spec[k]["shape"]:
+                msg = f"Field `{k}` has shape `{v.shape[1:]}` per transition, expected `{tuple(spec[k]['shape'])}`"
+                raise exc.DatasetException(msg)
+            if length is not None and len(v) != length:
+                msg = f"Field `{k}` has {len(v)} transitions, expected {length}"
+                raise exc.DatasetException(msg)
+            length = len(v)
+            arrays[k] = v.astype(spec[k]["dtype"], copy=False)
+
+        self._buffer.append((arrays, None if info is None else _to_json(info)))
+        self._buffered += length
+        if self._buffered >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write the buffered episodes as a new chunk
+        """
+        if not self._buffer:
+            return
+        name = f"chunk_{len(self.index['chunks']):06d}"
+        tmp_folder = os.path.join(self.path, f"{name}.tmp")
+        if os.path.isdir(tmp_folder):
+            shutil.rmtree(tmp_folder)
+        os.makedirs(tmp_folder)
+
+        for k in self.index["fields"]:
+            np.save(os.path.join(tmp_folder, f"{k}.npy"), np.concatenate([ep[k] for ep, _ in self._buffer]))
+        lengths = [len(next(iter(ep.values()))) for ep, _ in self._buffer]
+        np.save(os.path.join(tmp_folder, STARTS_FILE), np.cumsum([0] + lengths[:-1], dtype=np.int64))
+        with open(os.path.join(tmp_folder, INFOS_FILE), "w") as fp:
+            json.dump([info for _, info in self._buffer], fp)
+        os.replace(tmp_folder, os.path.join(self.path, name))
+
+        self.index["chunks"].append(
+            {
+                "name": name,
+                "transitions": self._buffered,
+                "episodes": len(self._buffer),
+                "first_transition": self.index["transitions"],
+                "first_episode": self.index["episodes"],
+            }
+        )
+        self.index["transitions"] += self._buffered
+        self.index["episodes"] += len(self._buffer)
+        _write_json(os.path.join(self.path, INDEX_FILE), self.index)
+
+        self._buffer = []
+        self._buffered = 0
+
+    def close(self) -> None:
+        """
+        Write the remaining buffered episodes and close the dataset
+        """
+        if not self._closed:
+            self.flush()
+            self._closed = True
+
+
+class DatasetReader:
+    """
+    Reads a dataset written by a `DatasetWriter`, chunk by chunk or episode
+    by episode. With `mmap` the arrays are memory-mapped and only the rows
+    that are accessed are read from disk.
+    """
+
+    def __init__(self, path: str, mmap: bool = True) -> None:
+        """
+        Open the dataset at `path` for reading.
+
+        Args:
+            path: folder of the dataset
+            mmap: memory-map the arrays of the chunks instead of loading them
+        """
+        index_fpath = os.path.join(path, INDEX_FILE)
+        if not os.path.isfile(index_fpath):
+            msg = f"`{path}` is not a dataset, `{INDEX_FILE}` not found"
+            raise exc.DatasetException(msg)
+        with open(index_fpath, "r") as fp:
+            self.index = json.load(fp)
+
+        self.path = path
+        self.mmap_mode = "r" if mmap else None
+        self.fields = {} if self.index["fields"] is None else self.index["fields"]
+        self.attrs = self.index["attrs"]
+        self.num_transitions = self.index["transitions"]
+        self.num_episodes = self.index["episodes"]
+        self.num_chunks = len(self.index["chunks"])
+        self._first_episodes = np.array([c["first_episode"] for c in self.index["chunks"]], dtype=np.int64)
+
+    def __len__(self) -> int:
+        """
+        Number of transitions in the dataset
+        """
+        return self.num_transitions
+
+    def _chunk_file(self, k: int, fname: str) -> str:
+        return os.path.join(self.path, self.index["chunks"][k]["name"], fname)
+
+    def chunk(self, k: int, fields: list[str] = None) -> dict[str, np.ndarray]:
+        """
+        Return the arrays of chunk `k`, of all fields or only of `fields`
+        """
+        fields = self.fields if fields is None else fields
+        return {f: np.load(self._chunk_file(k, f"{f}.npy"), mmap_mode=self.mmap_mode) for f in fields}
+
+    def iter_chunks(self, fields: list[str] = None):
+        """
+        Iterate over the arrays of the chunks
+        """
+        for k in range(self.num_chunks):
+            yield self.chunk(k, fields)
+
+    def load(self, fields: list[str] = None) -> dict[str, np.ndarray]:
+        """
+        Load the arrays of the whole dataset into memory
+        """
+        fields = list(self.fields) if fields is None else fields
+        data = {}
+        for f in fields:
+            spec = self.fields[f]
+            out = np.empty((self.num_transitions, *spec["shape"]), dtype=spec["dtype"])
+            for k, chunk in enumerate(self.index["chunks"]):
+                start = chunk["first_transition"]
+                out[start : start + chunk["transitions"]] = np.load(self._chunk_file(k, f"{f}.npy"), mmap_mode="r")
+            data[f] = out
+        return data
+
+    def episode_starts(self) -> np.ndarray:
+        """
+        Return the index of the first transition of every episode in the dataset
+        """
+        starts = [
+            np.load(self._chunk_file(k, STARTS_FILE)) + chunk["first_transition"]
+            for k, chunk in enumerate(self.index["chunks"])
+        ]
+        return np.concatenate(starts) if starts else np.zeros(0, dtype=np.int64)
+
+    def infos(self) -> list[dict]:
+        """
+        Return the infos of all episodes
+        """
+        infos = []
+        for k in range(self.num_chunks):
+            infos.extend(_read_infos(self._chunk_file(k, INFOS_FILE)))
+        return infos
+
+    def episode(self, i: int) -> dict:
+        """
+        Return the arrays and the info (as `info`) of episode `i`
+        """
+        if not 0 <= i < self.num_episodes:
+            msg = f"Episode `{i}` out of range for dataset with {self.num_episodes} episodes"
+            raise exc.DatasetException(msg)
+        k = int(np.searchsorted(self._first_episodes, i, side="right")) - 1
+        j = i - self.index["chunks"][k]["first_episode"]
+
+        starts = np.load(self._chunk_file(k, STARTS_FILE))
+        start = starts[j]
+        stop = starts[j + 1] if j + 1 < len(starts) else self.index["chunks"][k]["transitions"]
+        data = {f: v[start:stop] for f, v in self.chunk(k).items()}
+        data["info"] = _read_infos(self._chunk_file(k, INFOS_FILE))[j]
+        return data
+
+    def iter_episodes(self):
+        """
+        Iterate over the episodes, reading one chunk at a time
+        """
+        for k in range(self.num_chunks):
+            arrays = self.chunk(k)
+            starts = np.load(self._chunk_file(k, STARTS_FILE))
+            stops = np.append(starts[1:], self.index["chunks"][k]["transitions"])
+            infos = _read_infos(self._chunk_file(k, INFOS_FILE))
+            for start, stop, info in zip(starts, stops, infos):
+                data = {f: v[start:stop] for f, v in arrays.items()}
+                data["info"] = info
+                yield data
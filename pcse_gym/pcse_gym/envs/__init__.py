@@ -1,5 +1,6 @@
 from pcse_gym.envs.wofost_base import NPK_Env, Harvest_NPK_Env, Plant_NPK_Env
 from pcse_gym.envs.wofost_base import LNPKW, PP, LNW, LNPK, LN, LW
+from pcse_gym.envs.wofost_vector import NPK_AsyncVectorEnv
 
 from pcse_gym.envs.wofost_annual import Limited_NPKW_Env
 from pcse_gym.envs.wofost_annual import PP_Env
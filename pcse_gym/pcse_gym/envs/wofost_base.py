@@ -6,7 +6,6 @@ Written by Will Solow, 2024"""
 import os
 import datetime
 from datetime import date
-from collections import deque
 import numpy as np
 import yaml, copy
 import gymnasium as gym
@@ -18,10 +17,20 @@ import pygame
 
 import pcse
 from pcse.engine import Wofost8Engine
-from pcse import NASAPowerWeatherDataProvider
+from pcse import get_weather_provider
 from pcse_gym.envs.render import render as render_env
 
 
+def observe_value(value: object) -> object:
+    """Returns the value of an output variable used in the observation. Leaf
+    class states (LV, SLA, LVAGE) hold an array of all leaf classes, of which
+    the youngest class is observed.
+    """
+    if isinstance(value, np.ndarray):
+        return value[0]
+    return value
+
+
 class NPK_Env(gym.Env):
     """Base Gym Environment for simulating crop growth
 
@@ -70,7 +79,21 @@ class NPK_Env(gym.Env):
         self.unit_fpath = unit_fpath
         self.range_fpath = range_fpath
         self.render_mode = render_mode
-        self.config = config
+        self.config = (
+            config
+            if config is None
+            else dict(
+                config,
+                KIOSK=args.kiosk,
+                TEMPLATES=args.templates,
+                SIGNALS=args.signals,
+                QUIET=args.quiet,
+                OUTPUT_MODE=args.output_mode,
+                LEAN_OUTPUT_VARS=list(args.output_vars),
+                FULL_TRACE=args.full_trace,
+                OUTPUT_BUFFER_DAYS=args.output_buffer_days,
+            )
+        )
 
         self.ploader = utils.ParamLoader(base_fpath, name_fpath, unit_fpath, range_fpath)
         # Arguments
@@ -109,7 +132,7 @@ class NPK_Env(gym.Env):
         self.max_soil_duration = self.soil_end_date - self.soil_start_date
         self.max_crop_duration = self.crop_end_date - self.crop_start_date
 
-        self.weatherdataprovider = NASAPowerWeatherDataProvider(*self.location)
+        self.weatherdataprovider = get_weather_provider(*self.location)
 
         if self.train_reset:
             self.train_weather_data = self._get_train_weather_data(year_range=self.TRAIN_YEARS)
@@ -122,6 +145,9 @@ class NPK_Env(gym.Env):
         self.model = Wofost8Engine(
             self.parameterprovider, self.weatherdataprovider, self.agromanagement, config=self.config
         )
+        # Initial engine state, restored on reset while the site is unchanged
+        self._model_snapshot = None
+        self._model_key = None
 
         if self.crop_rand:
             self.domain_randomization_uniform(self.scale)
@@ -163,6 +189,19 @@ class NPK_Env(gym.Env):
         """Return a list of the output vars"""
         return self.output_vars + self.weather_vars + ["DAYS"]
 
+    def require_output_vars(self, varnames: list[str]) -> None:
+        """Ensure that the crop model records `varnames` in its output, in
+        addition to the output vars of the observation. Used by wrappers that
+        need other model variables, e.g. for the reward
+
+        Args:
+            varnames: list of crop model variable names
+        """
+        self.config["LEAN_OUTPUT_VARS"] = list(dict.fromkeys(self.config["LEAN_OUTPUT_VARS"] + list(varnames)))
+        self.model.add_output_vars(varnames)
+        # The initial state was captured with the previous output vars
+        self._model_snapshot = None
+
     def seed(self, seed: int = None) -> list[int]:
         """Set the seed for the environment using Gym seeding.
         Minimal impact - generally will only effect Gaussian noise for
@@ -228,7 +267,7 @@ class NPK_Env(gym.Env):
                 raise exc.ResetException(msg)
 
             # Reset weather
-            self.weatherdataprovider = NASAPowerWeatherDataProvider(*self.location)
+            self.weatherdataprovider = get_weather_provider(*self.location)
 
         self.soil_start_date = self.soil_start_date.replace(year=self.year)
         self.soil_end_date = self.soil_start_date + self.max_soil_duration
@@ -246,10 +285,17 @@ class NPK_Env(gym.Env):
         # Override parameters
         utils.set_params(self, self.wofost_params)
 
-        # Reset model
-        self.model = Wofost8Engine(
-            self.parameterprovider, self.weatherdataprovider, self.agromanagement, config=self.config
-        )
+        # Reset model. Rebuilding the engine is only needed when the year,
+        # location or parameters changed, otherwise restore its initial state
+        model_key = self._get_model_key(self.parameterprovider)
+        if self._model_snapshot is not None and model_key == self._model_key:
+            self.model.restore(self._model_snapshot)
+        else:
+            self.model = Wofost8Engine(
+                self.parameterprovider, self.weatherdataprovider, self.agromanagement, config=self.config
+            )
+            self._model_snapshot = self.model.snapshot()
+            self._model_key = model_key
 
         output = self._run_simulation()
         observation = self._process_output(output)
@@ -261,6 +307,13 @@ class NPK_Env(gym.Env):
 
         return observation, self.log
 
+    def _get_model_key(self, parameterprovider: pcse.base.ParameterProvider) -> tuple:
+        """Returns the key identifying the initial state of a crop engine:
+        the weather provider, the year and the overridden parameters
+        """
+        overrides = repr(sorted(parameterprovider._override.items()))
+        return (self.weatherdataprovider, self.year, tuple(self.location), overrides)
+
     def domain_randomization_uniform(self, scale: float = 0.1) -> None:
         """
         Apply a small uniform randomization to the soil and crop parameters
@@ -296,6 +349,19 @@ class NPK_Env(gym.Env):
         which is then processed to the _get_reward() function and _process_output()
         function for a reward and observation
 
+        Args:
+            action: integer
+        """
+        action = self._check_action(action)
+        act_tuple = self._take_action(action)
+        output = self._run_simulation()
+        observation, reward, termination, truncation = self._process_step(output, act_tuple)
+
+        return observation, reward, termination, truncation, self.log
+
+    def _check_action(self, action: int | np.ndarray) -> int:
+        """Validate an action and convert a 1-item NDArray action to its value
+
         Args:
             action: integer
         """
@@ -308,10 +374,17 @@ class NPK_Env(gym.Env):
                 action = action[0]
             else:
                 msg = f"Action can be a 1-dimensional, 1-item NDArray, but is of shape {action.shape}"
-                raise Exception(msg) 
-            
-        act_tuple = self._take_action(action)
-        output = self._run_simulation()
+                raise Exception(msg)
+        return action
+
+    def _process_step(self, output: list[dict], act_tuple: tuple) -> tuple[np.ndarray, float, bool, bool]:
+        """Process the output of the days simulated in a step into the
+        observation, reward, termination and truncation, and log the step
+
+        Args:
+            output: model output of the simulated days
+            act_tuple: the action taken by the step
+        """
         observation = self._process_output(output)
 
         reward = self._get_reward(output, act_tuple)
@@ -328,7 +401,7 @@ class NPK_Env(gym.Env):
 
         if self.render_mode == "human":
             self.render()
-        return observation, reward, termination, truncation, self.log
+        return observation, reward, termination, truncation
 
     def _validate(self) -> None:
         """Validate that the configuration is correct"""
@@ -441,16 +514,10 @@ class NPK_Env(gym.Env):
         Args:
             date: datetime - day to start collecting the weather information
         """
-        weather_vars = []
         noise_scale = np.linspace(start=self.forecast_noise[0], stop=self.forecast_noise[1], num=self.forecast_length)
 
-        for i in range(0, self.forecast_length):
-            weather = self._get_weather_day(date + datetime.timedelta(i))
-
-            weather += np.random.normal(size=len(weather)) * weather * noise_scale[i]
-            weather_vars.append(weather)
-
-        return np.array(weather_vars)
+        weather = self._get_weather_range(date, self.forecast_length)
+        return weather + np.random.normal(size=weather.shape) * weather * noise_scale[:, None]
 
     def _get_weather_day(self, date: date) -> list[float]:
         """Get the weather for a specific date based on the desired weather
@@ -469,6 +536,34 @@ class NPK_Env(gym.Env):
             weatherdatacontainer = self.weatherdataprovider(date)
         return [getattr(weatherdatacontainer, attr) for attr in self.weather_vars]
 
+    def _get_weather_range(self, date: date, days: int) -> np.ndarray:
+        """Get the weather for a number of consecutive days as an array of
+        shape (days, weather vars). The days are read as one slice from the
+        weather provider when they map to consecutive days of weather data,
+        otherwise day by day with `_get_weather_day()`
+
+        Args:
+            date: datetime - first day
+            days: int - number of days
+        """
+        soil_start_ind = np.argwhere(self.train_weather_data == self.soil_start_date.year).flatten()[0]
+        try:
+            start, end = [
+                d.replace(
+                    year=self.train_weather_data[
+                        (soil_start_ind + d.year - self.soil_start_date.year) % len(self.train_weather_data)
+                    ]
+                )
+                for d in (date, date + datetime.timedelta(days - 1))
+            ]
+            if (end - start).days == days - 1:
+                weather = self.weatherdataprovider.get_range(start, days, self.weather_vars)
+                if not np.isnan(weather).any():
+                    return weather
+        except (ValueError, pcse.exceptions.WeatherDataProviderError):
+            pass
+        return np.array([self._get_weather_day(date + datetime.timedelta(i)) for i in range(days)], dtype=float)
+
     def _process_output(self, output: dict) -> np.ndarray:
         """Process the output from the model into the observation required by
         the current environment
@@ -479,7 +574,7 @@ class NPK_Env(gym.Env):
 
         crop_observation = np.zeros(len(self.output_vars))
         for i, k in enumerate(self.output_vars):
-            crop_observation[i] = output[-1][k]
+            crop_observation[i] = observe_value(output[-1][k])
 
         self.date = output[-1]["day"]
 
@@ -491,8 +586,6 @@ class NPK_Env(gym.Env):
         for i in range(len(observation)):
             if isinstance(observation[i], datetime.date):
                 observation[i] = int(observation[i].strftime("%Y%m%d"))
-            if isinstance(observation[i], deque):
-                observation[i] = observation[i][0]
             if isinstance(observation[i], str):
                 observation[i] = 0
         return observation.astype("float64")
@@ -626,7 +719,21 @@ class Multi_NPK_Env(gym.Env):
         self.unit_fpath = unit_fpath
         self.range_fpath = range_fpath
         self.render_mode = render_mode
-        self.config = config
+        self.config = (
+            config
+            if config is None
+            else dict(
+                config,
+                KIOSK=args.kiosk,
+                TEMPLATES=args.templates,
+                SIGNALS=args.signals,
+                QUIET=args.quiet,
+                OUTPUT_MODE=args.output_mode,
+                LEAN_OUTPUT_VARS=list(args.output_vars),
+                FULL_TRACE=args.full_trace,
+                OUTPUT_BUFFER_DAYS=args.output_buffer_days,
+            )
+        )
 
         self.ploader = utils.ParamLoader(base_fpath, name_fpath, unit_fpath, range_fpath)
         # Arguments
@@ -671,7 +778,7 @@ class Multi_NPK_Env(gym.Env):
         self.max_soil_duration = self.soil_end_date - self.soil_start_date
         self.max_crop_duration = self.crop_end_date - self.crop_start_date
 
-        self.weatherdataprovider = NASAPowerWeatherDataProvider(*self.location)
+        self.weatherdataprovider = get_weather_provider(*self.location)
 
         if self.train_reset:
             self.train_weather_data = self._get_train_weather_data(year_range=self.TRAIN_YEARS)
@@ -686,6 +793,9 @@ class Multi_NPK_Env(gym.Env):
             Wofost8Engine(self.parameterproviders[i], self.weatherdataprovider, self.agromanagement, config=self.config)
             for i in range(self.num_farms)
         ]
+        # Initial engine states, restored on reset while the site is unchanged
+        self._model_snapshots = None
+        self._model_key = None
         if self.crop_rand:
             self.crop_randomization(self.scale)
 
@@ -733,6 +843,20 @@ class Multi_NPK_Env(gym.Env):
         """Return a list of the output vars"""
         return self.crop_vars + self.weather_vars + ["DAYS"]
 
+    def require_output_vars(self, varnames: list[str]) -> None:
+        """Ensure that the crop models record `varnames` in their output, in
+        addition to the output vars of the observation. Used by wrappers that
+        need other model variables, e.g. for the reward
+
+        Args:
+            varnames: list of crop model variable names
+        """
+        self.config["LEAN_OUTPUT_VARS"] = list(dict.fromkeys(self.config["LEAN_OUTPUT_VARS"] + list(varnames)))
+        for model in self.models:
+            model.add_output_vars(varnames)
+        # The initial states were captured with the previous output vars
+        self._model_snapshots = None
+
     def seed(self, seed: int = None) -> list[int]:
         """Set the seed for the environment using Gym seeding.
         Minimal impact - generally will only effect Gaussian noise for
@@ -798,7 +922,7 @@ class Multi_NPK_Env(gym.Env):
                 raise exc.ResetException(msg)
 
             # Reset weather
-            self.weatherdataprovider = NASAPowerWeatherDataProvider(*self.location)
+            self.weatherdataprovider = get_weather_provider(*self.location)
 
         self.soil_start_date = self.soil_start_date.replace(year=self.year)
         self.soil_end_date = self.soil_start_date + self.max_soil_duration
@@ -816,11 +940,21 @@ class Multi_NPK_Env(gym.Env):
         # Override parameters
         utils.set_params(self, self.wofost_params)
 
-        # Reset model
-        self.models = [
-            Wofost8Engine(self.parameterproviders[i], self.weatherdataprovider, self.agromanagement, config=self.config)
-            for i in range(self.num_farms)
-        ]
+        # Reset models. Rebuilding the engines is only needed when the year,
+        # location or parameters changed, otherwise restore their initial state
+        model_key = tuple(self._get_model_key(p) for p in self.parameterproviders)
+        if self._model_snapshots is not None and model_key == self._model_key:
+            for model, snapshot in zip(self.models, self._model_snapshots):
+                model.restore(snapshot)
+        else:
+            self.models = [
+                Wofost8Engine(
+                    self.parameterproviders[i], self.weatherdataprovider, self.agromanagement, config=self.config
+                )
+                for i in range(self.num_farms)
+            ]
+            self._model_snapshots = [model.snapshot() for model in self.models]
+            self._model_key = model_key
 
         output = self._run_simulation()
         observation = self._process_output(output)
@@ -831,6 +965,13 @@ class Multi_NPK_Env(gym.Env):
 
         return observation, self.log
 
+    def _get_model_key(self, parameterprovider: pcse.base.ParameterProvider) -> tuple:
+        """Returns the key identifying the initial state of a crop engine:
+        the weather provider, the year and the overridden parameters
+        """
+        overrides = repr(sorted(parameterprovider._override.items()))
+        return (self.weatherdataprovider, self.year, tuple(self.location), overrides)
+
     def crop_randomization(self, scale: float = 0.1) -> None:
         """
         Apply a small randomization to the soil and crop parameters
@@ -1028,16 +1169,10 @@ class Multi_NPK_Env(gym.Env):
         Args:
             date: datetime - day to start collecting the weather information
         """
-        weather_vars = []
         noise_scale = np.linspace(start=self.forecast_noise[0], stop=self.forecast_noise[1], num=self.forecast_length)
 
-        for i in range(0, self.forecast_length):
-            weather = self._get_weather_day(date + datetime.timedelta(i))
-
-            weather += np.random.normal(size=len(weather)) * weather * noise_scale[i]
-            weather_vars.append(weather)
-
-        return np.array(weather_vars)
+        weather = self._get_weather_range(date, self.forecast_length)
+        return weather + np.random.normal(size=weather.shape) * weather * noise_scale[:, None]
 
     def _get_weather_day(self, date: date) -> list[float]:
         """Get the weather for a specific date based on the desired weather
@@ -1053,6 +1188,34 @@ class Multi_NPK_Env(gym.Env):
 
         return [getattr(weatherdatacontainer, attr) for attr in self.weather_vars]
 
+    def _get_weather_range(self, date: date, days: int) -> np.ndarray:
+        """Get the weather for a number of consecutive days as an array of
+        shape (days, weather vars). The days are read as one slice from the
+        weather provider when they map to consecutive days of weather data,
+        otherwise day by day with `_get_weather_day()`
+
+        Args:
+            date: datetime - first day
+            days: int - number of days
+        """
+        soil_start_ind = np.argwhere(self.train_weather_data == self.soil_start_date.year).flatten()[0]
+        try:
+            start, end = [
+                d.replace(
+                    year=self.train_weather_data[
+                        (soil_start_ind + d.year - self.soil_start_date.year) % len(self.train_weather_data)
+                    ]
+                )
+                for d in (date, date + datetime.timedelta(days - 1))
+            ]
+            if (end - start).days == days - 1:
+                weather = self.weatherdataprovider.get_range(start, days, self.weather_vars)
+                if not np.isnan(weather).any():
+                    return weather
+        except (ValueError, pcse.exceptions.WeatherDataProviderError):
+            pass
+        return np.array([self._get_weather_day(date + datetime.timedelta(i)) for i in range(days)], dtype=float)
+
     def _process_output(self, output: dict) -> np.ndarray:
         """Process the output from the model into the observation required by
         the current environment
@@ -1064,7 +1227,7 @@ class Multi_NPK_Env(gym.Env):
         crop_observation = np.zeros(self.num_farms * len(self.individual_vars) + len(self.shared_vars))
         for i in range(self.num_farms):
             for j, k in enumerate(self.individual_vars):
-                crop_observation[i * len(self.individual_vars) + j] = output[i][-1][k]
+                crop_observation[i * len(self.individual_vars) + j] = observe_value(output[i][-1][k])
         for i, k in enumerate(self.shared_vars):
             crop_observation[self.num_farms * len(self.individual_vars) + i] = output[-1][-1][k]
         self.date = output[0][-1]["day"]
@@ -1077,8 +1240,6 @@ class Multi_NPK_Env(gym.Env):
         for i in range(len(observation)):
             if isinstance(observation[i], datetime.date):
                 observation[i] = int(observation[i].strftime("%Y%m%d"))
-            if isinstance(observation[i], deque):
-                observation[i] = observation[i][0]
             if isinstance(observation[i], str):
                 observation[i] = 0
         return observation.astype("float64")
@@ -0,0 +1,77 @@
+"""Vectorized API for running a batch of WOFOST Gym environments in parallel
+worker processes.
+"""
+
+import multiprocessing
+from typing import Callable
+import numpy as np
+import gymnasium as gym
+
+
+class _WorkerEnvFn:
+    """Creates the environment of a worker process and reseeds the global
+    NumPy random state of the worker from the seed of the environment and the
+    index of the worker. The environments seed the global state with the same
+    seed when they are created, which would otherwise leave every worker with
+    the same weather forecast noise and domain randomization.
+    """
+
+    def __init__(self, env_fn: Callable[[], gym.Env], index: int) -> None:
+        self.env_fn = env_fn
+        self.index = index
+
+    def __call__(self) -> gym.Env:
+        env = self.env_fn()
+        seed = env.unwrapped.args.seed
+        entropy = None if seed is None else [seed, self.index]
+        env.unwrapped.seed(int(np.random.SeedSequence(entropy).generate_state(1)[0]))
+        return env
+
+
+class NPK_AsyncVectorEnv(gym.vector.AsyncVectorEnv):
+    """Steps N WOFOST Gym environments in parallel worker processes.
+
+    If a `template_fn` is given, an unwrapped environment with the
+    configuration of the environments is created in this process before the
+    workers are started. This loads the parameter files and weather data into
+    the caches of this process, which the workers inherit when they are forked
+    instead of loading them again. The environment is kept as `template_env`,
+    e.g. for evaluation. Observations are returned through shared memory.
+
+    The environments are stepped with the NEXT_STEP autoreset mode as in a
+    `gym.vector.SyncVectorEnv`, but the global NumPy random state that they
+    use for weather forecast noise and domain randomization is seeded per
+    worker, from the seed of the environment and the index of the worker. The
+    output is only the same as that of a `SyncVectorEnv` with the same seeds
+    when the environments are deterministic, i.e. without forecast noise and
+    domain randomization.
+    """
+
+    def __init__(
+        self,
+        env_fns: list[Callable[[], gym.Env]],
+        template_fn: Callable[[], gym.Env] = None,
+        context: str = None,
+        daemon: bool = True,
+    ) -> None:
+        """Initialize the :class:`NPK_AsyncVectorEnv`.
+
+        Args:
+            env_fns: functions that create the environments
+            template_fn: function that creates an unwrapped environment with
+                the configuration of the environments in this process
+            context: start method of the worker processes, defaults to `fork`
+                where it is available
+            daemon: if True, the workers are terminated with this process
+        """
+        if context is None and "fork" in multiprocessing.get_all_start_methods():
+            context = "fork"
+        self.template_env = None if template_fn is None else template_fn()
+        env_fns = [_WorkerEnvFn(env_fn, i) for i, env_fn in enumerate(env_fns)]
+        super().__init__(env_fns, shared_memory=True, context=context, daemon=daemon)
+
+    def close_extras(self, **kwargs: dict) -> None:
+        """Close the workers and the template environment"""
+        super().close_extras(**kwargs)
+        if self.template_env is not None:
+            self.template_env.close()
@@ -23,3 +23,7 @@ class ConfigFileException(WOFOSTGymError):
 
 class ResetException(WOFOSTGymError):
     """Raised when there is an issue with the reset function by misspecification"""
+
+
+class DatasetException(WOFOSTGymError):
+    """Raised when there is an issue with reading or writing a dataset"""
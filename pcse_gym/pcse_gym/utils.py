@@ -1,5 +1,7 @@
 """Utils file for making model configurations and setting parameters from arguments"""
 
+import os
+import copy
 import gymnasium as gym
 from datetime import datetime
 from pcse_gym.args import WOFOST_Args, Agro_Args
@@ -1063,6 +1065,10 @@ class ParamLoader:
     Class to handle loading the parameter and state/rate names of all variables
     """
 
+    # Parsed .yaml files by path and modification time, shared by all
+    # environments in this process and inherited by forked worker processes
+    _yaml_cache = {}
+
     def __init__(
         self, base_fpath: str = None, name_fpath: str = None, unit_fpath: str = None, range_fpath: str = None
     ) -> None:
@@ -1070,28 +1076,36 @@ class ParamLoader:
         Initialize State by loading respective .yaml files as specified in utils.Args
         """
         try:
-            with open(f"{base_fpath}{name_fpath}", "rb") as f:
-                self.state_names = yaml.safe_load(f)
+            self.state_names = self._load_yaml(f"{base_fpath}{name_fpath}")
         except:
             msg = f"Error loading State Names file `{base_fpath}{name_fpath}`. Check correct path or that file exists."
             raise Exception(msg)
 
         try:
-            with open(f"{base_fpath}{unit_fpath}", "rb") as f:
-                self.state_units = yaml.safe_load(f)
+            self.state_units = self._load_yaml(f"{base_fpath}{unit_fpath}")
         except:
             msg = f"Error loading State Names file `{base_fpath}{unit_fpath}`. Check correct path or that file exists."
             raise Exception(msg)
 
         try:
-            with open(f"{base_fpath}{range_fpath}", "rb") as f:
-                self.state_range = yaml.safe_load(f)
+            self.state_range = self._load_yaml(f"{base_fpath}{range_fpath}")
         except:
             msg = (
                 f"Error loading State Ranges file `{base_fpath}{range_fpath}`. Check correct path or that file exists."
             )
             raise Exception(msg)
 
+    @classmethod
+    def _load_yaml(cls, fpath: str) -> dict:
+        """
+        Load a .yaml file, parsing it only when it is not cached or has changed
+        """
+        key = (fpath, os.stat(fpath).st_mtime_ns)
+        if key not in cls._yaml_cache:
+            with open(fpath, "rb") as f:
+                cls._yaml_cache[key] = yaml.safe_load(f)
+        return copy.deepcopy(cls._yaml_cache[key])
+
     def get_name(self, key: str) -> str:
         """
         Get the name of a specific key
@@ -392,8 +392,13 @@ class RewardWrapper(gym.Wrapper, ABC):
 
     This _validate() function ensures that is the case and will throw and error
     otherwise
+
+    Model variables used in _get_reward() other than the output vars of the
+    environment must be listed in REQUIRED_OUTPUT_VARS
     """
 
+    REQUIRED_OUTPUT_VARS = []
+
     def __init__(self, env: gym.Env) -> None:
         """Initialize the :class:`RewardWrapper` wrapper with an environment.
 
@@ -403,6 +408,8 @@ class RewardWrapper(gym.Wrapper, ABC):
         super().__init__(env)
         self._validate(env)
         self.env = env
+        if self.REQUIRED_OUTPUT_VARS:
+            self.env.unwrapped.require_output_vars(self.REQUIRED_OUTPUT_VARS)
 
     @abstractmethod
     def _get_reward(self, output: dict, act_tuple: tuple[int, int, int, int]) -> None:
@@ -539,6 +546,8 @@ class RewardFertilizationThresholdWrapper(RewardWrapper):
     threshold is crossed during fertilization or irrigation
     """
 
+    REQUIRED_OUTPUT_VARS = ["TOTN", "TOTP", "TOTK", "TOTIRRIG"]
+
     def __init__(self, env: gym.Env, args: Namespace) -> None:
         """Initialize the :class:`RewardFertilizationThresholdWrapper` wrapper with an environment.
 
@@ -602,6 +611,8 @@ class RewardFertilizationThresholdWrapper(RewardWrapper):
 class RewardLimitedRunoffWrapper(RewardWrapper):
     """Modifies the reward to be a function with high penalties for if Nitrogen Runoff Occurs"""
 
+    REQUIRED_OUTPUT_VARS = ["RRUNOFF_N"]
+
     def __init__(self, env: gym.Env, args: Namespace) -> None:
         """Initialize the :class:`RewardFertilizationThresholdWrapper` wrapper with an environment.
 
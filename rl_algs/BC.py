@@ -15,7 +15,7 @@ from dataclasses import dataclass
 import time
 import utils
 
-from rl_algs.rl_utils import RL_Args, setup, make_demonstrations
+from rl_algs.rl_utils import RL_Args, setup, make_demonstrations, load_demonstrations
 
 
 @dataclass
@@ -41,6 +41,8 @@ class Args(RL_Args):
     demo_agent_path: Optional[str] = None
     """Demo agent type"""
     demo_agent_type: Optional[str] = None
+    """Demonstration data (.npz file or dataset folder), used instead of the demo agent if given"""
+    demo_data_file: Optional[str] = None
 
 
 class BC(nn.Module):
@@ -110,24 +112,27 @@ def train(kwargs: Namespace) -> None:
 
     agent = BC(envs).to(device)
 
-    try:
-        ag_constr = utils.get_valid_agents()[args.demo_agent_type]
-        policy = ag_constr(envs)
-    except:
-        msg = "Error in getting agent. Check that `--args.agent-type` is a valid agent in rl_algs/"
-        raise Exception(msg)
-
-    device = torch.device("cuda" if torch.cuda.is_available() and args.cuda else "cpu")
-    try:
-        policy.load_state_dict(torch.load(f"{args.demo_agent_path}", map_location=device, weights_only=True))
-    except:
-        msg = (
-            "Error in loading state dict. Likely caused by loading an agent.pt file with incompatible `args.agent_type`"
-        )
-        raise Exception(msg)
-    policy.to(device)
-
-    transitions = make_demonstrations(policy, envs, args.num_demos)
+    if args.demo_data_file is not None:
+        transitions = load_demonstrations(envs.envs[0], args.demo_data_file)
+    else:
+        try:
+            ag_constr = utils.get_valid_agents()[args.demo_agent_type]
+            policy = ag_constr(envs)
+        except:
+            msg = "Error in getting agent. Check that `--args.agent-type` is a valid agent in rl_algs/"
+            raise Exception(msg)
+
+        device = torch.device("cuda" if torch.cuda.is_available() and args.cuda else "cpu")
+        try:
+            policy.load_state_dict(torch.load(f"{args.demo_agent_path}", map_location=device, weights_only=True))
+        except:
+            msg = (
+                "Error in loading state dict. Likely caused by loading an agent.pt file with incompatible `args.agent_type`"
+            )
+            raise Exception(msg)
+        policy.to(device)
+
+        transitions = make_demonstrations(policy, envs, args.num_demos)
     agent.bc_trainer.set_demonstrations(transitions)
     agent.train_bc(
         n_epochs=args.n_epochs,
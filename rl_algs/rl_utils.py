@@ -10,6 +10,8 @@ from pathlib import Path
 import gymnasium as gym
 import numpy as np
 from pcse_gym.envs.wofost_base import Plant_NPK_Env, Harvest_NPK_Env
+from pcse_gym.envs.wofost_vector import NPK_AsyncVectorEnv
+from pcse_gym.dataset import DatasetReader
 from dataclasses import dataclass
 import os
 from typing import Optional
@@ -19,7 +21,8 @@ from torch.utils.tensorboard import SummaryWriter
 import torch, random
 from pcse_gym import wrappers
 import copy
-from imitation.data import rollout
+import weakref
+from imitation.data import rollout, types
 from stable_baselines3.common.buffers import ReplayBuffer
 
 sys.path.append(str(Path(__file__).parent.parent))
@@ -42,6 +45,10 @@ class RL_Args:
     """the entity (team) of wandb's project"""
     capture_video: bool = False
     """whether to capture videos of the agent performances (check out `videos` folder)"""
+    vector_backend: str = "sync"
+    """how to step the environments, `sync` in this process or `async` in parallel worker processes (the same as `sync` only without forecast noise and domain randomization, which `async` seeds per worker)"""
+    eval_backend: str = "sync"
+    """how to run the evaluation episodes, `sync` in this process or `async` in parallel worker processes"""
 
 
 class Agent(ABC):
@@ -111,79 +118,150 @@ def setup(kwargs: Namespace, args: Namespace, run_name: str) -> tuple[SummaryWri
 
     device = torch.device("cuda" if torch.cuda.is_available() and args.cuda else "cpu")
 
-    envs = gym.vector.SyncVectorEnv(
-        [make_env(kwargs, i, args.capture_video, run_name) for i in range(args.num_envs)],
-    )
+    env_fns = [make_env(kwargs, i, args.capture_video, run_name) for i in range(args.num_envs)]
+    if args.vector_backend == "sync":
+        envs = gym.vector.SyncVectorEnv(env_fns)
+    elif args.vector_backend == "async":
+        envs = NPK_AsyncVectorEnv(env_fns, template_fn=lambda: utils.make_gym_env(kwargs, run_name=run_name))
+    else:
+        msg = f"Unknown vector backend `{args.vector_backend}`, should be `sync` or `async`"
+        raise Exception(msg)
     assert isinstance(envs.single_action_space, gym.spaces.Discrete), "only discrete action space is supported"
 
     return writer, device, envs
 
 
+# Evaluation environments of the training environments in this process, built
+# on the first evaluation and kept for the rest of the training run. Reusing the
+# wrappers across evaluations relies on pcse_gym's NormalizeObservation and
+# NormalizeReward being stateless (fixed ranges from the state ranges file and
+# the reward range), so every evaluation normalizes as a freshly built env would
+_eval_env_pool = weakref.WeakKeyDictionary()
+
+
+def get_base_env(eval_env: gym.Env) -> gym.Env:
+    """
+    Get the base environment of a training environment: of the first environment of a
+    SyncVectorEnv, or of the template environment of a NPK_AsyncVectorEnv, whose
+    environments live in the worker processes
+    """
+    if isinstance(eval_env, NPK_AsyncVectorEnv):
+        if eval_env.template_env is None:
+            msg = "Evaluating on a `NPK_AsyncVectorEnv` requires a `template_fn` to build its `template_env`"
+            raise Exception(msg)
+        return eval_env.template_env.unwrapped
+    elif isinstance(eval_env, gym.vector.SyncVectorEnv):
+        return eval_env.envs[0].unwrapped
+    return eval_env.unwrapped
+
+
+def make_eval_env(eval_env: gym.Env, kwargs: Namespace, wrap: bool = True) -> FunctionType:
+    """
+    Environment constructor for evaluation with the configuration of the training environment.
+    Don't perform domain randomization (ie evaluate performance on the base environment)
+    And don't perform limited weather resets (ie evaluate performance on the full weather data)
+    With `wrap=False` the environment is not wrapped in the reward and normalization wrappers
+    """
+    base_env = get_base_env(eval_env)
+
+    def thunk():
+        new_args = copy.deepcopy(base_env.args)
+        # The year of every evaluation episode is set before the reset
+        new_args.random_reset = False
+        new_args.train_reset = False
+        new_args.domain_rand = False
+        env = type(base_env)(
+            new_args,
+            base_env.base_fpath,
+            base_env.agro_fpath,
+            base_env.soil_fpath,
+            base_env.crop_fpath,
+            base_env.name_fpath,
+            base_env.unit_fpath,
+            base_env.range_fpath,
+            base_env.render_mode,
+        )
+        if not wrap:
+            return env
+
+        env = utils.wrap_env_reward(env, kwargs)
+        env = wrappers.NormalizeObservation(env)
+        env = wrappers.NormalizeReward(env)
+        return env
+
+    return thunk
+
+
+def get_eval_envs(eval_env: gym.Env, kwargs: Namespace, eval_episodes: int) -> tuple[gym.vector.VectorEnv, list[int]]:
+    """
+    Get the evaluation environments of a training environment, one for every evaluation
+    episode, and the weather years of the episodes. They are built on the first call and
+    reused by every later evaluation, with the years drawn once from the seed of the run
+    so that every evaluation runs the same episodes. The normalization wrappers keep no
+    running statistics, so the policy inputs do not drift between evaluations
+    """
+    pool = _eval_env_pool.setdefault(eval_env, {})
+    if eval_episodes not in pool:
+        base_env = get_base_env(eval_env)
+        env_fns = [make_eval_env(base_env, kwargs) for _ in range(eval_episodes)]
+        if kwargs.alg.eval_backend == "sync":
+            envs = gym.vector.SyncVectorEnv(env_fns)
+        elif kwargs.alg.eval_backend == "async":
+            envs = NPK_AsyncVectorEnv(env_fns, template_fn=make_eval_env(base_env, kwargs, wrap=False))
+        else:
+            msg = f"Unknown evaluation backend `{kwargs.alg.eval_backend}`, should be `sync` or `async`"
+            raise Exception(msg)
+
+        rng = np.random.default_rng(kwargs.alg.seed)
+        years = rng.choice(np.sort(base_env.train_weather_data), size=eval_episodes).tolist()
+        pool[eval_episodes] = (envs, years)
+
+    return pool[eval_episodes]
+
+
+def get_unnormalize(eval_env: gym.Env) -> FunctionType:
+    """
+    Get the function that unnormalizes rewards with the NormalizeReward wrapper of a training
+    environment. The wrappers of a NPK_AsyncVectorEnv live in its worker processes, so the
+    rewards are unnormalized by the first worker
+    """
+    if isinstance(eval_env, NPK_AsyncVectorEnv):
+        return lambda rews: eval_env.call("unnormalize", rews)[0]
+    elif isinstance(eval_env, gym.vector.SyncVectorEnv):
+        return eval_env.envs[0].unnormalize
+    return eval_env.unnormalize
+
+
 def eval_policy(
     policy: Agent, eval_env: gym.Env, kwargs: Namespace, device: torch.device, eval_episodes: int = 5
 ) -> float:
     """
     Evaluate a policy. Don't perform domain randomization (ie evaluate performance on the base environment)
     And don't perform limited weather resets (ie evaluate performance on the full weather data)
+    The evaluation episodes are run together on the environments from `get_eval_envs`
     """
-    avg_reward = 0.0
+    envs, years = get_eval_envs(eval_env, kwargs, eval_episodes)
 
-    if isinstance(eval_env, gym.vector.SyncVectorEnv):
-        env_constr = type(eval_env.envs[0].unwrapped)
-        args = eval_env.envs[0].unwrapped.args
-        base_fpath = eval_env.envs[0].unwrapped.base_fpath
-        agro_fpath = eval_env.envs[0].unwrapped.agro_fpath
-        soil_fpath = eval_env.envs[0].unwrapped.soil_fpath
-        crop_fpath = eval_env.envs[0].unwrapped.crop_fpath
-        name_fpath = eval_env.envs[0].unwrapped.name_fpath
-        unit_fpath = eval_env.envs[0].unwrapped.unit_fpath
-        range_fpath = eval_env.envs[0].unwrapped.range_fpath
-        render_mode = eval_env.envs[0].unwrapped.render_mode
-    else:
-        env_constr = type(eval_env.unwrapped)
-        args = eval_env.unwrapped.args
-        base_fpath = eval_env.unwrapped.base_fpath
-        agro_fpath = eval_env.unwrapped.agro_fpath
-        soil_fpath = eval_env.unwrapped.soil_fpath
-        crop_fpath = eval_env.unwrapped.crop_fpath
-        name_fpath = eval_env.unwrapped.name_fpath
-        unit_fpath = eval_env.unwrapped.unit_fpath
-        range_fpath = eval_env.unwrapped.range_fpath
-        render_mode = eval_env.unwrapped.render_mode
-
-    new_args = copy.deepcopy(args)
-    new_args.random_reset = True
-    new_args.train_reset = False
-    new_args.domain_rand = False
-    env = env_constr(
-        new_args,
-        base_fpath,
-        agro_fpath,
-        soil_fpath,
-        crop_fpath,
-        name_fpath,
-        unit_fpath,
-        range_fpath,
-        render_mode,
-    )
+    unnormalize = get_unnormalize(eval_env)
 
-    env = utils.wrap_env_reward(env, kwargs)
-    env = wrappers.NormalizeObservation(env)
-    env = wrappers.NormalizeReward(env)
+    envs.set_attr("year", years)
+    state, _ = envs.reset()
+    done = np.zeros(eval_episodes, dtype=bool)
+    rewards = [[] for _ in range(eval_episodes)]
+    while not done.all():
+        state = torch.Tensor(state).to(device)
+        action = policy.get_action(state)
+        state, reward, term, trunc, _ = envs.step(action.detach().cpu().numpy())
 
-    for i in range(eval_episodes):
+        # Environments that are done are reset by the vector env, skip their rewards
+        for i in np.flatnonzero(~done):
+            rewards[i].append(reward[i])
+        done |= np.logical_or(term, trunc)
 
-        state, _, term, trunc = *env.reset(), False, False
-        while not (term or trunc):
-            if isinstance(state, np.ndarray):
-                state = torch.Tensor(state).reshape((-1, *env.observation_space.shape)).to(device)
-            action = policy.get_action(state)
-            state, reward, term, trunc, _ = env.step(action.detach().cpu().numpy())
-
-            if isinstance(eval_env, gym.vector.SyncVectorEnv):
-                avg_reward += eval_env.envs[0].unnormalize(reward)
-            else:
-                avg_reward += eval_env.unnormalize(reward)
+    avg_reward = 0.0
+    for episode_rewards in rewards:
+        for reward in unnormalize(np.array(episode_rewards)):
+            avg_reward += reward
 
     avg_reward /= eval_episodes
     return avg_reward
@@ -196,117 +274,158 @@ def eval_policy_lstm(
     Evaluate a policy with an LSTM agent for Recurrent-PPO. Don't perform domain randomization
     (ie evaluate performance on the base environment)
     And don't perform limited weather resets (ie evaluate performance on the full weather data)
+    The evaluation episodes are run together on the environments from `get_eval_envs`
     """
-    avg_reward = 0.0
-
     assert hasattr(policy, "lstm"), "Calling `eval_policy_lstm` with a policy that does not have a LSTM!"
 
-    if isinstance(eval_env, gym.vector.SyncVectorEnv):
-        env_constr = type(eval_env.envs[0].unwrapped)
-        args = eval_env.envs[0].unwrapped.args
-        base_fpath = eval_env.envs[0].unwrapped.base_fpath
-        agro_fpath = eval_env.envs[0].unwrapped.agro_fpath
-        soil_fpath = eval_env.envs[0].unwrapped.soil_fpath
-        crop_fpath = eval_env.envs[0].unwrapped.crop_fpath
-        name_fpath = eval_env.envs[0].unwrapped.name_fpath
-        unit_fpath = eval_env.envs[0].unwrapped.unit_fpath
-        range_fpath = eval_env.envs[0].unwrapped.range_fpath
-        render_mode = eval_env.envs[0].unwrapped.render_mode
-        config = eval_env.envs[0].unwrapped.config
-    else:
-        env_constr = type(eval_env.unwrapped)
-        args = eval_env.unwrapped.args
-        base_fpath = eval_env.unwrapped.base_fpath
-        agro_fpath = eval_env.unwrapped.agro_fpath
-        soil_fpath = eval_env.unwrapped.soil_fpath
-        crop_fpath = eval_env.unwrapped.crop_fpath
-        name_fpath = eval_env.unwrapped.name_fpath
-        unit_fpath = eval_env.unwrapped.unit_fpath
-        range_fpath = eval_env.unwrapped.range_fpath
-        render_mode = eval_env.unwrapped.render_mode
-        config = eval_env.unwrapped.config
-
-    new_args = copy.deepcopy(args)
-    new_args.random_reset = True
-    new_args.train_reset = False
-    new_args.domain_rand = False
-    env = env_constr(
-        new_args,
-        base_fpath,
-        agro_fpath,
-        soil_fpath,
-        crop_fpath,
-        name_fpath,
-        unit_fpath,
-        range_fpath,
-        render_mode,
-        config,
-    )
+    envs, years = get_eval_envs(eval_env, kwargs, eval_episodes)
 
-    env = utils.wrap_env_reward(env, kwargs)
-    env = wrappers.NormalizeObservation(env)
-    env = wrappers.NormalizeReward(env)
+    unnormalize = get_unnormalize(eval_env)
 
-    for i in range(eval_episodes):
+    envs.set_attr("year", years)
+    state, _ = envs.reset()
+    next_lstm_state = (
+        torch.zeros(policy.lstm.num_layers, eval_episodes, policy.lstm.hidden_size).to(device),
+        torch.zeros(policy.lstm.num_layers, eval_episodes, policy.lstm.hidden_size).to(device),
+    )  # hidden and cell states (see https://youtu.be/8HyCNIVRbSU)
+    next_done = torch.zeros(eval_episodes).to(device)
 
-        state, _, term, trunc = *env.reset(), False, False
+    done = np.zeros(eval_episodes, dtype=bool)
+    rewards = [[] for _ in range(eval_episodes)]
+    while not done.all():
+        state = torch.Tensor(state).to(device)
+        action, next_lstm_state = policy.get_action(state, next_lstm_state, next_done)
+        state, reward, term, trunc, _ = envs.step(action.detach().cpu().numpy())
+        next_done = torch.Tensor(np.logical_or(term, trunc)).to(device)
 
-        next_lstm_state = (
-            torch.zeros(policy.lstm.num_layers, 1, policy.lstm.hidden_size).to(device),
-            torch.zeros(policy.lstm.num_layers, 1, policy.lstm.hidden_size).to(device),
-        )  # hidden and cell states (see https://youtu.be/8HyCNIVRbSU)
+        # Environments that are done are reset by the vector env, skip their rewards
+        for i in np.flatnonzero(~done):
+            rewards[i].append(reward[i])
+        done |= np.logical_or(term, trunc)
 
-        while not np.logical_or(term, trunc):
-            next_done = np.logical_or([term], [term])
-            next_done = torch.Tensor(next_done).to(device)
-            if isinstance(state, np.ndarray):
-                state = torch.Tensor(state).reshape((-1, *env.observation_space.shape)).to(device)
-            action, next_lstm_state = policy.get_action(state, next_lstm_state, next_done)
-            state, reward, term, trunc, _ = env.step(action.detach().cpu().numpy())
-            if isinstance(eval_env, gym.vector.SyncVectorEnv):
-                avg_reward += eval_env.envs[0].unnormalize(reward)
-            else:
-                avg_reward += eval_env.unnormalize(reward)
+    avg_reward = 0.0
+    for episode_rewards in rewards:
+        for reward in unnormalize(np.array(episode_rewards)):
+            avg_reward += reward
 
     avg_reward /= eval_episodes
     return avg_reward
 
 
-def load_data_to_buffer(env: gym.Env, data_path: str, buffer: ReplayBuffer, remove_keys: bool = True) -> ReplayBuffer:
+def load_dataset(env: gym.Env, data_path: str, remove_keys: bool = True, last: int = None) -> dict[str, np.ndarray]:
     """
-    Load data from .npz file to buffer
+    Load the transitions of a .npz file or of a chunked dataset folder (see
+    pcse_gym/dataset.py) as arrays `obs`, `next_obs`, `actions`, `rewards` and
+    `dones`, only the `last` transitions if given. The chunks of a dataset
+    are memory-mapped, so that only the loaded transitions are read from disk
     """
     assert isinstance(data_path, str), f"data_path must be of type `str` but is of type {type(data_path)}"
-    assert data_path.endswith(".npz"), f"File must end with `.npz` format"
+    keys = ["obs", "next_obs", "actions", "rewards", "dones"]
+
+    if os.path.isdir(data_path):
+        reader = DatasetReader(data_path)
+        start = 0 if last is None else max(0, len(reader) - last)
+        data = {k: [] for k in keys}
+        for i, chunk in enumerate(reader.index["chunks"]):
+            first, n = chunk["first_transition"], chunk["transitions"]
+            if first + n <= start:
+                continue
+            arrays = reader.chunk(i, keys)
+            for k in keys:
+                data[k].append(np.array(arrays[k][max(0, start - first) :]))
+        data = {k: np.concatenate(v) for k, v in data.items()}
+    else:
+        assert data_path.endswith(".npz"), f"File must end with `.npz` format or be a dataset folder"
+        with np.load(data_path, allow_pickle=True) as npz:
+            start = 0 if last is None else max(0, len(npz["obs"]) - last)
+            data = {k: npz[k][start:] for k in keys}
 
-    data = np.load(data_path, allow_pickle=True)
-    obs = data["obs"]
-    next_obs = data["next_obs"]
-    actions = data["actions"]
-    rewards = data["rewards"]
-    dones = data["dones"]
+    if remove_keys:
+        for k in ["obs", "next_obs"]:
+            if data[k].dtype == object:
+                data[k] = np.array([list(v.values()) if isinstance(v, dict) else v for v in data[k]], dtype=np.float64)
+        if data["actions"].dtype == object:
+            data["actions"] = convert_actions(env, data["actions"])
 
-    assert len(obs[0]) == len(
-        buffer.observation_space.sample()
-    ), f"Invalid data for configuration! Data observations do not match the observations required for algorithm. Update Environment configuration using `--npk-args.output-vars` and `--npk-args.weather-vars`"
+    return data
 
-    if remove_keys:
-        for i in range(len(obs)):
-            if isinstance(obs[i], dict):
-                obs[i] = list(obs[i].values())
-        for j in range(len(next_obs)):
-            if isinstance(next_obs[j], dict):
-                next_obs[j] = list(next_obs[j].values())
-        for k in range(len(actions)):
-            if isinstance(actions[k], dict):
-                actions[k] = convert_action(env, actions[k])
-
-    for i in range(len(obs)):
-        buffer.add(obs[i], next_obs[i], actions[i], rewards[i], dones[i], None)
+
+def add_to_buffer(buffer: ReplayBuffer, data: dict[str, np.ndarray], skipped: int = 0) -> ReplayBuffer:
+    """
+    Add transitions to the buffer by copying them in slices instead of one
+    `buffer.add` call per transition. `skipped` transitions before `data` are
+    counted as added but not copied, as they would be overwritten. The buffer
+    ends in the same state as after adding the transitions one by one
+    """
+    n = len(data["obs"])
+    # Only the last buffer_size transitions remain in the buffer
+    start = max(0, n - buffer.buffer_size)
+    skipped += start
+    buffer.full = buffer.full or buffer.pos + skipped >= buffer.buffer_size
+    buffer.pos = (buffer.pos + skipped) % buffer.buffer_size
+
+    if buffer.n_envs != 1 or buffer.optimize_memory_usage:
+        for i in range(start, n):
+            buffer.add(data["obs"][i], data["next_obs"][i], data["actions"][i], data["rewards"][i], data["dones"][i], [{}])
+        return buffer
+
+    i = start
+    while i < n:
+        j = min(n, i + buffer.buffer_size - buffer.pos)
+        rows = slice(buffer.pos, buffer.pos + j - i)
+        buffer.observations[rows, 0] = data["obs"][i:j].reshape((j - i, *buffer.obs_shape))
+        buffer.next_observations[rows, 0] = data["next_obs"][i:j].reshape((j - i, *buffer.obs_shape))
+        buffer.actions[rows, 0] = data["actions"][i:j].reshape((j - i, buffer.action_dim))
+        buffer.rewards[rows, 0] = data["rewards"][i:j].reshape(j - i)
+        buffer.dones[rows, 0] = data["dones"][i:j].reshape(j - i)
+        if buffer.handle_timeout_termination:
+            buffer.timeouts[rows, 0] = 0
+        buffer.pos += j - i
+        if buffer.pos == buffer.buffer_size:
+            buffer.full = True
+            buffer.pos = 0
+        i = j
 
     return buffer
 
 
+def load_data_to_buffer(env: gym.Env, data_path: str, buffer: ReplayBuffer, remove_keys: bool = True) -> ReplayBuffer:
+    """
+    Load data from .npz file or dataset folder to buffer
+    """
+    skipped = 0
+    if os.path.isdir(data_path):
+        # Only read the transitions of the dataset that fit in the buffer
+        data = load_dataset(env, data_path, remove_keys=remove_keys, last=buffer.buffer_size)
+        skipped = len(DatasetReader(data_path)) - len(data["obs"])
+    else:
+        data = load_dataset(env, data_path, remove_keys=remove_keys)
+
+    assert (
+        data["obs"].shape[1:] == buffer.obs_shape
+    ), f"Invalid data for configuration! Data observations do not match the observations required for algorithm. Update Environment configuration using `--npk-args.output-vars` and `--npk-args.weather-vars`"
+
+    return add_to_buffer(buffer, data, skipped=skipped)
+
+
+def load_demonstrations(env: gym.Env, data_path: str) -> types.Transitions:
+    """
+    Load the transitions of a .npz file or dataset folder as demonstrations
+    for imitation learning algorithms
+    """
+    data = load_dataset(env, data_path)
+    obs_space = env.observation_space
+    act_space = env.action_space
+
+    return types.Transitions(
+        obs=data["obs"].astype(obs_space.dtype, copy=False),
+        acts=data["actions"].reshape((-1, *act_space.shape)).astype(act_space.dtype, copy=False),
+        infos=np.array([{}] * len(data["obs"])),
+        next_obs=data["next_obs"].astype(obs_space.dtype, copy=False),
+        dones=data["dones"].astype(bool, copy=False),
+    )
+
+
 def convert_action(env: gym.Env, act: dict) -> int:
     """
     Converts the dicionary action to an integer to be pased to the base
@@ -395,6 +514,39 @@ def convert_action(env: gym.Env, act: dict) -> int:
     return np.array([np.sum(offsets * offset_flags) + act_values[np.nonzero(act_values)[0][0]]])
 
 
+def convert_actions(env: gym.Env, acts: np.ndarray) -> np.ndarray:
+    """
+    Converts an array of dictionary actions to the integer actions of the
+    base environment at once, see `convert_action`
+    """
+    if isinstance(env.unwrapped, Plant_NPK_Env):
+        keys = ["plant", "harvest", "n", "p", "k", "irrig"]
+        offsets = [1, 1, env.unwrapped.num_fert, env.unwrapped.num_fert, env.unwrapped.num_fert, env.unwrapped.num_irrig]
+    elif isinstance(env.unwrapped, Harvest_NPK_Env):
+        keys = ["harvest", "n", "p", "k", "irrig"]
+        offsets = [1, env.unwrapped.num_fert, env.unwrapped.num_fert, env.unwrapped.num_fert, env.unwrapped.num_irrig]
+    else:
+        keys = ["n", "p", "k", "irrig"]
+        offsets = [env.unwrapped.num_fert, env.unwrapped.num_fert, env.unwrapped.num_fert, env.unwrapped.num_irrig]
+
+    try:
+        act_values = np.array([[act[key] for key in keys] for act in acts], dtype=np.int64).reshape((-1, len(keys)))
+    except (KeyError, TypeError):
+        msg = f"Actions must be dictionaries with the keys {keys}. See README for more information"
+        raise Exception(msg)
+
+    nonzero = act_values != 0
+    if np.any(np.count_nonzero(nonzero, axis=1) > 1):
+        msg = "More than one non-zero action value for policy"
+        raise Exception(msg)
+
+    # The integer action is the first non-zero value plus the offsets of the preceding keys
+    first = np.argmax(nonzero, axis=1)
+    starts = np.concatenate(([0], np.cumsum(offsets)))
+    values = act_values[np.arange(len(act_values)), first]
+    return np.where(nonzero.any(axis=1), starts[first] + values, 0).reshape((-1, 1))
+
+
 def make_demonstrations(expert: Agent, env: gym.Env, min_episodes: int = 50) -> list:
     """
     Make demonstrations for IRL algorithms